@@ -0,0 +1,56 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from a2wsgi import WSGIMiddleware
+
+import config
+from app import app
+from routes.async_api import ASYNC_ROUTES, handle_request
+from utils.extractor import close_async_client
+from utils.llm_client import close_async_openai_client
+
+# Production entry point (ASGI). The LLM-bound routes (/chat, /generate-html-report,
+# /summarize-website) are served natively as coroutines (routes/async_api.py); every other
+# route is the regular Flask app, run on a pool of ASGI_WSGI_THREADS threads.
+#
+#   cd backend
+#   pip install -r requirements.txt
+#   uvicorn asgi:application --host 0.0.0.0 --port 5001 --workers 4 \
+#       --limit-concurrency 2000 --timeout-keep-alive 75
+#
+# --workers: one process per CPU core is a good start; each process keeps up to
+#   OPENAI_ASYNC_MAX_CONNECTIONS model calls in flight and its own caches/connections.
+# --limit-concurrency: connections per worker before new ones get 503; keep it above the
+#   number of concurrent streams you expect (each open SSE stream is one connection).
+# Behind nginx, disable proxy buffering for the streaming routes (they also send
+# X-Accel-Buffering: no). `python app.py` remains the single-process development server.
+
+_wsgi_app = WSGIMiddleware(app, workers=config.ASGI_WSGI_THREADS)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # asyncio.to_thread in the async routes uses the loop's default executor.
+            asyncio.get_running_loop().set_default_executor(
+                ThreadPoolExecutor(max_workers=config.ASGI_BLOCKING_THREADS, thread_name_prefix="asgi-blocking")
+            )
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await close_async_openai_client()
+            await close_async_client()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] == "http":
+        handler = ASYNC_ROUTES.get((scope["method"], scope["path"]))
+        if handler is not None:
+            await handle_request(handler, scope, receive, send)
+            return
+    await _wsgi_app(scope, receive, send)
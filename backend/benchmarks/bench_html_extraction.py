@@ -0,0 +1,93 @@
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import write_html_corpus
+from utils.html_backends import PARSER_BACKENDS
+
+# Compares the HTML parser backends in utils/html_backends.py on a corpus of saved pages.
+#
+#   cd backend
+#   python -m benchmarks.bench_html_extraction --corpus path/to/saved/pages
+#   python -m benchmarks.bench_html_extraction --generate 20 --output html_bench.json
+#
+# Without --corpus a synthetic corpus of heavy news-like pages is generated.
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run(paths, repeat):
+    pages = []
+    for path in paths:
+        with open(path, "rb") as f:
+            pages.append((os.path.basename(path), f.read()))
+
+    results = {}
+    outputs = {}
+    for name, parse in PARSER_BACKENDS.items():
+        timings_ms = []
+        outputs[name] = []
+        for page_name, body in pages:
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                extracted = parse(body, page_name)
+                elapsed = (time.perf_counter() - start) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            timings_ms.append(best)
+            outputs[name].append(extracted)
+        results[name] = {
+            "pages": len(pages),
+            "total_ms": round(sum(timings_ms), 2),
+            "mean_ms": round(statistics.mean(timings_ms), 2),
+            "p50_ms": round(_percentile(timings_ms, 0.5), 2),
+            "p95_ms": round(_percentile(timings_ms, 0.95), 2),
+        }
+
+    # Parity against the reference (bs4) path: identical titles, and extracted text length.
+    reference = outputs.get("bs4")
+    for name in results:
+        if reference is None or name == "bs4":
+            continue
+        same_title = sum(1 for a, b in zip(reference, outputs[name]) if a[0] == b[0])
+        length_ratio = [len(b[1]) / max(1, len(a[1])) for a, b in zip(reference, outputs[name])]
+        results[name]["speedup_vs_bs4"] = round(results["bs4"]["total_ms"] / max(results[name]["total_ms"], 1e-9), 2)
+        results[name]["same_title"] = f"{same_title}/{len(pages)}"
+        results[name]["identical_text"] = f"{sum(1 for a, b in zip(reference, outputs[name]) if a == b)}/{len(pages)}"
+        results[name]["text_length_ratio_min"] = round(min(length_ratio), 3)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML extraction backends")
+    parser.add_argument("--corpus", help="directory of saved .html pages")
+    parser.add_argument("--generate", type=int, default=20, help="synthetic pages to generate when no corpus is given")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per page (best is kept)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.corpus:
+        paths = sorted(glob.glob(os.path.join(args.corpus, "*.htm*")))
+        results = run(paths, args.repeat)
+    else:
+        with tempfile.TemporaryDirectory() as corpus_dir:
+            results = run(write_html_corpus(corpus_dir, args.generate), args.repeat)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fixture_server, mock_openai
+from benchmarks.fixtures import write_route_corpus
+
+# End-to-end throughput benchmark for the API routes. Starts the OpenAI stub
+# (benchmarks/mock_openai.py), the fixture web server (benchmarks/fixture_server.py) and
+# the backend itself in a child process pointed at both, then drives each route at the
+# requested concurrency and reports req/s, p50/p95/p99 latency and the server's peak RSS.
+#
+#   cd backend
+#   python -m benchmarks.bench_routes --concurrency 8 --requests 40 --output bench.json
+#   python -m benchmarks.bench_routes --scenarios website,pdf_upload --compare bench.json
+#   python -m benchmarks.bench_routes --server asgi --concurrency 200 --scenarios chat,chat_stream
+#
+# Latency is measured until the whole response has been read; for streamed (SSE) routes
+# the time to the first byte is reported as well. The summary cache is disabled in the
+# server unless --summary-cache is given, so repeated documents are summarized every time.
+
+_SERVER_SNIPPET = (
+    "import sys\n"
+    "from app import app\n"
+    "app.run(host='127.0.0.1', port=int(sys.argv[1]), threaded=True, debug=False, use_reloader=False)\n"
+)
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _read_rss_kb(pid, field="VmRSS"):
+    # Resident set size of a process from /proc (Linux only; None elsewhere).
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+class _RssSampler:
+    # Polls the server's RSS while a scenario runs and keeps the maximum.
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = _read_rss_kb(self.pid)
+            if rss is not None:
+                self.peak_kb = max(self.peak_kb or 0, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if self.pid is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+def _read_sse(response):
+    # Reads a whole event stream; returns (seconds to first byte, name of the last event).
+    start = time.perf_counter()
+    first_byte = None
+    last_event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        if line and line.startswith("event:"):
+            last_event = line[len("event:"):].strip()
+    return first_byte, last_event
+
+
+class Client:
+    # Request helpers for the scenarios. One requests.Session per worker thread.
+    def __init__(self, base_url, corpus, fixtures, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.html_urls = [fixtures.url(path) for path in corpus["html"]]
+        self.pdfs = [(os.path.basename(path), _read_bytes(path)) for path in corpus["pdf"]]
+        self.transcripts = [(os.path.basename(path), _read_bytes(path)) for path in corpus["transcripts"]]
+        self.notebook_id = None
+        self.source_ids = []
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def post(self, path, stream=False, **kwargs):
+        response = self.session.post(self.base_url + path, timeout=self.timeout, stream=stream, **kwargs)
+        return self._finish(response, stream)
+
+    def get(self, path, stream=False):
+        response = self.session.get(self.base_url + path, timeout=self.timeout, stream=stream)
+        return self._finish(response, stream)
+
+    def _finish(self, response, stream):
+        # Returns (ok, seconds to first byte or None, detail); the body is always read fully.
+        with response:
+            if stream and response.ok:
+                first_byte, last_event = _read_sse(response)
+                return last_event == "done", first_byte, last_event
+            body = response.content
+        detail = None if response.ok else body[:200].decode("utf-8", "replace")
+        return response.ok, None, detail or response.status_code
+
+    def setup_notebook(self, sources=3):
+        # A notebook with a few summarized sources for the chat and report scenarios.
+        response = self.session.post(self.base_url + "/notebooks", json={"title": "Benchmark"}, timeout=self.timeout)
+        response.raise_for_status()
+        self.notebook_id = response.json()["id"]
+        for url in self.html_urls[:sources]:
+            response = self.session.post(self.base_url + "/summarize-website",
+                                         json={"url": url, "notebook_id": self.notebook_id}, timeout=self.timeout)
+            response.raise_for_status()
+            self.source_ids.append(response.json()["source_id"])
+
+    def _chat_body(self, i, stream):
+        question = f"What does source {i % len(self.source_ids)} say about latency and caching?"
+        return {
+            "message": question,
+            "chat_history": [{"sender": "user", "text": "Give me an overview."},
+                             {"sender": "ai", "text": "The sources cover pipelines, caching and models."},
+                             {"sender": "user", "text": question}],
+            "notebook_id": self.notebook_id,
+            "source_ids": self.source_ids,
+            "stream": stream,
+        }
+
+    def job(self, url):
+        response = self.session.post(self.base_url + "/jobs", json={"type": "website", "url": url}, timeout=self.timeout)
+        with response:
+            if response.status_code != 202:
+                return False, None, response.status_code
+            job_id = response.json()["job_id"]
+        return self.get(f"/jobs/{job_id}/events", stream=True)
+
+
+def _scenarios(client):
+    # name -> function(request index) returning (ok, first byte seconds, detail).
+    def pick(items, i):
+        return items[i % len(items)]
+
+    return {
+        "website": lambda i: client.post("/summarize-website", json={"url": pick(client.html_urls, i)}),
+        "website_stream": lambda i: client.post("/summarize-website", stream=True,
+                                                json={"url": pick(client.html_urls, i), "stream": True}),
+        "pdf_upload": lambda i: client.post("/summarize-text-file", files={"file": pick(client.pdfs, i)}),
+        "transcript_upload": lambda i: client.post("/summarize-text-file", files={"file": pick(client.transcripts, i)}),
+        "batch": lambda i: client.post("/summarize-batch", stream=True, json={
+            "urls": [pick(client.html_urls, i + k) for k in range(5)], "stream": True}),
+        "job_website": lambda i: client.job(pick(client.html_urls, i)),
+        "chat": lambda i: client.post("/chat", json=client._chat_body(i, False)),
+        "chat_stream": lambda i: client.post("/chat", stream=True, json=client._chat_body(i, True)),
+        "report": lambda i: client.post("/generate-html-report", json={
+            "notebook_id": client.notebook_id, "source_id": pick(client.source_ids, i)}),
+        "notebooks": lambda i: client.get("/notebooks"),
+        "notebook_sources": lambda i: client.get(f"/notebooks/{client.notebook_id}/sources"),
+    }
+
+
+def run_scenario(request, total, concurrency, pid=None, warmup=1):
+    for i in range(warmup):
+        request(i)
+
+    latencies, first_bytes, errors = [], [], []
+    lock = threading.Lock()
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            ok, first_byte, detail = request(i)
+        except requests.RequestException as e:
+            ok, first_byte, detail = False, None, f"{type(e).__name__}: {e}"
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+                if first_byte is not None:
+                    first_bytes.append(first_byte)
+            else:
+                errors.append(str(detail))
+
+    with _RssSampler(pid) as sampler, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        wall_start = time.perf_counter()
+        list(executor.map(one, range(total)))
+        wall = time.perf_counter() - wall_start
+
+    result = {
+        "requests": total,
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "errors": len(errors),
+        "wall_s": round(wall, 3),
+        "req_per_s": round(len(latencies) / wall, 2) if wall else None,
+    }
+    if latencies:
+        result.update({
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1),
+            "p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+            "p95_ms": round(_percentile(latencies, 0.95) * 1000, 1),
+            "p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+            "max_ms": round(max(latencies) * 1000, 1),
+        })
+    if first_bytes:
+        result["ttfb_p50_ms"] = round(_percentile(first_bytes, 0.50) * 1000, 1)
+        result["ttfb_p95_ms"] = round(_percentile(first_bytes, 0.95) * 1000, 1)
+    if sampler.peak_kb is not None:
+        result["peak_rss_mb"] = round(sampler.peak_kb / 1024, 1)
+    if errors:
+        result["error_samples"] = sorted(set(errors))[:3]
+    return result
+
+
+def _read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _server_command(kind, port):
+    if kind == "asgi":
+        # Production entry point (asgi.py); needs uvicorn and a2wsgi installed.
+        return [sys.executable, "-m", "uvicorn", "asgi:application", "--host", "127.0.0.1", "--port", str(port),
+                "--log-level", "warning", "--limit-concurrency", "10000"]
+    return [sys.executable, "-c", _SERVER_SNIPPET, str(port)]
+
+
+def _start_server(command, env, data_dir, port):
+    process = subprocess.Popen(
+        command,
+        cwd=_BACKEND_DIR, env=env,
+        stdout=open(os.path.join(data_dir, "server.log"), "wb"), stderr=subprocess.STDOUT,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with code {process.returncode}; see {data_dir}/server.log")
+        try:
+            requests.get(f"http://127.0.0.1:{port}/notebooks", timeout=1)
+            return process
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Backend did not start within 30 seconds")
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_BACKEND_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline):
+    # Prints req/s and p95 changes against an earlier results file.
+    lines = [f"{'scenario':<20} {'req/s':>10} {'base':>10} {'change':>8} {'p95 ms':>10} {'base':>10} {'change':>8}"]
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        row = [f"{name:<20}"]
+        for key in ("req_per_s", "p95_ms"):
+            now, before = current.get(key), previous.get(key)
+            change = f"{(now - before) / before * 100:+.1f}%" if now is not None and before else "n/a"
+            row.append(f"{now if now is not None else 'n/a':>10} {before if before is not None else 'n/a':>10} {change:>8}")
+        lines.append(" ".join(row))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API routes against a mock LLM and fixture server")
+    parser.add_argument("--scenarios", help="comma-separated subset of scenarios (default: all)")
+    parser.add_argument("--requests", type=int, default=20, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent clients per scenario")
+    parser.add_argument("--timeout", type=float, default=300, help="per-request timeout in seconds")
+    parser.add_argument("--server", choices=("flask", "asgi"), default="flask",
+                        help="threaded Flask development server or the ASGI entry point under uvicorn")
+    parser.add_argument("--target", help="benchmark an already running backend at this URL instead of starting one "
+                                         "(point its OPENAI_BASE_URL at the mock printed on startup)")
+    parser.add_argument("--pid", type=int, help="process id of the --target server, for RSS sampling")
+    parser.add_argument("--summary-cache", action="store_true", help="keep the server's summary cache enabled")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="mock LLM seconds to first token")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=200.0, help="mock LLM generation speed")
+    parser.add_argument("--llm-completion-tokens", type=int, default=300, help="mock LLM tokens per response")
+    parser.add_argument("--fetch-delay", type=float, default=0.0, help="fixture server delay per request")
+    parser.add_argument("--html-pages", type=int, default=20)
+    parser.add_argument("--pdfs", type=int, default=2)
+    parser.add_argument("--pdf-pages", type=int, default=200)
+    parser.add_argument("--transcripts", type=int, default=2)
+    parser.add_argument("--transcript-minutes", type=int, default=90)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="knowmelm-bench-")
+    process = None
+    try:
+        corpus = write_route_corpus(os.path.join(work_dir, "corpus"), html_pages=args.html_pages, pdfs=args.pdfs,
+                                    pdf_pages=args.pdf_pages, transcripts=args.transcripts,
+                                    transcript_minutes=args.transcript_minutes)
+        llm = mock_openai.serve(latency=args.llm_latency, tokens_per_second=args.llm_tokens_per_second,
+                                completion_tokens=args.llm_completion_tokens)
+        fixtures = fixture_server.serve(os.path.join(work_dir, "corpus"), delay=args.fetch_delay)
+        llm_url = f"http://127.0.0.1:{llm.server_port}/v1"
+        print(f"Mock OpenAI API on {llm_url}, fixtures on http://127.0.0.1:{fixtures.server_port}/", file=sys.stderr)
+
+        pid = args.pid
+        if args.target:
+            base_url = args.target
+        else:
+            port = _free_port()
+            data_dir = os.path.join(work_dir, "data")
+            os.makedirs(data_dir)
+            env = dict(os.environ, OPENAI_API_KEY="mock", OPENAI_BASE_URL=llm_url, OPENAI_MODEL="mock-model",
+                       KNOWMELM_DATA_DIR=data_dir, LOG_LEVEL="WARNING",
+                       SUMMARY_CACHE_ENABLED="true" if args.summary_cache else "false")
+            process = _start_server(_server_command(args.server, port), env, data_dir, port)
+            pid = process.pid
+            base_url = f"http://127.0.0.1:{port}"
+
+        client = Client(base_url, corpus, fixtures, args.timeout)
+        client.setup_notebook()
+        scenarios = _scenarios(client)
+        selected = args.scenarios.split(",") if args.scenarios else list(scenarios)
+        unknown = [name for name in selected if name not in scenarios]
+        if unknown:
+            parser.error(f"unknown scenarios: {', '.join(unknown)} (available: {', '.join(scenarios)})")
+
+        results = {
+            "meta": {
+                "revision": _git_revision(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "args": vars(args),
+            },
+            "scenarios": {},
+        }
+        for name in selected:
+            print(f"Running {name} ...", file=sys.stderr)
+            results["scenarios"][name] = run_scenario(scenarios[name], args.requests, args.concurrency, pid)
+
+        if pid is not None:
+            peak_kb = _read_rss_kb(pid, "VmHWM")
+            results["server_peak_rss_mb"] = round(peak_kb / 1024, 1) if peak_kb is not None else None
+        results["llm_requests"] = llm.requests_served
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if results.get("server_peak_rss_mb") is None and process is not None:
+        # Not Linux: fall back to the peak of all finished child processes (KiB on Linux, bytes on macOS).
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        results["server_peak_rss_mb"] = round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(results, json.load(f)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fixture_server, mock_openai
+from benchmarks.bench_routes import _git_revision
+from benchmarks.fixtures import write_route_corpus
+
+# Cold-start benchmark: how long a fresh process takes to import the app, and how long the
+# first request of each route family takes in it (the first request of a family pays for
+# loading its dependencies, see utils/lazy.py), against the second one. Every run is a new
+# interpreter; the mock LLM and the fixture server are the ones bench_routes.py uses.
+#
+#   cd backend
+#   python -m benchmarks.bench_startup --runs 5 --output startup.json
+#   python -m benchmarks.bench_startup --modes lazy --compare startup.json
+#
+# Modes: "lazy" (the default configuration) and "preload" (PRELOAD_DEPENDENCIES=all, as
+# for a pre-fork server). Reported values are medians over the runs, in milliseconds.
+
+# Runs in the child process; argv[1] is the JSON list of requests.
+_CHILD_SNIPPET = """
+import json, resource, sys, time
+start = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+client = app_module.app.test_client()
+result = {"import_ms": (imported - start) * 1000, "first_ms": {}, "second_ms": {}}
+for name, method, path, body, upload in json.loads(sys.argv[1]):
+    for key in ("first_ms", "second_ms"):
+        kwargs = {"json": body} if body is not None else {}
+        if upload:
+            kwargs = {"data": {"file": (open(upload, "rb"), upload.rsplit("/", 1)[-1])}}
+        t = time.perf_counter()
+        response = client.open(path, method=method, **kwargs)
+        response.get_data()
+        result[key][name] = (time.perf_counter() - t) * 1000
+        if response.status_code >= 400:
+            result.setdefault("errors", {})[name] = response.status_code
+result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+print(json.dumps(result))
+"""
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {"lazy": {"PRELOAD_DEPENDENCIES": ""}, "preload": {"PRELOAD_DEPENDENCIES": "all"}}
+
+
+def _requests(corpus, fixtures):
+    # (name, method, path, JSON body, upload path), one per route family.
+    return [
+        ("notebooks", "GET", "/notebooks", None, None),
+        ("website", "POST", "/summarize-website", {"url": fixtures.url(corpus["html"][0])}, None),
+        ("pdf_upload", "POST", "/summarize-text-file", None, corpus["pdf"][0]),
+        ("chat", "POST", "/chat", {"message": "What is this about?", "chat_history": []}, None),
+    ]
+
+
+def run_once(env, requests_json):
+    # One fresh process; returns its measurements plus the wall time until it exited.
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", _CHILD_SNIPPET, requests_json], cwd=_BACKEND_DIR, env=env,
+                               capture_output=True, text=True, timeout=300)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark process failed:\n{completed.stderr[-2000:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_ms"] = wall_ms
+    return result
+
+
+def summarize(runs):
+    def median(values):
+        return round(statistics.median(values), 1)
+
+    summary = {
+        "runs": len(runs),
+        "import_ms": median([run["import_ms"] for run in runs]),
+        "process_ms": median([run["process_ms"] for run in runs]),
+        "peak_rss_mb": median([run["peak_rss_mb"] for run in runs]),
+        "first_request_ms": {name: median([run["first_ms"][name] for run in runs]) for name in runs[0]["first_ms"]},
+        "second_request_ms": {name: median([run["second_ms"][name] for run in runs]) for name in runs[0]["second_ms"]},
+    }
+    errors = {name: status for run in runs for name, status in run.get("errors", {}).items()}
+    if errors:
+        summary["errors"] = errors
+    return summary
+
+
+def compare(results, baseline):
+    # Prints import and first-request changes against an earlier results file.
+    lines = [f"{'mode':<8} {'metric':<24} {'ms':>10} {'base':>10} {'change':>8}"]
+    for mode, current in results["modes"].items():
+        previous = baseline.get("modes", {}).get(mode)
+        if not previous:
+            continue
+        rows = [("import", current["import_ms"], previous.get("import_ms"))]
+        rows += [(f"first {name}", value, previous.get("first_request_ms", {}).get(name))
+                 for name, value in current["first_request_ms"].items()]
+        for metric, now, before in rows:
+            change = f"{(now - before) / before * 100:+.1f}%" if before else "n/a"
+            lines.append(f"{mode:<8} {metric:<24} {now:>10} {before if before is not None else 'n/a':>10} {change:>8}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure app startup and first-request latency per route family")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per mode")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"comma-separated subset of {', '.join(MODES)}")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="mock LLM seconds to first token")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+    modes = args.modes.split(",")
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(unknown)} (available: {', '.join(MODES)})")
+
+    work_dir = tempfile.mkdtemp(prefix="knowmelm-startup-")
+    try:
+        corpus = write_route_corpus(os.path.join(work_dir, "corpus"), html_pages=1, pdfs=1, pdf_pages=5,
+                                    transcripts=0)
+        llm = mock_openai.serve(latency=args.llm_latency, tokens_per_second=2000.0, completion_tokens=50)
+        fixtures = fixture_server.serve(os.path.join(work_dir, "corpus"))
+        requests_json = json.dumps(_requests(corpus, fixtures))
+
+        results = {
+            "meta": {
+                "revision": _git_revision(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "args": vars(args),
+            },
+            "modes": {},
+        }
+        for mode in modes:
+            print(f"Running {mode} ...", file=sys.stderr)
+            runs = []
+            for i in range(args.runs):
+                # A new data directory per run, so no run finds another's caches.
+                data_dir = os.path.join(work_dir, f"data_{mode}_{i}")
+                env = dict(os.environ, OPENAI_API_KEY="mock", OPENAI_BASE_URL=f"http://127.0.0.1:{llm.server_port}/v1",
+                           OPENAI_MODEL="mock-model", KNOWMELM_DATA_DIR=data_dir, LOG_LEVEL="WARNING",
+                           **MODES[mode])
+                runs.append(run_once(env, requests_json))
+            results["modes"][mode] = summarize(runs)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(results, json.load(f)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
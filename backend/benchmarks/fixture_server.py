@@ -0,0 +1,75 @@
+import argparse
+import functools
+import os
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.fixtures import write_route_corpus
+
+# Static web server for the benchmark fixture corpus (benchmarks/fixtures.py): heavy HTML
+# pages, large PDFs and long subtitle files, with an optional delay per request to
+# imitate a remote site.
+#
+#   cd backend
+#   python -m benchmarks.fixture_server --port 18081 --corpus /tmp/bench_corpus
+#   curl http://127.0.0.1:18081/html/page_000.html
+#
+# Without --corpus a corpus is generated into a temporary directory.
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        super().do_GET()
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, directory, delay=0.0):
+        super().__init__(address, functools.partial(_QuietHandler, directory=directory))
+        self.directory = directory
+        self.delay = delay
+
+    def url(self, path):
+        relative = os.path.relpath(path, self.directory).replace(os.sep, "/")
+        return f"http://{self.server_address[0]}:{self.server_port}/{relative}"
+
+
+def serve(directory, port=0, host="127.0.0.1", delay=0.0):
+    # Starts the server on a background thread and returns it.
+    server = FixtureServer((host, port), directory, delay)
+    threading.Thread(target=server.serve_forever, name="fixture-server", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the benchmark fixture corpus over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18081)
+    parser.add_argument("--corpus", help="directory written by fixtures.write_route_corpus (generated if missing)")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before each response")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        directory = args.corpus or scratch
+        if not os.path.isdir(os.path.join(directory, "html")):
+            write_route_corpus(directory)
+        server = FixtureServer((args.host, args.port), directory, args.delay)
+        print(f"Serving {directory} on http://{args.host}:{server.server_port}/", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+import random
+
+# Deterministic fixture corpora for the benchmarks. Generated on demand instead of being
+# checked in, so the repository stays small; the same seed always yields the same bytes.
+
+_WORDS = (
+    "knowledge notebook summary model context source article research learning token "
+    "latency budget pipeline document transcript report chunk index cache request stream "
+    "学习 知识 总结 模型 文章 研究 数据 方法 结果 分析"
+).split()
+
+
+def _sentence(rng, min_words=8, max_words=24):
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return " ".join(words).capitalize() + "."
+
+
+def generate_html_page(seed, paragraphs=300):
+    # A "heavy news page": navigation, inline scripts/styles, ads, comments, nested
+    # layout divs around an <article> with headings, paragraphs and lists.
+    rng = random.Random(seed)
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>",
+        f"<title>Fixture article {seed}</title>",
+        "<style>" + "".join(f".c{i}{{margin:{i}px}}" for i in range(200)) + "</style>",
+        "<script>" + "var x=" + "1+" * 2000 + "1;</script>",
+        "</head><body><header><nav><ul>",
+        "".join(f"<li><a href='/section/{i}'>Section {i}</a></li>" for i in range(60)),
+        "</ul></nav></header>",
+        "<div class='layout'><div class='sidebar'>",
+        "".join(f"<div class='ad'><!-- ad slot {i} --><span>Sponsored {i}</span></div>" for i in range(40)),
+        "</div><div class='main-column'><article>",
+        f"<h1>Fixture article {seed}</h1>",
+    ]
+    for i in range(paragraphs):
+        if i % 25 == 0:
+            parts.append(f"<h2>{_sentence(rng, 3, 6)}</h2>")
+        if i % 40 == 7:
+            parts.append("<ul>" + "".join(f"<li>{_sentence(rng, 4, 10)}</li>" for _ in range(5)) + "</ul>")
+        parts.append(
+            f"<p class='c{i % 200}'>{_sentence(rng)} <a href='#r{i}'>{rng.choice(_WORDS)}</a> "
+            f"<em>{_sentence(rng, 4, 8)}</em> {_sentence(rng)}</p>"
+        )
+    parts += [
+        "</article><div class='comments'>",
+        "".join(f"<div class='comment'><p>{_sentence(rng)}</p></div>" for _ in range(50)),
+        "</div></div></div><footer><p>Copyright fixture</p>",
+        "<script>" + "console.log(1);" * 500 + "</script></footer></body></html>",
+    ]
+    return "".join(parts).encode("utf-8")
+
+
+def write_html_corpus(directory, count=20, paragraphs=300):
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for seed in range(count):
+        path = os.path.join(directory, f"page_{seed:03d}.html")
+        with open(path, "wb") as f:
+            f.write(generate_html_page(seed, paragraphs))
+        paths.append(path)
+    return paths
+
+
+def _ascii_sentence(rng, min_words=8, max_words=24):
+    # PDF fixtures use the standard Helvetica font, which only covers Latin text.
+    words = [w for w in (rng.choice(_WORDS) for _ in range(rng.randint(min_words, max_words))) if w.isascii()]
+    return " ".join(words or ["notebook"]).capitalize() + "."
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def generate_pdf(seed, pages=200, lines_per_page=55):
+    # A text-only PDF with one content stream per page, built by hand (no PDF library is
+    # needed) so that PyPDF2 has real text operators to extract on every page.
+    rng = random.Random(seed)
+    page_count = pages
+    # Object numbers: 1 catalog, 2 page tree, 3 font, then (page, content) pairs.
+    page_ids = [4 + 2 * i for i in range(page_count)]
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: ("<< /Type /Pages /Count %d /Kids [%s] >>" % (
+            page_count, " ".join(f"{page_id} 0 R" for page_id in page_ids))).encode("ascii"),
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for index, page_id in enumerate(page_ids):
+        lines = [f"Fixture document {seed}, page {index + 1}"]
+        lines += [_ascii_sentence(rng) for _ in range(lines_per_page - 1)]
+        stream = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        stream = stream.encode("ascii")
+        objects[page_id] = (
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        ).encode("ascii")
+        objects[page_id + 1] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += b"%d 0 obj\n" % number + objects[number] + b"\nendobj\n"
+    xref_offset = len(out)
+    size = max(objects) + 1
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % size
+    for number in range(1, size):
+        out += b"%010d 00000 n \n" % offsets[number]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref_offset)
+    return bytes(out)
+
+
+def _vtt_time(seconds):
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}"
+
+
+def generate_transcript_vtt(seed, minutes=90, cue_seconds=3):
+    # YouTube-style auto-captions: every cue repeats the previous line before adding a new
+    # one, with inline word timing tags, which is what utils/transcript.py has to undo.
+    rng = random.Random(seed)
+    parts = ["WEBVTT\nKind: captions\nLanguage: en\n\n"]
+    previous = ""
+    for index in range(minutes * 60 // cue_seconds):
+        start = index * cue_seconds
+        line = _sentence(rng, 6, 12)
+        tagged = "".join(f"<{_vtt_time(start + i * 0.2)}><c> {word}</c>" for i, word in enumerate(line.split()))
+        parts.append(f"{_vtt_time(start)} --> {_vtt_time(start + cue_seconds)} align:start position:0%\n")
+        parts.append(f"{previous}\n{tagged}\n\n" if previous else f"{tagged}\n\n")
+        previous = line
+    return "".join(parts).encode("utf-8")
+
+
+def write_route_corpus(directory, html_pages=20, html_paragraphs=300, pdfs=4, pdf_pages=200,
+                       transcripts=4, transcript_minutes=90):
+    # Corpus for benchmarks/bench_routes.py, laid out the way the fixture server serves it:
+    # html/page_NNN.html, pdf/doc_NNN.pdf, transcripts/video_NNN.vtt and, for uploading,
+    # transcripts/video_NNN.txt (the same transcript as utils/transcript.py formats it).
+    from utils.transcript import format_transcript, iter_cues
+
+    corpus = {"html": write_html_corpus(os.path.join(directory, "html"), html_pages, html_paragraphs), "pdf": [], "transcripts": []}
+
+    os.makedirs(os.path.join(directory, "pdf"), exist_ok=True)
+    for seed in range(pdfs):
+        path = os.path.join(directory, "pdf", f"doc_{seed:03d}.pdf")
+        with open(path, "wb") as f:
+            f.write(generate_pdf(seed, pdf_pages))
+        corpus["pdf"].append(path)
+
+    os.makedirs(os.path.join(directory, "transcripts"), exist_ok=True)
+    for seed in range(transcripts):
+        vtt = generate_transcript_vtt(seed, transcript_minutes)
+        path = os.path.join(directory, "transcripts", f"video_{seed:03d}.vtt")
+        with open(path, "wb") as f:
+            f.write(vtt)
+        text_path = path[:-len(".vtt")] + ".txt"
+        with open(text_path, "w", encoding="utf-8") as f:
+            f.write(format_transcript(iter_cues(vtt.decode("utf-8").split("\n"))))
+        corpus["transcripts"].append(text_path)
+    return corpus
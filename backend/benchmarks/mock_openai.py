@@ -0,0 +1,163 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local OpenAI-compatible stub for the benchmarks: POST /v1/chat/completions, streamed or
+# not, with a configurable time to first token and token rate, so the backend can be
+# load-tested without paying for (or waiting on) the real API.
+#
+#   cd backend
+#   python -m benchmarks.mock_openai --port 18080 --latency 0.3 --tokens-per-second 80
+#   OPENAI_BASE_URL=http://127.0.0.1:18080/v1 OPENAI_API_KEY=mock python app.py
+#
+# Requests in JSON mode (response_format json_object, as used for report cards) get a JSON
+# object in the shape utils/report.py expects, everything else gets lorem-ipsum text.
+# Non-streamed responses report usage; prompt tokens are estimated as characters / 4.
+
+_WORDS = "summary knowledge source context model notebook learning report index stream".split()
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.2, tokens_per_second=100.0, completion_tokens=300, jitter=0.1):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.jitter = jitter
+        self.requests_served = 0
+        self._count_lock = threading.Lock()
+
+    def count_request(self):
+        with self._count_lock:
+            self.requests_served += 1
+
+
+def _completion_tokens(body, default):
+    limit = body.get("max_tokens") or body.get("max_completion_tokens")
+    return min(default, limit) if limit else default
+
+
+def _wants_json(body):
+    return (body.get("response_format") or {}).get("type") == "json_object"
+
+
+def _report_cards(count):
+    cards = [{"title": f"Card {i}", "icon": "*", "size": "large" if i == 0 else "medium",
+              "body": " ".join(_WORDS), "items": _WORDS[:3], "tags": _WORDS[3:5],
+              "metrics": [{"label": _WORDS[i % len(_WORDS)], "value": (i * 17) % 100}]}
+             for i in range(max(1, count // 60))]
+    return json.dumps({"headline": "Mock report", "subtitle": "Generated by the benchmark stub",
+                       "highlights": [{"value": "42", "label": "answer"}], "cards": cards,
+                       "conclusion": "Mock conclusion."})
+
+
+def _tokens(body, count):
+    # The response as a list of token-sized pieces.
+    messages = body.get("messages") or []
+    if _wants_json(body):
+        text = _report_cards(count)
+        return [text[i:i + 4] for i in range(0, len(text), 4)]
+    rng = random.Random(len(messages))
+    return [("" if i == 0 else " ") + rng.choice(_WORDS) for i in range(count)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data):
+        frame = f"data: {data}\n\n".encode("utf-8")
+        self.wfile.write(b"%x\r\n" % len(frame) + frame + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        server = self.server
+        server.count_request()
+
+        messages = body.get("messages") or []
+        model = body.get("model") or "mock"
+        tokens = _tokens(body, _completion_tokens(body, server.completion_tokens))
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+        delay_per_token = 1.0 / server.tokens_per_second if server.tokens_per_second > 0 else 0.0
+        time.sleep(max(0.0, server.latency * (1 + random.uniform(-server.jitter, server.jitter))))
+
+        if not body.get("stream"):
+            time.sleep(delay_per_token * len(tokens))
+            self._send_json(200, {
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                          "total_tokens": prompt_tokens + len(tokens)},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(delta, finish_reason=None):
+            return json.dumps({
+                "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            })
+
+        try:
+            self._write_chunk(chunk({"role": "assistant", "content": ""}))
+            for token in tokens:
+                time.sleep(delay_per_token)
+                self._write_chunk(chunk({"content": token}))
+            self._write_chunk(chunk({}, "stop"))
+            self._write_chunk("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def serve(port=0, host="127.0.0.1", **options):
+    # Starts the stub on a background thread and returns the server (server.server_port).
+    server = MockOpenAIServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="mock-openai", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0, help="generation speed (0 = instant)")
+    parser.add_argument("--completion-tokens", type=int, default=300, help="tokens per response (capped by max_tokens)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="relative random variation of the latency")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer((args.host, args.port), latency=args.latency, tokens_per_second=args.tokens_per_second,
+                              completion_tokens=args.completion_tokens, jitter=args.jitter)
+    print(f"Mock OpenAI API on http://{args.host}:{server.server_port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
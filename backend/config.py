@@ -1,21 +1,199 @@
 import os
-import openai
 from dotenv import load_dotenv
 
-def load_configuration():
-    load_dotenv()
-    openai.api_key = os.getenv("OPENAI_API_KEY")
-    # Add any other global configurations here in the future if needed
+# Settings come from the environment (and a .env file) and are read once, when this module
+# is first imported; everything below is a plain constant. Importing it has no other side
+# effects: the OpenAI client is built by utils/llm_client.py, and app.create_app() checks
+# that an API key is set.
+load_dotenv()
 
-    # You might want to return the Flask app's config or other specific values if needed by app.py
-    # For now, just setting openai.api_key is the main side effect.
-    # Example: Check if API key is loaded
-    if not openai.api_key:
-        print("Warning: OPENAI_API_KEY not found in .env file or environment variables.")
+# --- OpenAI client (utils/llm_client.py) ---
+# A single pooled client is created on first use and shared by every route and worker thread.
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL")
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "64"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "32"))
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", "60"))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "120"))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.getenv("OPENAI_CONNECT_TIMEOUT_SECONDS", "10"))
+# Retries apply to 408/409/429/5xx and connection errors, with exponential backoff and full jitter.
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+OPENAI_RETRY_BASE_DELAY_SECONDS = float(os.getenv("OPENAI_RETRY_BASE_DELAY_SECONDS", "0.5"))
+OPENAI_RETRY_MAX_DELAY_SECONDS = float(os.getenv("OPENAI_RETRY_MAX_DELAY_SECONDS", "20"))
 
-# Call it directly so importing config executes this
-load_configuration()
+# --- Model tiers (utils/model_router.py) and prompt coalescing (utils/coalesce.py) ---
+OPENAI_MODEL_FAST = os.getenv("OPENAI_MODEL_FAST") or OPENAI_MODEL
+OPENAI_MODEL_STRONG = os.getenv("OPENAI_MODEL_STRONG") or OPENAI_MODEL
+# Per-task tier overrides, "task=fast|strong" separated by commas (tasks in model_router.TASK_TIERS).
+LLM_TASK_TIERS = os.getenv("LLM_TASK_TIERS", "")
+# Small prompts of one task are packed this many to a request (1 disables packing).
+LLM_COALESCE_MAX_ITEMS = int(os.getenv("LLM_COALESCE_MAX_ITEMS", "4"))
+LLM_COALESCE_MAX_ITEM_TOKENS = int(os.getenv("LLM_COALESCE_MAX_ITEM_TOKENS", "1500"))
 
-# Optionally, you could also define variables to export, e.g.:
-# OPENAI_API_KEY = openai.api_key
-# (but direct setup of openai.api_key is common)
+# --- LLM scheduler and admission control (utils/llm_scheduler.py) ---
+# This process's share of the OpenAI account limits (divide by the number of workers);
+# 0 leaves that limit unenforced. Calls beyond them queue by priority: chat, then reports,
+# then summaries.
+LLM_RATE_LIMIT_RPM = int(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+LLM_RATE_LIMIT_TPM = int(os.getenv("LLM_RATE_LIMIT_TPM", "0"))
+# Completion tokens reserved for calls that do not set max_tokens (TPM accounting only).
+LLM_DEFAULT_COMPLETION_TOKENS = int(os.getenv("LLM_DEFAULT_COMPLETION_TOKENS", "1000"))
+# Calls waiting per priority class before new ones are rejected with 429.
+LLM_SCHEDULER_MAX_QUEUE = int(os.getenv("LLM_SCHEDULER_MAX_QUEUE", "100"))
+# Longest a call may wait for the rate limits, per priority class, before it is rejected with 429.
+LLM_MAX_WAIT_INTERACTIVE_SECONDS = float(os.getenv("LLM_MAX_WAIT_INTERACTIVE_SECONDS", "15"))
+LLM_MAX_WAIT_STANDARD_SECONDS = float(os.getenv("LLM_MAX_WAIT_STANDARD_SECONDS", "60"))
+LLM_MAX_WAIT_BULK_SECONDS = float(os.getenv("LLM_MAX_WAIT_BULK_SECONDS", "300"))
+# LLM-bound API requests one client address may have in flight (0 = unlimited). Behind a
+# reverse proxy (or the frontend dev server's proxy) every request comes from the proxy's
+# address, so set LLM_TRUSTED_PROXY_HOPS to the number of proxies in front of the app;
+# the client is then the address the outermost of them put in X-Forwarded-For. Leave it
+# at 0 when the app is reachable directly, since clients can write that header themselves.
+LLM_MAX_CONCURRENT_PER_CLIENT = int(os.getenv("LLM_MAX_CONCURRENT_PER_CLIENT", "0"))
+LLM_TRUSTED_PROXY_HOPS = int(os.getenv("LLM_TRUSTED_PROXY_HOPS", "0"))
+
+# --- Summarization engine (utils/summarizer.py) ---
+# Inputs longer than SUMMARY_CHUNK_TOKENS are split into chunks, summarized in parallel
+# on a pool of SUMMARY_MAX_CONCURRENCY workers and merged hierarchically.
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
+SUMMARY_CHUNK_SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_CHUNK_SUMMARY_MAX_TOKENS", "700"))
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "8"))
+# Upper bound on how much of a single document is ever sent to the LLM.
+SUMMARY_DOCUMENT_TOKEN_BUDGET = int(os.getenv("SUMMARY_DOCUMENT_TOKEN_BUDGET", "400000"))
+
+# --- Local data directory for on-disk caches and stores ---
+DATA_DIR = os.getenv("KNOWMELM_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
+# --- Summary cache (utils/summary_cache.py) ---
+# Also holds report cards and rendered report HTML (utils/report.py) and the per-source
+# digests of notebook reports (utils/synthesis.py): disabling it disables those caches too.
+SUMMARY_CACHE_ENABLED = os.getenv("SUMMARY_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SUMMARY_CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", os.path.join(DATA_DIR, "summary_cache.sqlite3"))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "5000"))
+SUMMARY_CACHE_MAX_BYTES = int(os.getenv("SUMMARY_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+SUMMARY_CACHE_TTL_SECONDS = int(os.getenv("SUMMARY_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))  # 0 disables expiry
+
+# --- Near-duplicate sources (utils/dedup.py) ---
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+DEDUP_INDEX_PATH = os.getenv("DEDUP_INDEX_PATH", os.path.join(DATA_DIR, "dedup_index.sqlite3"))
+# Estimated share of common 5-word shingles at which two texts count as the same source.
+DEDUP_SIMILARITY_THRESHOLD = float(os.getenv("DEDUP_SIMILARITY_THRESHOLD", "0.9"))
+# Reuse the known summary for a near-duplicate; when off, duplicates are only flagged.
+DEDUP_REUSE_SUMMARIES = os.getenv("DEDUP_REUSE_SUMMARIES", "true").lower() in ("1", "true", "yes")
+DEDUP_MAX_DOCUMENTS = int(os.getenv("DEDUP_MAX_DOCUMENTS", "20000"))
+
+# --- Background ingestion jobs (utils/jobs.py, routes/jobs.py) ---
+JOBS_MAX_WORKERS = int(os.getenv("JOBS_MAX_WORKERS", "8"))
+# Per-source-type limits, so a burst of videos cannot occupy every worker.
+JOBS_YOUTUBE_CONCURRENCY = int(os.getenv("JOBS_YOUTUBE_CONCURRENCY", "3"))
+JOBS_WEBSITE_CONCURRENCY = int(os.getenv("JOBS_WEBSITE_CONCURRENCY", "6"))
+JOBS_FILE_CONCURRENCY = int(os.getenv("JOBS_FILE_CONCURRENCY", "4"))
+JOBS_BATCH_CONCURRENCY = int(os.getenv("JOBS_BATCH_CONCURRENCY", "2"))
+# How long finished jobs stay available for polling.
+JOBS_RETENTION_SECONDS = int(os.getenv("JOBS_RETENTION_SECONDS", "3600"))
+
+# --- PDF extraction (utils/pdf_extractor.py) ---
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(200 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "3000"))
+PDF_MAX_WORKERS = int(os.getenv("PDF_MAX_WORKERS", str(os.cpu_count() or 1)))
+# Documents with fewer pages are extracted in-process; larger ones fan out in page batches.
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None  # defaults to the system temp dir
+
+# --- Web page extraction (utils/extractor.py, utils/html_backends.py) ---
+# "auto" uses lxml when installed and falls back to BeautifulSoup's html.parser.
+HTML_PARSER_BACKEND = os.getenv("HTML_PARSER_BACKEND", "auto")
+FETCH_TIMEOUT_SECONDS = float(os.getenv("FETCH_TIMEOUT_SECONDS", "10"))
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(5 * 1024 * 1024)))
+# Keep-alive pool of the shared requests.Session: hosts kept, connections per host.
+FETCH_POOL_CONNECTIONS = int(os.getenv("FETCH_POOL_CONNECTIONS", "32"))
+FETCH_POOL_MAXSIZE = int(os.getenv("FETCH_POOL_MAXSIZE", "16"))
+
+# --- Fetched page cache (utils/fetch_cache.py) ---
+FETCH_CACHE_ENABLED = os.getenv("FETCH_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+FETCH_CACHE_PATH = os.getenv("FETCH_CACHE_PATH", os.path.join(DATA_DIR, "fetch_cache.sqlite3"))
+FETCH_CACHE_MAX_ENTRIES = int(os.getenv("FETCH_CACHE_MAX_ENTRIES", "2000"))
+FETCH_CACHE_MAX_BYTES = int(os.getenv("FETCH_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Upper bound on how long a page is reused without revalidation, whatever its headers say.
+FETCH_CACHE_MAX_AGE_SECONDS = int(os.getenv("FETCH_CACHE_MAX_AGE_SECONDS", str(24 * 3600)))
+
+# --- Batch imports (utils/batch.py, POST /summarize-batch) ---
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+BATCH_MAX_CONNECTIONS = int(os.getenv("BATCH_MAX_CONNECTIONS", "32"))
+BATCH_PER_HOST_CONNECTIONS = int(os.getenv("BATCH_PER_HOST_CONNECTIONS", "4"))
+BATCH_EXTRACT_WORKERS = int(os.getenv("BATCH_EXTRACT_WORKERS", "4"))
+# Documents summarized at the same time across all batches (each may fan out further,
+# see SUMMARY_MAX_CONCURRENCY).
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+# --- Retrieval index for chat context (utils/retrieval.py) ---
+RETRIEVAL_INDEX_PATH = os.getenv("RETRIEVAL_INDEX_PATH", os.path.join(DATA_DIR, "retrieval_index.sqlite3"))
+RETRIEVAL_PASSAGE_TOKENS = int(os.getenv("RETRIEVAL_PASSAGE_TOKENS", "350"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+
+# --- Conversation memory for chat (utils/conversation_memory.py) ---
+# Recent turns are sent verbatim up to CHAT_HISTORY_TOKEN_BUDGET; beyond that, older turns
+# are folded into a running summary and the verbatim tail is cut back to CHAT_HISTORY_RECENT_TOKENS.
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "4000"))
+CHAT_HISTORY_RECENT_TOKENS = int(os.getenv("CHAT_HISTORY_RECENT_TOKENS", "1500"))
+CHAT_MEMORY_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_MEMORY_SUMMARY_MAX_TOKENS", "600"))
+# Running summaries live in their own database, independent of SUMMARY_CACHE_ENABLED and
+# its eviction; summaries not used for CHAT_MEMORY_MAX_AGE_DAYS are dropped.
+CHAT_MEMORY_PATH = os.getenv("CHAT_MEMORY_PATH", os.path.join(DATA_DIR, "conversation_memory.sqlite3"))
+CHAT_MEMORY_MAX_AGE_DAYS = float(os.getenv("CHAT_MEMORY_MAX_AGE_DAYS", "30"))
+
+# --- Notebook, source and report store (utils/store.py, routes/notebooks.py) ---
+STORE_PATH = os.getenv("STORE_PATH", os.path.join(DATA_DIR, "notebooks.sqlite3"))
+STORE_DEFAULT_PAGE_SIZE = int(os.getenv("STORE_DEFAULT_PAGE_SIZE", "50"))
+STORE_MAX_PAGE_SIZE = int(os.getenv("STORE_MAX_PAGE_SIZE", "200"))
+
+# --- YouTube transcripts (utils/transcript.py) ---
+# Subtitle languages in order of preference; manual subtitles win over auto-generated captions.
+YOUTUBE_SUBTITLE_LANGUAGES = [lang.strip() for lang in os.getenv("YOUTUBE_SUBTITLE_LANGUAGES", "zh,en").split(",") if lang.strip()]
+# Transcript lines are grouped into paragraphs of this many seconds, each prefixed with its timestamp.
+TRANSCRIPT_PARAGRAPH_SECONDS = int(os.getenv("TRANSCRIPT_PARAGRAPH_SECONDS", "30"))
+
+# --- Logging and instrumentation (utils/metrics.py, GET /metrics) ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# When set, every timed stage is also appended to this file as one JSON object per line.
+METRICS_TRACE_PATH = os.getenv("METRICS_TRACE_PATH") or None
+
+# --- ASGI serving mode (asgi.py, routes/async_api.py) ---
+# The LLM-bound routes run as coroutines on the AsyncOpenAI client, so one worker process
+# keeps up to OPENAI_ASYNC_MAX_CONNECTIONS model calls in flight. All other routes are the
+# regular Flask views, run on ASGI_WSGI_THREADS threads per worker.
+OPENAI_ASYNC_MAX_CONNECTIONS = int(os.getenv("OPENAI_ASYNC_MAX_CONNECTIONS", "500"))
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "32"))
+FETCH_ASYNC_MAX_CONNECTIONS = int(os.getenv("FETCH_ASYNC_MAX_CONNECTIONS", "100"))
+# Threads for blocking work started from the async routes (SQLite, HTML parsing, chat memory).
+ASGI_BLOCKING_THREADS = int(os.getenv("ASGI_BLOCKING_THREADS", "32"))
+
+# --- Frontend and response compression (routes/static.py, utils/static_assets.py, utils/compression.py) ---
+FRONTEND_BUILD_DIR = os.getenv("FRONTEND_BUILD_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend", "build"))
+# Cache lifetime of content-hashed build files (static/js/main.<hash>.js etc.).
+STATIC_IMMUTABLE_MAX_AGE_SECONDS = int(os.getenv("STATIC_IMMUTABLE_MAX_AGE_SECONDS", str(365 * 24 * 3600)))
+# Build files without a .gz from the build step are gzipped at startup up to this size.
+STATIC_PRECOMPRESS_MAX_BYTES = int(os.getenv("STATIC_PRECOMPRESS_MAX_BYTES", str(10 * 1024 * 1024)))
+RESPONSE_COMPRESSION_ENABLED = os.getenv("RESPONSE_COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+RESPONSE_COMPRESSION_LEVEL = int(os.getenv("RESPONSE_COMPRESSION_LEVEL", "6"))
+
+# --- Startup (app.py, utils/lazy.py) ---
+# Dependency families imported at startup instead of on first use: "all", or a comma-separated
+# subset of llm, web, youtube, pdf. Use with pre-fork servers (gunicorn --preload).
+PRELOAD_DEPENDENCIES = os.getenv("PRELOAD_DEPENDENCIES", "")
+
+# --- HTML reports (utils/report.py, templates/report.html) ---
+REPORT_MAX_TOKENS = int(os.getenv("REPORT_MAX_TOKENS", "3000"))
+# response_format={"type": "json_object"}; turn off for servers that reject it.
+REPORT_JSON_MODE = os.getenv("REPORT_JSON_MODE", "true").lower() in ("1", "true", "yes")
+REPORT_DEFAULT_THEME = os.getenv("REPORT_DEFAULT_THEME", "purple")
+
+# --- Notebook reports (utils/synthesis.py, POST /generate-notebook-report) ---
+SYNTHESIS_MAX_SOURCES = int(os.getenv("SYNTHESIS_MAX_SOURCES", "100"))
+# Per-source digests generated at the same time.
+SYNTHESIS_MAX_CONCURRENCY = int(os.getenv("SYNTHESIS_MAX_CONCURRENCY", "8"))
+SYNTHESIS_DIGEST_WORDS = int(os.getenv("SYNTHESIS_DIGEST_WORDS", "150"))
+SYNTHESIS_DIGEST_MAX_TOKENS = int(os.getenv("SYNTHESIS_DIGEST_MAX_TOKENS", "400"))
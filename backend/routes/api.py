@@ -1,19 +1,115 @@
-from flask import Blueprint, request, jsonify
-import openai # For OpenAIError and client instantiation in chat/report routes
-import os   # For OPENAI_BASE_URL in chat/report routes
-import tempfile # For summarize_youtube_route (if kept)
-import subprocess # For summarize_youtube_route (if kept)
-import pysrt # For summarize_youtube_route (if kept)
-from PyPDF2 import PdfReader # For summarize_text_file_route
-import sys # For logging to stderr
-import logging # For logging (if needed more formally later)
+from flask import Blueprint, g, request, jsonify
+import queue # For streaming batch results from the worker thread
+import logging
+import sqlite3
+import threading
 
+import config
 # Import utility functions from the utils directory
-from utils.extractor import extract_text_from_url
-from utils.summarizer import generate_detailed_summary_with_ai
-# config.py is imported in app.py, and it sets up openai.api_key globally
+from utils import dedup, report, synthesis
+from utils.batch import file_item, run_batch, url_item
+from utils.conversation_memory import build_history
+from utils import store
+from utils.ingest import IngestionError, record_source, load_uploaded_file, load_website, load_youtube_transcript, summarize_source
+from utils.retrieval import indexed_source_ids, search, source_overview
+from utils.summarizer import stream_detailed_summary_with_ai
+from utils.jobs import get_job_manager
+from utils.lazy import lazy_import
+from utils.llm_client import create_chat_completion, get_openai_client, stream_chat_completion
+from utils.llm_scheduler import BULK, INTERACTIVE, STANDARD, LLMOverloadedError, admit, client_id, release
+from utils.sse import format_sse, sse_response, wants_stream
+
+openai = lazy_import("openai", "llm")  # For OpenAIError; loaded with the first LLM call
 
 api_bp = Blueprint('api_bp', __name__)
+logger = logging.getLogger(__name__)
+
+# --- Admission control for the LLM-bound routes (see utils/llm_scheduler.py) ---
+# A request is rejected with 429 and Retry-After before any work is done when its client
+# already has LLM_MAX_CONCURRENT_PER_CLIENT requests in flight, or when the scheduler
+# would shed its priority class anyway. Chat is admitted ahead of reports and imports.
+_ROUTE_PRIORITIES = {
+    'api_bp.chat_route': INTERACTIVE,
+    'api_bp.generate_html_report_route': STANDARD,
+    'api_bp.generate_notebook_report_route': STANDARD,
+    'api_bp.summarize_text_file_route': BULK,
+    'api_bp.summarize_youtube_route': BULK,
+    'api_bp.summarize_website_route_bp': BULK,
+    'api_bp.summarize_batch_route': BULK,
+}
+
+
+def overloaded_response(error):
+    response = jsonify({"error": str(error), "retry_after": error.retry_after})
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response, 429
+
+
+def error_frame(message, error):
+    # SSE error frame; a call shed by the scheduler also says when to retry.
+    body = {"error": message}
+    if isinstance(error, LLMOverloadedError):
+        body["retry_after"] = error.retry_after
+    return format_sse(body, event="error")
+
+
+@api_bp.before_request
+def _admit_request():
+    priority = _ROUTE_PRIORITIES.get(request.endpoint)
+    if priority is None:
+        return None
+    client = client_id(request.headers, request.remote_addr)
+    try:
+        admit(priority, client)
+    except LLMOverloadedError as e:
+        return overloaded_response(e)
+    g.llm_client = client
+    return None
+
+
+@api_bp.after_request
+def _release_on_close(response):
+    # SSE responses hold the client's slot until the stream ends.
+    client = g.pop("llm_client", None)
+    if client is not None:
+        if response.is_streamed:
+            response.call_on_close(lambda: release(client))
+        else:
+            release(client)
+    return response
+
+
+@api_bp.teardown_request
+def _release_on_error(exc):
+    # Requests that failed before producing a response.
+    client = g.pop("llm_client", None)
+    if client is not None:
+        release(client)
+
+
+# --- Streaming (SSE) variant shared by the summarize routes ---
+# Sends a start frame immediately, then the summary as it is generated, then a final
+# "done" frame carrying the same fields as the non-streaming JSON response. A summary
+# reused from a near-duplicate source arrives as a single delta.
+def _stream_summary_response(text_content, doc_name, result_fields, notebook_id=None, url=None):
+    def events():
+        yield format_sse({"name": result_fields.get("name"), "type": result_fields.get("type")}, event="start")
+        signature, duplicate = dedup.check(text_content, notebook_id)
+        reused = dedup.reusable_summary(duplicate)
+        parts = []
+        try:
+            deltas = [reused] if reused is not None else stream_detailed_summary_with_ai(text_content, document_name=doc_name)
+            for delta in deltas:
+                parts.append(delta)
+                yield format_sse({"text": delta}, event="delta")
+        except Exception as e:
+            logger.exception("Error streaming summary for '%s'", doc_name)
+            yield error_frame(str(e), e)
+            return
+        result = record_source(dict(result_fields, summary="".join(parts).strip()), notebook_id, url, signature, duplicate)
+        yield format_sse(result, event="done")
+    return sse_response(events())
+
 
 # --- Route for /summarize-text-file (Moved from app.py) ---
 @api_bp.route('/summarize-text-file', methods=['POST'])
@@ -26,43 +122,27 @@ def summarize_text_file_route():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
 
-    allowed_extensions = ('.txt', '.pdf', '.md')
-    file_extension = os.path.splitext(file.filename.lower())[1]
-
-    if file_extension not in allowed_extensions:
-        return jsonify({'error': f'Invalid file type, please upload a {", ".join(allowed_extensions)} file'}), 400
-
-    text_content = ""
     doc_name = file.filename
+    notebook_id = request.form.get('notebook_id')
     try:
-        if file_extension == '.pdf':
-            try:
-                reader = PdfReader(file.stream)
-                for page in reader.pages:
-                    text_content += page.extract_text() or ""
-                if not text_content.strip():
-                    return jsonify({'error': 'Could not extract text from PDF or PDF is empty'}), 400
-            except Exception as e:
-                return jsonify({'error': f'Failed to parse PDF file: {str(e)}'}), 500
-        elif file_extension in ['.txt', '.md']:
-            text_content = file.read().decode('utf-8')
-            if not text_content.strip():
-                return jsonify({'error': 'File is empty or contains only whitespace'}), 400
+        text_content = load_uploaded_file(file.filename, file.stream)
 
-        if not text_content.strip():
-             return jsonify({'error': 'Extracted text content is empty.'}), 400
+        if wants_stream():
+            return _stream_summary_response(text_content, doc_name, {'original_content': text_content, 'name': doc_name, 'type': 'file'}, notebook_id)
 
-        summary = generate_detailed_summary_with_ai(text_content, document_name=doc_name)
-        if summary.startswith("Error:"):
-             return jsonify({"error": summary}), 400
-        return jsonify({'summary': summary, 'original_content': text_content, 'name': doc_name, 'type': 'file'})
+        return jsonify(summarize_source(text_content, doc_name, 'file', notebook_id))
 
+    except IngestionError as ie:
+        return jsonify({'error': str(ie)}), ie.status_code
+    except LLMOverloadedError as e:
+        return overloaded_response(e)
     except Exception as e:
         return jsonify({'error': f'Failed to process text file: {str(e)}'}), 500
 
 
 # --- Route for /summarize-youtube (Moved from app.py) ---
 # This route is kept for now as per instructions.
+# For long videos prefer POST /jobs (routes/jobs.py), which runs this off the request thread.
 @api_bp.route('/summarize-youtube', methods=['POST'])
 def summarize_youtube_route():
     data = request.get_json()
@@ -71,69 +151,26 @@ def summarize_youtube_route():
     if not youtube_url:
         return jsonify({'error': 'youtube_url is required'}), 400
     
-    print("Summarize YouTube route called for URL:", youtube_url, file=sys.stderr)
+    logger.info("Summarize YouTube route called for URL: %s", youtube_url)
 
-    youtube_cookies_file = os.environ.get("YOUTUBE_COOKIES_FILE")
-    youtube_browser_for_cookies = os.environ.get("YOUTUBE_BROWSER_FOR_COOKIES")
+    try:
+        subtitle_text = load_youtube_transcript(youtube_url)
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        try:
-            cmd = [
-                'yt-dlp', '--write-auto-sub', '--sub-lang', 'zh,en',
-                '--skip-download', '-o', f'{tmpdir}/%(id)s.%(ext)s', youtube_url
-            ]
-            # if youtube_browser_for_cookies:
-            #     cmd.extend(['--cookies-from-browser', youtube_browser_for_cookies])
-            # Temp: Forcing no cookies to see if it resolves subtitle download issue
-            
-            print(f"Attempting to download subtitles for {youtube_url} using command: {' '.join(cmd)}", file=sys.stderr)
-            process_result = subprocess.run(cmd, capture_output=True, text=True)
-            print(f"yt-dlp stdout: {process_result.stdout}", file=sys.stderr)
-            print(f"yt-dlp stderr: {process_result.stderr}", file=sys.stderr)
-            process_result.check_returncode() # This will raise CalledProcessError if exit code is non-zero.
-
-            subtitle_text = None
-            print(f"Files in temp directory {tmpdir}: {os.listdir(tmpdir)}", file=sys.stderr)
-            for filename in os.listdir(tmpdir):
-                if filename.endswith(('.vtt', '.srt')):
-                    print(f"Found subtitle file: {filename}. Processing with {'SRT' if filename.endswith('.srt') else 'VTT'} parser.", file=sys.stderr)
-                    filepath = os.path.join(tmpdir, filename)
-                    if filename.endswith('.srt'):
-                        subs = pysrt.open(filepath)
-                        subtitle_text = " ".join([sub.text for sub in subs])
-                    elif filename.endswith('.vtt'):
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            lines = f.readlines()
-                        text_lines = []
-                        for line_content in lines:
-                            line_content = line_content.strip()
-                            if not line_content or line_content.startswith('WEBVTT') or \
-                               line_content.startswith('Kind:') or line_content.startswith('Language:') or \
-                               '-->' in line_content or line_content.startswith('NOTE'):
-                                continue
-                            import re
-                            line_content = re.sub(r'<[^>]+>', '', line_content)
-                            text_lines.append(line_content)
-                        subtitle_text = " ".join(text_lines)
-                    break
-
-            if not subtitle_text:
-                print(f"No subtitle text could be extracted from {youtube_url}", file=sys.stderr)
-                return jsonify({'error': 'Could not find or parse subtitles'}), 404
-
-            summary = generate_detailed_summary_with_ai(subtitle_text, document_name=youtube_url)
-            if summary.startswith("Error:"):
-                return jsonify({"error": summary}), 400
-            return jsonify({'summary': summary,'original_content': subtitle_text, 'name': youtube_url, 'type': 'youtube'})
-
-        except subprocess.CalledProcessError as e:
-            print(f"yt-dlp command failed. Stderr: {e.stderr}, Stdout: {e.stdout}", file=sys.stderr)
-            return jsonify({'error': 'Failed to download subtitles', 'details': e.stderr}), 500
-        except Exception as e:
-            print(f"An unexpected error occurred in summarize_youtube_route: {str(e)}", file=sys.stderr)
-            import traceback
-            print(traceback.format_exc(), file=sys.stderr)
-            return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
+        if wants_stream(data):
+            return _stream_summary_response(subtitle_text, youtube_url, {'original_content': subtitle_text, 'name': youtube_url, 'type': 'youtube'}, data.get('notebook_id'), youtube_url)
+
+        return jsonify(summarize_source(subtitle_text, youtube_url, 'youtube', data.get('notebook_id'), youtube_url))
+
+    except IngestionError as ie:
+        error_body = {'error': str(ie)}
+        if ie.details is not None:
+            error_body['details'] = ie.details
+        return jsonify(error_body), ie.status_code
+    except LLMOverloadedError as e:
+        return overloaded_response(e)
+    except Exception as e:
+        logger.exception("An unexpected error occurred in summarize_youtube_route")
+        return jsonify({'error': f'An unexpected error occurred: {str(e)}'}), 500
 
 
 # --- Route for /summarize-website (Moved from app.py) ---
@@ -144,52 +181,122 @@ def summarize_website_route_bp():
         return jsonify({"error": "URL is required"}), 400
     url = data['url']
     try:
-        website_title, extracted_text = extract_text_from_url(url)
-        if not extracted_text.strip():
-             return jsonify({"error": "Could not extract meaningful content from the URL."}), 400
-        summary_text = generate_detailed_summary_with_ai(extracted_text, document_name=website_title)
-        if summary_text.startswith("Error:"):
-            return jsonify({"error": summary_text}), 400
-        return jsonify({
-            "name": website_title,
-            "type": "website",
-            "original_content": extracted_text,
-            "summary": summary_text
-        }), 200
+        website_title, extracted_text = load_website(url)
+        if wants_stream(data):
+            return _stream_summary_response(extracted_text, website_title, {"name": website_title, "type": "website", "original_content": extracted_text}, data.get('notebook_id'), url)
+        return jsonify(summarize_source(extracted_text, website_title, 'website', data.get('notebook_id'), url)), 200
+    except LLMOverloadedError as e:
+        return overloaded_response(e)
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
     except openai.OpenAIError as oae:
-        print(f"OpenAI API error for {url}: {oae}")
+        logger.warning("OpenAI API error for %s: %s", url, oae)
         return jsonify({"error": f"Summarization service error: {str(oae)}"}), 500
     except Exception as e:
-        print(f"Unexpected error for {url}: {e}")
+        logger.exception("Unexpected error for %s", url)
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
 
-# --- Route for /chat (Moved from app.py) ---
-@api_bp.route('/chat', methods=['POST'])
-def chat_route():
-    data = request.get_json()
-    if not data or 'message' not in data: # 'message' is still sent, can be used for logging or as a fallback.
-        return jsonify({"error": "Message is required"}), 400
-
+# --- Route for /summarize-batch: import many URLs and/or files at once ---
+# JSON {"urls": [...]} or multipart form with repeated "urls" and "files" fields.
+# Items are fetched, extracted and summarized concurrently (see utils/batch.py).
+# By default returns 202 with a job id (poll /jobs/<id>; finished items appear under
+# "items" as they complete). With streaming enabled, each finished item is sent as an
+# "item" SSE frame instead, followed by a "done" frame with the totals.
+# An optional "notebook_id" adds every summarized item to that notebook (see record_source).
+@api_bp.route('/summarize-batch', methods=['POST'])
+def summarize_batch_route():
+    data = request.get_json(silent=True) if request.is_json else None
+    urls = (data or {}).get('urls') or request.form.getlist('urls')
+    notebook_id = (data or {}).get('notebook_id') or request.form.get('notebook_id')
+    if not isinstance(urls, list):
+        return jsonify({'error': 'urls must be a list'}), 400
+
+    items = [url_item(url.strip()) for url in urls if isinstance(url, str) and url.strip()]
+    for file in request.files.getlist('files'):
+        if file.filename:
+            items.append(file_item(file.filename, file.read()))
+
+    if not items:
+        return jsonify({'error': 'Provide at least one URL or file'}), 400
+    if len(items) > config.BATCH_MAX_ITEMS:
+        return jsonify({'error': f'Too many items in one batch (max {config.BATCH_MAX_ITEMS})'}), 400
+
+    if wants_stream(data):
+        results = queue.Queue()
+        finished = object()
+
+        def worker():
+            try:
+                results.put((finished, run_batch(items, results.put, notebook_id)))
+            except Exception as e:
+                logger.exception("Batch import failed")
+                results.put((finished, {"error": str(e)}))
+
+        threading.Thread(target=worker, name="batch-stream", daemon=True).start()
+
+        def events():
+            yield format_sse({"total": len(items)}, event="start")
+            while True:
+                result = results.get()
+                if isinstance(result, tuple) and result[0] is finished:
+                    outcome = result[1]
+                    yield format_sse(outcome, event="error" if "error" in outcome else "done")
+                    return
+                yield format_sse(result, event="item")
+        return sse_response(events())
+
+    job, _ = get_job_manager().submit('batch', None, lambda job: run_batch(items, job.add_item, notebook_id))
+    return jsonify(job.to_dict()), 202
+
+
+def _retrieve_chat_context(notebook_id, source_ids, query):
+    # Top passages from the notebook's retrieval index for the selected sources, grouped by
+    # source. Sources missing from the index but present in the notebook store contribute
+    # their stored summary instead. Of several near-duplicate sources only the first is used.
+    source_ids = dedup.collapse_duplicates(notebook_id, source_ids)
+    try:
+        indexed = indexed_source_ids(notebook_id, source_ids)
+        passages = []
+        if indexed:
+            passages = search(notebook_id, query, list(indexed)) or source_overview(notebook_id, list(indexed))
+        missing = [source_id for source_id in source_ids if source_id not in indexed]
+        stored = [s["summary"] for s in store.get_sources(notebook_id, missing) if s["summary"]]
+    except sqlite3.Error as e:
+        logger.warning("Retrieval index unavailable for notebook %s: %s", notebook_id, e)
+        return []
+    return _format_passages(passages) + stored
+
+
+def _format_passages(passages):
+    # Groups passages by source (best-scoring source first) under the source's name.
+    grouped = {}
+    for passage in passages:
+        grouped.setdefault(passage["source_id"], (passage["source_name"], []))[1].append(passage["text"])
+    return [f"Source: {name}\n" + "\n\n".join(texts) for name, texts in grouped.values()]
+
+
+def build_chat_messages(data):
+    # Messages for the model: the conversation (older turns folded into a summary when it
+    # is long) followed by the system prompt carrying the retrieved context. Shared with the
+    # async /chat in routes/async_api.py. Blocks on SQLite and, every few turns of a long
+    # conversation, on one summarization call.
     user_message_content = data['message'] # Content of the latest message
     summaries = data.get('summaries', [])
     chat_history_from_request = data.get('chat_history', [])
 
-    print(data) # For debugging
-    print("&&&&&&&&&"*100)
-    client = openai.OpenAI(
-        api_key=os.environ.get("OPENAI_API_KEY"),
-        base_url=os.environ.get("OPENAI_BASE_URL")
-    )
-    print(f"summaries:{summaries}\n\n")
-    print(f"****************\nchat_history:{chat_history_from_request}\n\n*********************")
-    if not client.api_key:
-        return jsonify({"error": "OpenAI API key not configured."}), 500
+    notebook_id = data.get('notebook_id')
+    source_ids = data.get('source_ids') or []
+    context_parts = []
+    if notebook_id and source_ids:
+        # Include the previous user turn so follow-up questions ("and the second one?") still match.
+        user_turns = [m.get('text') for m in chat_history_from_request if m.get('sender') == 'user' and m.get('text')]
+        query = " ".join(user_turns[-2:-1] + [user_message_content])
+        context_parts = _retrieve_chat_context(notebook_id, source_ids, query)
+    context_parts += summaries
 
     context_str = ""
-    if summaries:
-        context_str = "Relevant context from selected sources:\n" + "\n\n---\n\n".join(summaries)
+    if context_parts:
+        context_str = "Relevant context from selected sources:\n" + "\n\n---\n\n".join(context_parts)
         context_str += "\n\n---\n\nBased on the above context, and your general knowledge, please answer the following question."
     else:
         context_str = "You are a helpful AI assistant. Please answer the following question."
@@ -202,107 +309,233 @@ def chat_route():
         role = "user" if msg.get('sender') == 'user' else "assistant" if msg.get('sender') == 'ai' else None
         if role and msg.get('text'):
             transformed_history.append({"role": role, "content": msg['text']})
-        # Basic validation: ensure the last message in history is the user_message_content
 
-    # Ensure transformed_history is not empty and the last message is from the user, if it's not empty.
-    # The frontend sends the user message as the last one in chat_history.
-    # So, user_message_content should match transformed_history[-1]['content'] if role is user.
+    # The frontend sends the user message as the last one in chat_history, so the history is
+    # trusted as complete. Long conversations are cut to a token budget: older turns are
+    # replaced by a running summary.
+    messages_for_openai = build_history(transformed_history) + [system_prompt_message]
+    logger.debug("Chat request: %d context parts, %d history messages, %d messages sent",
+                 len(context_parts), len(chat_history_from_request), len(messages_for_openai))
+    return messages_for_openai
+
+
+# --- Route for /chat (Moved from app.py) ---
+# Context comes from the notebook's retrieval index when "notebook_id" and "source_ids"
+# (ids returned by the summarize routes) are given: only the passages most relevant to the
+# latest question are sent, so the prompt does not grow with the number of sources.
+# "summaries" is still accepted for sources that are neither indexed nor stored server-side.
+@api_bp.route('/chat', methods=['POST'])
+def chat_route():
+    data = request.get_json()
+    if not data or 'message' not in data: # 'message' is still sent, can be used for logging or as a fallback.
+        return jsonify({"error": "Message is required"}), 400
 
-    messages_for_openai = transformed_history+ [system_prompt_message]
+    if get_openai_client() is None:
+        return jsonify({"error": "OpenAI API key not configured."}), 500
 
-    print(f"********\n messages_for_openai:{messages_for_openai}\n")
-    # Safety check: if transformed_history is empty or doesn't end with the user's latest message,
-    # it might indicate an issue. However, based on frontend changes, it should be correct.
-    # For robustness, one could add:
-    # if not transformed_history or \
-    #   (transformed_history[-1]['role'] == 'user' and transformed_history[-1]['content'] != user_message_content) or \
-    #   transformed_history[-1]['role'] != 'user':
-    #    # This case should ideally not happen with the new frontend logic.
-    #    # If it does, we might fall back to the old behavior or add the user_message_content explicitly.
-    #    # For now, trust the frontend sends the complete history.
-    #    pass
+    messages_for_openai = build_chat_messages(data)
 
+    if wants_stream(data):
+        def events():
+            yield format_sse({}, event="start")
+            parts = []
+            try:
+                for delta in stream_chat_completion("chat", messages=messages_for_openai, temperature=0.7):
+                    parts.append(delta)
+                    yield format_sse({"text": delta}, event="delta")
+            except Exception as e:
+                logger.exception("Error during streamed chat")
+                yield error_frame(f"Chat service error: {str(e)}", e)
+                return
+            yield format_sse({"reply": "".join(parts)}, event="done")
+        return sse_response(events())
 
     try:
-        completion = client.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL"),
+        completion = create_chat_completion(
+            "chat",
             messages=messages_for_openai, # Use the fully constructed message list
             temperature=0.7
         )
         reply = completion.choices[0].message.content
         return jsonify({"reply": reply})
+    except LLMOverloadedError as e:
+        return overloaded_response(e)
     except openai.OpenAIError as oae:
-        print(f"OpenAI API error during chat: {oae}")
+        logger.warning("OpenAI API error during chat: %s", oae)
         return jsonify({"error": f"Chat service error: {str(oae)}"}), 500
     except Exception as e:
-        print(f"Unexpected error during chat: {e}")
+        logger.exception("Unexpected error during chat")
         return jsonify({"error": f"An unexpected error occurred in chat: {str(e)}"}), 500
 
+
+def resolve_report_request(data):
+    # Either {"summary_text", "title"} or {"notebook_id", "source_id"} for a source in the
+    # notebook store, plus an optional "theme" (see utils/report.THEMES). Returns
+    # ((title, summary_text, stored_source or None, theme), None) or
+    # (None, (error message, HTTP status)). Shared with routes/async_api.py.
+    stored_source = None
+    if data and data.get('notebook_id') and data.get('source_id'):
+        stored_source = store.get_source(data['notebook_id'], data['source_id'])
+        if stored_source is None:
+            return None, ("Source not found", 404)
+        data.setdefault('summary_text', stored_source['summary'])
+        data.setdefault('title', stored_source['name'])
+    if not data or 'summary_text' not in data or 'title' not in data: # Ensure title is also required
+        return None, ("summary_text and title are required", 400)
+    theme, error = resolve_report_theme(data)
+    if error:
+        return None, error
+    return (data['title'], data['summary_text'], stored_source, theme), None
+
+
+def resolve_report_theme(data):
+    # (theme, None) or (None, (error message, HTTP status)).
+    theme = data.get('theme') or config.REPORT_DEFAULT_THEME
+    if theme not in report.THEMES:
+        return None, (f"Unknown theme '{theme}' (available: {', '.join(report.THEMES)})", 400)
+    return theme, None
+
+
+def save_source_report(stored_source, title, html_content):
+    if stored_source is not None:
+        store.save_report(stored_source['notebook_id'], stored_source['id'], title, html_content)
+
+
 # --- Route for /generate-html-report (Moved from app.py) ---
+# See resolve_report_request for the request body. The model writes the report content
+# as JSON cards once; the HTML is rendered locally (utils/report.py), and both are cached,
+# so reopening or re-theming a report answers immediately ("cached": true) without tokens.
+# For a stored source the report is saved with it (GET /notebooks/<id>/sources/<source_id>/report).
 @api_bp.route('/generate-html-report', methods=['POST'])
 def generate_html_report_route():
     data = request.get_json()
-    if not data or 'summary_text' not in data or 'title' not in data: # Ensure title is also required
-        return jsonify({"error": "summary_text and title are required"}), 400
-
-    summary_text = data['summary_text']
-    title = data['title']
-    print(summary_text)
-    print("\n\n\n")
-    client = openai.OpenAI(
-        api_key=os.environ.get("OPENAI_API_KEY"),
-        base_url=os.environ.get("OPENAI_BASE_URL")
-    )
-    if not client.api_key:
+    fields, error = resolve_report_request(data)
+    if error:
+        return jsonify({"error": error[0]}), error[1]
+    title, summary_text, stored_source, theme = fields
+
+    html_content = report.get_cached_report(title, summary_text, theme)
+    if html_content is not None:
+        save_source_report(stored_source, title, html_content)
+        if wants_stream(data):
+            return sse_response(iter([
+                format_sse({"title": title}, event="start"),
+                format_sse({"html_content": html_content, "cached": True}, event="done"),
+            ]))
+        return jsonify({"html_content": html_content, "cached": True})
+
+    if get_openai_client() is None:
         return jsonify({"error": "OpenAI API key not configured."}), 500
 
-    # Updated prompt to be more aligned with what was in app.py for HTML generation
-    prompt = f"""Generate a complete HTML document from the following text. The HTML should be well-structured, easy to read, and visually presentable for a report. Use the title '{title}' for the document <title> tag and as a main heading (e.g., <h1>). Here is the content: {summary_text},设计要求：
-1. 使用 Bento Grid 布局：创建一个由不同大小卡片组成的网格，每个卡片包含特定类别的信息，整体布局要紧凑但不拥挤
-2. 卡片设计：所有卡片应有明显圆角（20px 边框半径），白色/浅灰背景，细微的阴影效果，悬停时有轻微上浮动效果
-3. 色彩方案：使用简约配色方案，主要为白色/浅灰色背景，搭配渐变色作为强调色（可指定具体颜色，如从浅紫 #C084FC 到深紫 #7E22CE）
-4. 排版层次：
-- 大号粗体数字/标题：使用渐变色强调关键数据点和主要标题
-- 中等大小标题：用于卡片标题，清晰表明内容类别
-- 小号文本：用灰色呈现支持性描述文字
-5. 内容组织：
-- 顶部行：主要公告、产品特色、性能指标或主要卖点
-- 中间行：产品规格、技术细节、功能特性
-- 底部行：使用指南和结论/行动号召
-6. 视觉元素：
-- 使用简单图标表示各项特性
-- 进度条或图表展示比较数据
-- 网格和卡片布局创造视觉节奏
-- 标签以小胶囊形式展示分类信息
-7. 响应式设计：页面应能适应不同屏幕尺寸，在移动设备上保持良好的可读性
-设计风格参考：
-- 整体设计风格类似苹果官网产品规格页面
-- 使用大量留白和简洁的视觉元素
-- 强调数字和关键特性，减少冗长文字
-- 使用渐变色突出重要数据
-- 卡片间有适当间距，创造清晰的视觉分隔
-##输出规范:
-    只输出代码内容,不要输出其他任何文字信息。在输出代码内容时，错误输出格式: ```html XXX(html代码) ```   正确输出：XXX(html代码)
-"""
-    try:
-        completion = client.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL"), # Ensure OPENAI_MODEL is set in .env
-            messages=[
-                {"role": "system", "content": "You are an expert HTML generator. Please create a valid and well-formatted HTML document based on the user's request. Ensure the output is a full HTML document starting with <!DOCTYPE html> and includes html, head, and body tags. Apply simple inline CSS for a clean, professional look, focusing on readability."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3
-        )
-        html_content = completion.choices[0].message.content
+    report_messages = report.build_cards_messages(title, summary_text)
 
-        if not (html_content.strip().lower().startswith("<!doctype html")):
-            print(f"LLM did not return a valid HTML document. Response: {html_content[:200]}...")
-            return jsonify({'error': 'LLM did not return a valid HTML document structure. Received: ' + html_content[:100] + "..."}), 500
+    if wants_stream(data):
+        def events():
+            yield format_sse({"title": title}, event="start")
+            parts = []
+            try:
+                for delta in stream_chat_completion("report_cards", messages=report_messages, **report.completion_options()):
+                    parts.append(delta)
+                    yield format_sse({"text": delta}, event="delta")
+                html_content = report.finish_report(title, summary_text, theme, "".join(parts))
+            except Exception as e:
+                logger.exception("Error during streamed HTML report generation")
+                yield error_frame(f"HTML report generation service error: {str(e)}", e)
+                return
+            save_source_report(stored_source, title, html_content)
+            yield format_sse({"html_content": html_content, "cached": False}, event="done")
+        return sse_response(events())
 
-        return jsonify({"html_content": html_content})
+    try:
+        completion = create_chat_completion("report_cards", messages=report_messages, **report.completion_options())
+        html_content = report.finish_report(title, summary_text, theme, completion.choices[0].message.content)
+        save_source_report(stored_source, title, html_content)
+        return jsonify({"html_content": html_content, "cached": False})
+    except report.ReportError as report_error:
+        logger.warning("Could not build a report for '%s': %s", title, report_error)
+        return jsonify({"error": f"HTML report generation failed: {str(report_error)}"}), 500
+    except LLMOverloadedError as e:
+        return overloaded_response(e)
     except openai.OpenAIError as oae:
-        print(f"OpenAI API error during HTML report generation: {oae}")
+        logger.warning("OpenAI API error during HTML report generation: %s", oae)
         return jsonify({"error": f"HTML report generation service error: {str(oae)}"}), 500
     except Exception as e:
-        print(f"Unexpected error during HTML report generation: {e}")
-        return jsonify({"error": f"An unexpected error occurred in HTML report generation: {str(e)}"}), 500
\ No newline at end of file
+        logger.exception("Unexpected error during HTML report generation")
+        return jsonify({"error": f"An unexpected error occurred in HTML report generation: {str(e)}"}), 500
+
+
+# --- Route for /generate-notebook-report: one report across a notebook's sources ---
+# JSON {"notebook_id", optional "source_ids" (default: the sources selected for chat),
+# "title" (default: the notebook title), "theme"}. Each source is condensed into a cached
+# digest (generated in parallel for new sources only), then one synthesis call writes the
+# report from the digests (utils/synthesis.py). Responds like /generate-html-report, plus
+# "sources" (how many were used) and "new_digests" (how many digests had to be generated).
+@api_bp.route('/generate-notebook-report', methods=['POST'])
+def generate_notebook_report_route():
+    data = request.get_json(silent=True) or {}
+    notebook_id = data.get('notebook_id')
+    if not notebook_id:
+        return jsonify({"error": "notebook_id is required"}), 400
+    notebook = store.get_notebook(notebook_id)
+    if notebook is None:
+        return jsonify({"error": "Notebook not found"}), 404
+    theme, error = resolve_report_theme(data)
+    if error:
+        return jsonify({"error": error[0]}), error[1]
+    sources = synthesis.notebook_sources(notebook_id, data.get('source_ids'))
+    if not sources:
+        return jsonify({"error": "The notebook has no summarized sources to report on"}), 400
+    if get_openai_client() is None:
+        return jsonify({"error": "OpenAI API key not configured."}), 500
+    title = data.get('title') or notebook['title']
+
+    if wants_stream(data):
+        return sse_response(_notebook_report_events(title, sources, theme))
+
+    try:
+        digests, new_digests = synthesis.source_digests(sources)
+        synthesis_text = synthesis.synthesis_text(sources, digests)
+        fields = {"sources": len(sources), "new_digests": new_digests}
+        html_content = report.get_cached_report(title, synthesis_text, theme, synthesis.SYNTHESIS_PROMPT_VERSION, "synthesis")
+        if html_content is not None:
+            return jsonify(dict(fields, html_content=html_content, cached=True))
+        completion = create_chat_completion("synthesis", messages=synthesis.build_synthesis_messages(title, synthesis_text, len(sources)),
+                                            **report.completion_options())
+        html_content = report.finish_report(title, synthesis_text, theme, completion.choices[0].message.content,
+                                            synthesis.SYNTHESIS_PROMPT_VERSION, "synthesis")
+        return jsonify(dict(fields, html_content=html_content, cached=False))
+    except report.ReportError as report_error:
+        logger.warning("Could not build a notebook report for '%s': %s", title, report_error)
+        return jsonify({"error": f"Notebook report generation failed: {str(report_error)}"}), 500
+    except LLMOverloadedError as e:
+        return overloaded_response(e)
+    except openai.OpenAIError as oae:
+        logger.warning("OpenAI API error during notebook report generation: %s", oae)
+        return jsonify({"error": f"Notebook report generation service error: {str(oae)}"}), 500
+    except Exception as e:
+        logger.exception("Unexpected error during notebook report generation")
+        return jsonify({"error": f"An unexpected error occurred in notebook report generation: {str(e)}"}), 500
+
+
+def _notebook_report_events(title, sources, theme):
+    # The start frame goes out before the digests are generated.
+    yield format_sse({"title": title, "sources": len(sources)}, event="start")
+    try:
+        digests, new_digests = synthesis.source_digests(sources)
+        synthesis_text = synthesis.synthesis_text(sources, digests)
+        fields = {"sources": len(sources), "new_digests": new_digests}
+        html_content = report.get_cached_report(title, synthesis_text, theme, synthesis.SYNTHESIS_PROMPT_VERSION, "synthesis")
+        if html_content is not None:
+            yield format_sse(dict(fields, html_content=html_content, cached=True), event="done")
+            return
+        parts = []
+        for delta in stream_chat_completion("synthesis", messages=synthesis.build_synthesis_messages(title, synthesis_text, len(sources)),
+                                            **report.completion_options()):
+            parts.append(delta)
+            yield format_sse({"text": delta}, event="delta")
+        html_content = report.finish_report(title, synthesis_text, theme, "".join(parts), synthesis.SYNTHESIS_PROMPT_VERSION, "synthesis")
+    except Exception as e:
+        logger.exception("Error during streamed notebook report generation")
+        yield error_frame(f"Notebook report generation service error: {str(e)}", e)
+        return
+    yield format_sse(dict(fields, html_content=html_content, cached=False), event="done")
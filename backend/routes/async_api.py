@@ -0,0 +1,287 @@
+import asyncio
+import json
+import logging
+import time
+from urllib.parse import parse_qs
+
+import config
+from routes.api import build_chat_messages, error_frame, resolve_report_request, save_source_report
+from utils import dedup, metrics, report
+from utils.compression import compress, negotiate
+from utils.ingest import IngestionError, aload_website, arecord_source, asummarize_source
+from utils.lazy import lazy_import
+from utils.llm_client import acreate_chat_completion, astream_chat_completion, get_async_openai_client
+from utils.llm_scheduler import BULK, INTERACTIVE, STANDARD, LLMOverloadedError, admit, client_id, release
+from utils.sse import format_sse
+from utils.summarizer import astream_detailed_summary_with_ai
+
+openai = lazy_import("openai", "llm")
+
+# Native ASGI versions of the LLM-bound routes, served by asgi.py in front of the Flask app.
+# Request bodies, responses and SSE frames are the same as the Flask views in
+# routes/api.py (which share their prompt building with these), but waiting on the model
+# or on a fetched page is an await instead of a blocked thread, so one worker process can
+# keep hundreds of LLM calls in flight. Blocking helpers (SQLite, parsing, chat memory)
+# run on the event loop's thread pool.
+
+logger = logging.getLogger(__name__)
+
+_CORS_HEADERS = [(b"access-control-allow-origin", b"*")]
+
+
+class AsyncRequest:
+    def __init__(self, scope, receive):
+        self.scope = scope
+        self.receive = receive
+        self.query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        self.headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+
+    async def json(self):
+        # Parsed JSON body, or None when the body is missing or not JSON (like get_json(silent=True)).
+        chunks = []
+        while True:
+            message = await self.receive()
+            if message["type"] == "http.disconnect":
+                return None
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        try:
+            return json.loads(b"".join(chunks) or b"null")
+        except ValueError:
+            return None
+
+    def wants_stream(self, data=None):
+        # Same opt-in rules as utils/sse.wants_stream.
+        if self.query.get("stream", [""])[0].lower() in ("1", "true", "yes"):
+            return True
+        if isinstance(data, dict) and data.get("stream") is True:
+            return True
+        return "text/event-stream" in self.headers.get("accept", "")
+
+
+async def _send_json(send, payload, status=200, accept_encoding=None, extra_headers=()):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = [(b"content-type", b"application/json")] + list(extra_headers)
+    # Compressed like the Flask views' JSON (utils/compression.compress_responses).
+    if config.RESPONSE_COMPRESSION_ENABLED and len(body) >= config.RESPONSE_COMPRESSION_MIN_BYTES:
+        headers.append((b"vary", b"Accept-Encoding"))
+        encoding = negotiate(accept_encoding)
+        if encoding is not None:
+            body = await asyncio.to_thread(compress, body, encoding)
+            headers.append((b"content-encoding", encoding.encode()))
+            metrics.increment("http_compressed_responses_total", encoding=encoding)
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": headers + [(b"content-length", str(len(body)).encode())] + _CORS_HEADERS,
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _send_events(send, receive, events):
+    # Streams SSE frames; stops generating (closing the model stream) if the client goes away.
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/event-stream; charset=utf-8"), (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no")] + _CORS_HEADERS,
+    })
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        async for frame in events:
+            if disconnected.done():
+                return
+            await send({"type": "http.response.body", "body": frame.encode("utf-8"), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        disconnected.cancel()
+        await events.aclose()
+
+
+def _admit(handler, request, scope):
+    # Admission control as for the Flask views (routes/api.py); returns the client to
+    # release afterwards, or None for routes that are not rate limited.
+    priority = ASYNC_ROUTE_PRIORITIES.get(handler)
+    if priority is None:
+        return None
+    client = client_id(request.headers, (scope.get("client") or (None,))[0])
+    admit(priority, client)
+    return client
+
+
+async def handle_request(handler, scope, receive, send):
+    # Runs one async route. Handlers return (payload, status) or an async generator of SSE frames.
+    start = time.perf_counter()
+    request = AsyncRequest(scope, receive)
+    client = None
+    extra_headers = ()
+    try:
+        client = _admit(handler, request, scope)
+        response = await handler(request)
+    except LLMOverloadedError as e:
+        response = {"error": str(e), "retry_after": e.retry_after}, 429
+        extra_headers = [(b"retry-after", str(e.retry_after).encode())]
+    except Exception as e:
+        logger.exception("Unhandled error in %s", scope["path"])
+        response = {"error": f"An unexpected error occurred: {str(e)}"}, 500
+    status = response[1] if isinstance(response, tuple) else 200
+    try:
+        if isinstance(response, tuple):
+            await _send_json(send, *response, accept_encoding=request.headers.get("accept-encoding"),
+                             extra_headers=extra_headers)
+        else:
+            await _send_events(send, receive, response)
+    finally:
+        if client is not None:
+            release(client)
+        metrics.observe("http_request_seconds", time.perf_counter() - start, route=scope["path"], method=scope["method"])
+        metrics.increment("http_requests_total", route=scope["path"], method=scope["method"], status=status)
+
+
+# --- POST /summarize-website ---
+async def _summary_events(text_content, doc_name, result_fields, notebook_id=None, url=None):
+    yield format_sse({"name": result_fields.get("name"), "type": result_fields.get("type")}, event="start")
+    signature, duplicate = await asyncio.to_thread(dedup.check, text_content, notebook_id)
+    reused = dedup.reusable_summary(duplicate)
+    parts = []
+    try:
+        if reused is not None:
+            parts.append(reused)
+            yield format_sse({"text": reused}, event="delta")
+        else:
+            async for delta in astream_detailed_summary_with_ai(text_content, document_name=doc_name):
+                parts.append(delta)
+                yield format_sse({"text": delta}, event="delta")
+    except Exception as e:
+        logger.exception("Error streaming summary for '%s'", doc_name)
+        yield error_frame(str(e), e)
+        return
+    result = await arecord_source(dict(result_fields, summary="".join(parts).strip()), notebook_id, url, signature, duplicate)
+    yield format_sse(result, event="done")
+
+
+async def summarize_website(request):
+    data = await request.json()
+    if not data or 'url' not in data:
+        return {"error": "URL is required"}, 400
+    url = data['url']
+    try:
+        website_title, extracted_text = await aload_website(url)
+        if request.wants_stream(data):
+            return _summary_events(extracted_text, website_title, {"name": website_title, "type": "website", "original_content": extracted_text}, data.get('notebook_id'), url)
+        return await asummarize_source(extracted_text, website_title, 'website', data.get('notebook_id'), url), 200
+    except IngestionError as ie:
+        return {"error": str(ie)}, ie.status_code
+    except openai.OpenAIError as oae:
+        logger.warning("OpenAI API error for %s: %s", url, oae)
+        return {"error": f"Summarization service error: {str(oae)}"}, 500
+
+
+# --- POST /chat ---
+async def _chat_events(messages):
+    yield format_sse({}, event="start")
+    parts = []
+    try:
+        async for delta in astream_chat_completion("chat", messages=messages, temperature=0.7):
+            parts.append(delta)
+            yield format_sse({"text": delta}, event="delta")
+    except Exception as e:
+        logger.exception("Error during streamed chat")
+        yield error_frame(f"Chat service error: {str(e)}", e)
+        return
+    yield format_sse({"reply": "".join(parts)}, event="done")
+
+
+async def chat(request):
+    data = await request.json()
+    if not data or 'message' not in data:
+        return {"error": "Message is required"}, 400
+    if get_async_openai_client() is None:
+        return {"error": "OpenAI API key not configured."}, 500
+
+    messages = await asyncio.to_thread(build_chat_messages, data)
+    if request.wants_stream(data):
+        return _chat_events(messages)
+    try:
+        completion = await acreate_chat_completion("chat", messages=messages, temperature=0.7)
+        return {"reply": completion.choices[0].message.content}, 200
+    except openai.OpenAIError as oae:
+        logger.warning("OpenAI API error during chat: %s", oae)
+        return {"error": f"Chat service error: {str(oae)}"}, 500
+
+
+# --- POST /generate-html-report ---
+async def _cached_report_events(title, html_content):
+    yield format_sse({"title": title}, event="start")
+    yield format_sse({"html_content": html_content, "cached": True}, event="done")
+
+
+async def _report_events(report_messages, title, summary_text, stored_source, theme):
+    yield format_sse({"title": title}, event="start")
+    parts = []
+    try:
+        async for delta in astream_chat_completion("report_cards", messages=report_messages, **report.completion_options()):
+            parts.append(delta)
+            yield format_sse({"text": delta}, event="delta")
+        html_content = await asyncio.to_thread(report.finish_report, title, summary_text, theme, "".join(parts))
+    except Exception as e:
+        logger.exception("Error during streamed HTML report generation")
+        yield error_frame(f"HTML report generation service error: {str(e)}", e)
+        return
+    await asyncio.to_thread(save_source_report, stored_source, title, html_content)
+    yield format_sse({"html_content": html_content, "cached": False}, event="done")
+
+
+async def generate_html_report(request):
+    data = await request.json()
+    fields, error = await asyncio.to_thread(resolve_report_request, data)
+    if error:
+        return {"error": error[0]}, error[1]
+    title, summary_text, stored_source, theme = fields
+
+    html_content = await asyncio.to_thread(report.get_cached_report, title, summary_text, theme)
+    if html_content is not None:
+        await asyncio.to_thread(save_source_report, stored_source, title, html_content)
+        if request.wants_stream(data):
+            return _cached_report_events(title, html_content)
+        return {"html_content": html_content, "cached": True}, 200
+
+    if get_async_openai_client() is None:
+        return {"error": "OpenAI API key not configured."}, 500
+
+    report_messages = report.build_cards_messages(title, summary_text)
+    if request.wants_stream(data):
+        return _report_events(report_messages, title, summary_text, stored_source, theme)
+    try:
+        completion = await acreate_chat_completion("report_cards", messages=report_messages, **report.completion_options())
+        html_content = await asyncio.to_thread(report.finish_report, title, summary_text, theme,
+                                               completion.choices[0].message.content)
+        await asyncio.to_thread(save_source_report, stored_source, title, html_content)
+        return {"html_content": html_content, "cached": False}, 200
+    except report.ReportError as report_error:
+        logger.warning("Could not build a report for '%s': %s", title, report_error)
+        return {"error": f"HTML report generation failed: {str(report_error)}"}, 500
+    except openai.OpenAIError as oae:
+        logger.warning("OpenAI API error during HTML report generation: %s", oae)
+        return {"error": f"HTML report generation service error: {str(oae)}"}, 500
+
+
+# (method, path) -> handler. Anything else (including CORS preflight) goes to the Flask app.
+ASYNC_ROUTES = {
+    ("POST", "/summarize-website"): summarize_website,
+    ("POST", "/chat"): chat,
+    ("POST", "/generate-html-report"): generate_html_report,
+}
+
+# Priority class of each route for admission control (see utils/llm_scheduler.py).
+ASYNC_ROUTE_PRIORITIES = {
+    summarize_website: BULK,
+    chat: INTERACTIVE,
+    generate_html_report: STANDARD,
+}
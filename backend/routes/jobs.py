@@ -0,0 +1,90 @@
+import hashlib
+
+from flask import Blueprint, request, jsonify
+
+from utils.ingest import ALLOWED_FILE_EXTENSIONS, ingest_file, ingest_website, ingest_youtube
+from utils.jobs import get_job_manager
+from utils.sse import format_sse, sse_response
+
+jobs_bp = Blueprint('jobs_bp', __name__)
+
+# Seconds between keep-alive comments on an idle progress stream.
+_EVENTS_KEEPALIVE_SECONDS = 15
+
+
+# --- Route for POST /jobs: submit an ingestion and return immediately ---
+# JSON body: {"type": "youtube" | "website", "url": "..."}
+# or multipart form with a "file" field (type "file").
+# An optional "notebook_id" adds the finished source to that notebook's retrieval index.
+@jobs_bp.route('/jobs', methods=['POST'])
+def submit_job_route():
+    manager = get_job_manager()
+
+    if 'file' in request.files:
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No selected file'}), 400
+        if not file.filename.lower().endswith(ALLOWED_FILE_EXTENSIONS):
+            return jsonify({'error': f'Invalid file type, please upload a {", ".join(ALLOWED_FILE_EXTENSIONS)} file'}), 400
+        # The upload is only readable during the request, so read it before handing off.
+        data = file.read()
+        filename = file.filename
+        notebook_id = request.form.get('notebook_id')
+        job, deduplicated = manager.submit(
+            'file', (notebook_id, hashlib.sha256(data).hexdigest()),
+            lambda job: ingest_file(filename, data, job.set_stage, notebook_id)
+        )
+    else:
+        data = request.get_json(silent=True) or {}
+        source_type = data.get('type')
+        url = (data.get('url') or '').strip()
+        notebook_id = data.get('notebook_id')
+        if source_type not in ('youtube', 'website'):
+            return jsonify({'error': "type must be 'youtube' or 'website' (or upload a file)"}), 400
+        if not url:
+            return jsonify({'error': 'url is required'}), 400
+        target = ingest_youtube if source_type == 'youtube' else ingest_website
+        job, deduplicated = manager.submit(
+            source_type, (notebook_id, url), lambda job: target(url, job.set_stage, notebook_id)
+        )
+
+    response = job.to_dict()
+    response['deduplicated'] = deduplicated
+    return jsonify(response), 202
+
+
+# --- Route for GET /jobs/<job_id>: poll status ---
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job_route(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+
+# --- Route for GET /jobs/<job_id>/events: subscribe to progress (SSE) ---
+# Sends a "progress" frame on every stage change and ends with "done" or "error".
+@jobs_bp.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events_route(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def events():
+        last_version = None
+        while True:
+            version = job.wait_for_change(last_version, timeout=_EVENTS_KEEPALIVE_SECONDS)
+            if version == last_version:
+                yield ": keep-alive\n\n"
+                continue
+            last_version = version
+            snapshot = job.to_dict()
+            if job.finished:
+                if snapshot['status'] == 'succeeded':
+                    yield format_sse(snapshot, event="done")
+                else:
+                    yield format_sse(dict(snapshot, status_code=job.error_status_code), event="error")
+                return
+            yield format_sse(snapshot, event="progress")
+
+    return sse_response(events())
@@ -0,0 +1,11 @@
+from flask import Blueprint, Response
+
+from utils.metrics import render_prometheus
+
+metrics_bp = Blueprint('metrics_bp', __name__)
+
+
+# Counters and latency histograms in the Prometheus text exposition format (utils/metrics.py).
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics_route():
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
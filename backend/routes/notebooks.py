@@ -0,0 +1,156 @@
+from flask import Blueprint, request, jsonify
+
+from utils import dedup, store
+from utils.ingest import record_source
+from utils.retrieval import remove_source
+
+notebooks_bp = Blueprint('notebooks_bp', __name__)
+
+# CRUD for notebooks, their sources and saved HTML reports (utils/store.py).
+# List routes are paginated with ?limit=&offset= and return
+# {"items": [...], "total": n, "limit": l, "offset": o}.
+
+
+def _page():
+    return store.clamp_page(request.args.get('limit'), request.args.get('offset'))
+
+
+def _paginated(items, total, limit, offset):
+    return jsonify({"items": items, "total": total, "limit": limit, "offset": offset})
+
+
+# --- Notebooks ---
+@notebooks_bp.route('/notebooks', methods=['GET'])
+def list_notebooks_route():
+    try:
+        limit, offset = _page()
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    items, total = store.list_notebooks(limit, offset)
+    return _paginated(items, total, limit, offset)
+
+
+@notebooks_bp.route('/notebooks', methods=['POST'])
+def create_notebook_route():
+    data = request.get_json(silent=True) or {}
+    title = data.get('title')
+    if not isinstance(title, str) or not title.strip():
+        return jsonify({"error": "title is required"}), 400
+    return jsonify(store.create_notebook(title.strip())), 201
+
+
+@notebooks_bp.route('/notebooks/<notebook_id>', methods=['GET'])
+def get_notebook_route(notebook_id):
+    notebook = store.get_notebook(notebook_id)
+    if notebook is None:
+        return jsonify({"error": "Notebook not found"}), 404
+    return jsonify(notebook)
+
+
+# JSON body with any of: "title", "chat_history" (list of chat messages).
+@notebooks_bp.route('/notebooks/<notebook_id>', methods=['PATCH'])
+def update_notebook_route(notebook_id):
+    data = request.get_json(silent=True) or {}
+    title = data.get('title')
+    if title is not None and (not isinstance(title, str) or not title.strip()):
+        return jsonify({"error": "title must be a non-empty string"}), 400
+    chat_history = data.get('chat_history')
+    if chat_history is not None and not isinstance(chat_history, list):
+        return jsonify({"error": "chat_history must be a list"}), 400
+    notebook = store.update_notebook(notebook_id, title=title.strip() if title is not None else None,
+                                     chat_history=chat_history)
+    if notebook is None:
+        return jsonify({"error": "Notebook not found"}), 404
+    return jsonify(notebook)
+
+
+@notebooks_bp.route('/notebooks/<notebook_id>', methods=['DELETE'])
+def delete_notebook_route(notebook_id):
+    source_ids = store.delete_notebook(notebook_id)
+    if source_ids is None:
+        return jsonify({"error": "Notebook not found"}), 404
+    for source_id in source_ids:
+        remove_source(notebook_id, source_id)
+        dedup.forget_source(notebook_id, source_id)
+    return '', 204
+
+
+# --- Sources ---
+# Listings include the summary but not original_content; GET a single source with
+# ?include_content=1 for that.
+@notebooks_bp.route('/notebooks/<notebook_id>/sources', methods=['GET'])
+def list_sources_route(notebook_id):
+    if store.get_notebook(notebook_id) is None:
+        return jsonify({"error": "Notebook not found"}), 404
+    try:
+        limit, offset = _page()
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    items, total = store.list_sources(notebook_id, limit, offset)
+    return _paginated(items, total, limit, offset)
+
+
+# Adds an already summarized source (e.g. when importing notebooks kept in the browser).
+# JSON body: {"type", "name", "summary", "original_content", "url"}.
+# New sources are normally added by the summarize routes with a "notebook_id".
+@notebooks_bp.route('/notebooks/<notebook_id>/sources', methods=['POST'])
+def add_source_route(notebook_id):
+    if store.get_notebook(notebook_id) is None:
+        return jsonify({"error": "Notebook not found"}), 404
+    data = request.get_json(silent=True) or {}
+    if not data.get('name') or not data.get('summary'):
+        return jsonify({"error": "name and summary are required"}), 400
+    result = record_source({
+        'summary': data['summary'],
+        'original_content': data.get('original_content') or '',
+        'name': data['name'],
+        'type': data.get('type') or 'file',
+    }, notebook_id, data.get('url'))
+    if 'source_id' not in result:
+        return jsonify({"error": "Failed to save source"}), 500
+    return jsonify(store.get_source(notebook_id, result['source_id'])), 201
+
+
+@notebooks_bp.route('/notebooks/<notebook_id>/sources/<source_id>', methods=['GET'])
+def get_source_route(notebook_id, source_id):
+    include_content = request.args.get('include_content', '').lower() in ('1', 'true', 'yes')
+    source = store.get_source(notebook_id, source_id, include_content=include_content)
+    if source is None:
+        return jsonify({"error": "Source not found"}), 404
+    return jsonify(source)
+
+
+# JSON body with any of: "name", "selected_for_chat".
+@notebooks_bp.route('/notebooks/<notebook_id>/sources/<source_id>', methods=['PATCH'])
+def update_source_route(notebook_id, source_id):
+    data = request.get_json(silent=True) or {}
+    source = store.update_source(notebook_id, source_id, name=data.get('name'),
+                                 selected_for_chat=data.get('selected_for_chat'))
+    if source is None:
+        return jsonify({"error": "Source not found"}), 404
+    return jsonify(source)
+
+
+@notebooks_bp.route('/notebooks/<notebook_id>/sources/<source_id>', methods=['DELETE'])
+def delete_source_route(notebook_id, source_id):
+    if not store.delete_source(notebook_id, source_id):
+        return jsonify({"error": "Source not found"}), 404
+    remove_source(notebook_id, source_id)
+    dedup.forget_source(notebook_id, source_id)
+    return '', 204
+
+
+# --- Reports (saved by /generate-html-report when called with notebook_id and source_id) ---
+@notebooks_bp.route('/notebooks/<notebook_id>/sources/<source_id>/report', methods=['GET'])
+def get_report_route(notebook_id, source_id):
+    report = store.get_report(notebook_id, source_id)
+    if report is None:
+        return jsonify({"error": "Report not found"}), 404
+    return jsonify(report)
+
+
+@notebooks_bp.route('/notebooks/<notebook_id>/sources/<source_id>/report', methods=['DELETE'])
+def delete_report_route(notebook_id, source_id):
+    if not store.delete_report(notebook_id, source_id):
+        return jsonify({"error": "Report not found"}), 404
+    return '', 204
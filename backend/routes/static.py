@@ -1,13 +1,51 @@
-from flask import Blueprint, send_from_directory, current_app
-import os
+from flask import Blueprint, Response, abort, current_app, request, send_file
+
+import config
+from utils import static_assets
+from utils.compression import negotiate
 
 static_bp = Blueprint('static_bp', __name__)
 
+# Serves the React build from the index in utils/static_assets.py: the precompressed
+# representation the client accepts (Vary: Accept-Encoding), a per-representation ETag
+# with 304 answers, and long-lived immutable caching for content-hashed files. Everything
+# else (index.html, manifest, favicon) is revalidated on each use. Paths that are not
+# build files get index.html, so client-side routes can be reloaded.
+
+
+@static_bp.record_once
+def _build_index(state):
+    state.app.extensions['static_assets'] = static_assets.build_index(config.FRONTEND_BUILD_DIR)
+
+
+def _asset_response(asset):
+    available = static_assets.encodings(asset)
+    encoding = negotiate(request.headers.get('Accept-Encoding'), available) if available else None
+    etag = static_assets.etag_for(asset, encoding)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    elif encoding in asset['bodies']:
+        response = Response(asset['bodies'][encoding], mimetype=asset['media_type'])
+    else:
+        path = asset['files'][encoding] if encoding is not None else asset['path']
+        response = send_file(path, mimetype=asset['media_type'], conditional=False, etag=False)
+    if encoding is not None and response.status_code != 304:
+        response.headers['Content-Encoding'] = encoding
+    if available:
+        response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    if asset['immutable']:
+        response.headers['Cache-Control'] = f"public, max-age={config.STATIC_IMMUTABLE_MAX_AGE_SECONDS}, immutable"
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
 @static_bp.route('/', defaults={'path': ''})
 @static_bp.route('/<path:path>')
 def serve_react_app(path):
-    # Use current_app.static_folder to access the app's static folder
-    if path != "" and os.path.exists(os.path.join(current_app.static_folder, path)):
-        return send_from_directory(current_app.static_folder, path)
-    else:
-        return send_from_directory(current_app.static_folder, 'index.html')
+    index = current_app.extensions['static_assets']
+    asset = index.get(path) or index.get(static_assets.INDEX_HTML)
+    if asset is None:
+        abort(404)
+    return _asset_response(asset)
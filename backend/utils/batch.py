@@ -0,0 +1,119 @@
+import asyncio
+import io
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import config
+from utils.extractor import extract_text_from_url_async
+from utils.ingest import IngestionError, load_uploaded_file, load_youtube_transcript, summarize_source
+from utils.lazy import lazy_import
+
+httpx = lazy_import("httpx", "web")
+
+logger = logging.getLogger(__name__)
+
+# Concurrent multi-source import behind POST /summarize-batch.
+# Web pages are downloaded concurrently on one async HTTP client (with a per-host limit),
+# parsed on a small thread pool, and summarized on a pool bounded by BATCH_LLM_CONCURRENCY.
+# Every item is reported through on_result as soon as it finishes, in completion order.
+
+_YOUTUBE_URL_RE = re.compile(r'^(https?://)?(www\.|m\.)?(youtube\.com|youtu\.be)/', re.IGNORECASE)
+
+_pools_lock = threading.Lock()
+_extract_pool = None
+_llm_pool = None
+
+
+def _get_pools():
+    # Process-wide pools, so concurrent batches share the same limits.
+    global _extract_pool, _llm_pool
+    if _llm_pool is None:
+        with _pools_lock:
+            if _llm_pool is None:
+                _extract_pool = ThreadPoolExecutor(max_workers=config.BATCH_EXTRACT_WORKERS, thread_name_prefix="batch-extract")
+                _llm_pool = ThreadPoolExecutor(max_workers=config.BATCH_LLM_CONCURRENCY, thread_name_prefix="batch-llm")
+    return _extract_pool, _llm_pool
+
+
+def url_item(url):
+    return {"kind": "youtube" if _YOUTUBE_URL_RE.match(url) else "url", "source": url}
+
+
+def file_item(filename, data):
+    return {"kind": "file", "source": filename, "data": data}
+
+
+class _HostLimiter:
+    # One semaphore per host so a reading list full of links to one site does not
+    # open BATCH_MAX_CONNECTIONS connections to it at once.
+    def __init__(self, per_host):
+        self._per_host = per_host
+        self._semaphores = {}
+
+    def __call__(self, url):
+        host = urlsplit(url).hostname or ""
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self._per_host)
+        return self._semaphores[host]
+
+
+async def _load_item(item, client, host_limiter, loop, extract_pool):
+    # Returns (name, text, source_type) for one item.
+    if item["kind"] == "file":
+        text = await loop.run_in_executor(extract_pool, load_uploaded_file, item["source"], io.BytesIO(item["data"]))
+        return item["source"], text, "file"
+    if item["kind"] == "youtube":
+        text = await loop.run_in_executor(extract_pool, load_youtube_transcript, item["source"])
+        return item["source"], text, "youtube"
+
+    url = item["source"]
+    try:
+        async with host_limiter(url):
+            title, text = await extract_text_from_url_async(url, client, extract_pool)
+    except ValueError as e:
+        raise IngestionError(str(e))
+    if not text.strip():
+        raise IngestionError("Could not extract meaningful content from the URL.")
+    return title, text, "website"
+
+
+async def _process_item(index, item, client, host_limiter, notebook_id):
+    loop = asyncio.get_running_loop()
+    extract_pool, llm_pool = _get_pools()
+    try:
+        name, text, source_type = await _load_item(item, client, host_limiter, loop, extract_pool)
+        url = None if item["kind"] == "file" else item["source"]
+        result = await loop.run_in_executor(llm_pool, summarize_source, text, name, source_type, notebook_id, url)
+        return dict(result, index=index, source=item["source"], status="ok")
+    except Exception as e:
+        if not isinstance(e, ValueError):
+            logger.exception("Batch item %s failed", item['source'])
+        return {"index": index, "source": item["source"], "status": "error", "error": str(e)}
+
+
+async def _run_batch_async(items, on_result, notebook_id):
+    host_limiter = _HostLimiter(config.BATCH_PER_HOST_CONNECTIONS)
+    limits = httpx.Limits(max_connections=config.BATCH_MAX_CONNECTIONS,
+                          max_keepalive_connections=config.BATCH_MAX_CONNECTIONS)
+    async with httpx.AsyncClient(limits=limits, timeout=config.FETCH_TIMEOUT_SECONDS, follow_redirects=True) as client:
+        tasks = [asyncio.ensure_future(_process_item(i, item, client, host_limiter, notebook_id)) for i, item in enumerate(items)]
+        for finished in asyncio.as_completed(tasks):
+            on_result(await finished)
+
+
+def run_batch(items, on_result, notebook_id=None):
+    # Blocking entry point: runs the whole batch on a private event loop in this thread.
+    # Returns a summary of the outcome; per-item results go to on_result. With notebook_id,
+    # each summarized item is also added to that notebook's retrieval index.
+    results = []
+
+    def collect(result):
+        results.append(result)
+        on_result(result)
+
+    asyncio.run(_run_batch_async(items, collect, notebook_id))
+    succeeded = sum(1 for r in results if r["status"] == "ok")
+    return {"total": len(items), "succeeded": succeeded, "failed": len(items) - succeeded}
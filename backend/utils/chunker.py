@@ -0,0 +1,97 @@
+import re
+from functools import lru_cache
+
+# tiktoken gives exact token counts for OpenAI models. It is optional: without it
+# we fall back to a character-based estimate that is good enough for budgeting.
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# CJK characters are roughly one token each, everything else roughly 4 chars per token.
+_CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+_PARAGRAPH_SPLIT_RE = re.compile(r'\n\s*\n|\n')
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+    except KeyError:
+        # Unknown / non-OpenAI model names (e.g. served through OPENAI_BASE_URL)
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text, model=None):
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    cjk_chars = len(_CJK_RE.findall(text))
+    return cjk_chars + (len(text) - cjk_chars + 3) // 4
+
+
+def truncate_to_tokens(text, max_tokens, model=None):
+    # Cut text down to at most max_tokens. Used for the per-document token budget.
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens])
+    total = count_tokens(text)
+    if total <= max_tokens:
+        return text
+    # Proportional cut on the estimate; slightly conservative so we never overshoot.
+    return text[:int(len(text) * max_tokens / total)]
+
+
+def _hard_split(piece, max_tokens, model):
+    # Split a single oversized paragraph into pieces of at most max_tokens.
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        tokens = encoding.encode(piece, disallowed_special=())
+        return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+    total = count_tokens(piece)
+    step = max(1, int(len(piece) * max_tokens / total))
+    return [piece[i:i + step] for i in range(0, len(piece), step)]
+
+
+def iter_token_chunks(pieces, max_tokens, model=None):
+    """
+    Group an iterable of text pieces (pages, paragraphs, whole documents) into
+    chunks of at most max_tokens, breaking on line boundaries where possible.
+    Pieces are consumed lazily, so callers can stream pages straight in.
+    """
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        if not piece:
+            continue
+        for paragraph in _PARAGRAPH_SPLIT_RE.split(piece):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            paragraph_tokens = count_tokens(paragraph, model)
+            if paragraph_tokens > max_tokens:
+                parts = _hard_split(paragraph, max_tokens, model)
+            else:
+                parts = [paragraph]
+            for part in parts:
+                part_tokens = paragraph_tokens if len(parts) == 1 else count_tokens(part, model)
+                if current and current_tokens + part_tokens > max_tokens:
+                    yield "\n".join(current)
+                    current, current_tokens = [], 0
+                current.append(part)
+                current_tokens += part_tokens
+    if current:
+        yield "\n".join(current)
+
+
+def split_text_into_chunks(text, max_tokens, model=None):
+    return list(iter_token_chunks([text], max_tokens, model))
@@ -0,0 +1,96 @@
+import logging
+
+import config
+from utils import metrics
+from utils.chunker import count_tokens
+from utils.llm_client import create_chat_completion
+from utils.report import loads_lenient, strip_code_fences
+
+# Prompt coalescing for many small, independent prompts of one task (e.g. per-source
+# digests). The Chat Completions API has no multi-prompt requests, so small items are
+# packed LLM_COALESCE_MAX_ITEMS to one request that shares the instruction and answers
+# with a JSON object keyed by item number: fewer requests against the rate limit and the
+# instruction paid once per pack instead of once per item. Items above
+# LLM_COALESCE_MAX_ITEM_TOKENS, and items a packed answer left out, get a request of
+# their own.
+
+logger = logging.getLogger(__name__)
+
+
+def _packs(items):
+    # Lists of item indexes, in order: small items grouped, large ones alone.
+    packs, current = [], []
+    for index, item in enumerate(items):
+        if config.LLM_COALESCE_MAX_ITEMS <= 1 or count_tokens(item) > config.LLM_COALESCE_MAX_ITEM_TOKENS:
+            packs.append([index])
+            continue
+        current.append(index)
+        if len(current) >= config.LLM_COALESCE_MAX_ITEMS:
+            packs.append(current)
+            current = []
+    if current:
+        packs.append(current)
+    return packs
+
+
+def _complete_one(task, instruction, item, temperature, max_tokens):
+    completion = create_chat_completion(
+        task,
+        messages=[{"role": "system", "content": f"{instruction}\n\n{item}"}],
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+    return (completion.choices[0].message.content or "").strip()
+
+
+def _build_pack_prompt(instruction, items):
+    numbered = "\n\n".join(f"### Input {number}\n{item}" for number, item in enumerate(items, start=1))
+    return f"""{instruction}
+
+Do this separately for each of the {len(items)} inputs below. Answer with a single JSON object that maps each input number to its result as a string, e.g. {{"1": "...", "2": "..."}}, and nothing else.
+
+{numbered}
+"""
+
+
+def _complete_pack(task, instruction, items, temperature, max_tokens):
+    if len(items) == 1:
+        return [_complete_one(task, instruction, items[0], temperature, max_tokens)]
+    completion = create_chat_completion(
+        task,
+        messages=[{"role": "system", "content": _build_pack_prompt(instruction, items)}],
+        temperature=temperature,
+        max_tokens=max_tokens * len(items),
+    )
+    try:
+        data = loads_lenient(strip_code_fences(completion.choices[0].message.content))
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        data = {}
+    answers = []
+    for number, item in enumerate(items, start=1):
+        answer = data.get(str(number))
+        if isinstance(answer, str) and answer.strip():
+            answers.append(answer.strip())
+        else:
+            metrics.increment("llm_coalesce_fallbacks_total", task=task)
+            answers.append(_complete_one(task, instruction, item, temperature, max_tokens))
+    metrics.increment("llm_coalesced_items_total", len(items), task=task)
+    return answers
+
+
+def complete_items(task, instruction, items, max_tokens, temperature=0.2, executor=None):
+    # One answer per item (instruction applied to each), in order. max_tokens is per item.
+    # Packs run on executor when given, else one after another. Raises openai.OpenAIError.
+    packs = _packs(items)
+    run = executor.map if executor is not None else map
+    results = [None] * len(items)
+    answers_per_pack = run(
+        lambda pack: _complete_pack(task, instruction, [items[i] for i in pack], temperature, max_tokens), packs)
+    for pack, answers in zip(packs, answers_per_pack):
+        for index, answer in zip(pack, answers):
+            results[index] = answer
+    if len(packs) < len(items):
+        logger.debug("Coalesced %d %s prompts into %d requests", len(items), task, len(packs))
+    return results
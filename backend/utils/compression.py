@@ -0,0 +1,98 @@
+import gzip
+import logging
+
+import config
+from utils import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# HTTP content encoding: Accept-Encoding negotiation and gzip/brotli compression, used for
+# the frontend build (utils/static_assets.py, precompressed once) and for JSON API
+# responses (compressed per response; they carry whole documents and summaries).
+# Brotli is an optional dependency (pip install brotli); without it only gzip is offered,
+# though prebuilt .br files of the frontend are still served.
+
+logger = logging.getLogger(__name__)
+
+# Preference order on equal q-values.
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+FILE_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# Per-response brotli quality: close to gzip -6 in speed, smaller output.
+_BROTLI_DYNAMIC_QUALITY = 5
+
+_COMPRESSIBLE_TYPES = ("application/json", "application/javascript", "application/manifest+json",
+                       "application/xml", "image/svg+xml", "image/x-icon", "application/wasm")
+
+
+def compressible(media_type):
+    media_type = (media_type or "").split(";")[0].strip().lower()
+    return media_type.startswith("text/") or media_type in _COMPRESSIBLE_TYPES
+
+
+def _accepted(accept_encoding):
+    # {coding: q} from an Accept-Encoding header value.
+    accepted = {}
+    for entry in (accept_encoding or "").split(","):
+        coding, _, params = entry.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(accept_encoding, available=ENCODINGS):
+    # The best of the available codings the client accepts, or None for the identity encoding.
+    accepted = _accepted(accept_encoding)
+    best, best_q = None, 0.0
+    for coding in available:
+        q = accepted.get(coding, accepted.get("x-gzip") if coding == "gzip" else None)
+        if q is None:
+            q = accepted.get("*", 0.0)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body, encoding, static=False):
+    # static: the result is kept and served many times, so spend the time for the smallest output.
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if static else _BROTLI_DYNAMIC_QUALITY)
+    return gzip.compress(body, compresslevel=9 if static else config.RESPONSE_COMPRESSION_LEVEL, mtime=0)
+
+
+def compress_responses(app):
+    # Compresses JSON responses for clients that accept it. Streamed (SSE) and file
+    # responses are left alone; static files come precompressed from routes/static.py.
+    # (Flask is imported here, as in utils/metrics.instrument_app.)
+    from flask import request
+
+    @app.after_request
+    def _compress_response(response):
+        if (not config.RESPONSE_COMPRESSION_ENABLED or response.direct_passthrough or response.is_streamed
+                or response.mimetype != "application/json" or "Content-Encoding" in response.headers
+                or response.status_code < 200 or response.status_code in (204, 304)):
+            return response
+        body = response.get_data()
+        if len(body) < config.RESPONSE_COMPRESSION_MIN_BYTES:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = negotiate(request.headers.get("Accept-Encoding"))
+        if encoding is None:
+            return response
+        response.set_data(compress(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+        metrics.increment("http_compressed_responses_total", encoding=encoding)
+        return response
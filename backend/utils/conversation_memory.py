@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import sqlite3
+import time
+
+import config
+from utils import metrics, summary_cache
+from utils.chunker import count_tokens
+from utils.db import get_connection
+from utils.llm_client import create_chat_completion
+from utils.model_router import model_for
+
+# Token-budgeted conversation memory for /chat.
+# The most recent turns are sent verbatim as long as they fit in CHAT_HISTORY_TOKEN_BUDGET.
+# Older turns are folded into a running summary that is stored in its own table
+# (CHAT_MEMORY_PATH), keyed by a fingerprint of the turns it covers. The frontend resends
+# the whole history every turn, so the summary for the longest already-summarized prefix
+# is looked up (one query) and only the turns after it are folded in. The summary is
+# extended in steps: once the verbatim tail exceeds the budget it is cut back to
+# CHAT_HISTORY_RECENT_TOKENS, so there is one summarization call every few turns instead
+# of one per turn.
+
+logger = logging.getLogger(__name__)
+
+MEMORY_PROMPT_VERSION = "memory-v1"
+
+# Per-message overhead of the chat format (role and separators), as counted by OpenAI.
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memory_summaries (
+    key TEXT PRIMARY KEY,
+    covered INTEGER NOT NULL,
+    summary TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_memory_summaries_last_used ON memory_summaries(last_used);
+"""
+
+# Bound on the keys per lookup query (SQLite's parameter limit).
+_LOOKUP_BATCH = 500
+
+
+def _connection():
+    return get_connection(config.CHAT_MEMORY_PATH, _SCHEMA)
+
+
+def message_tokens(message):
+    return count_tokens(message["content"], model_for("chat")) + _MESSAGE_OVERHEAD_TOKENS
+
+
+def _prefix_keys(messages):
+    # keys[i] identifies the summary of messages[:i]; each step extends the previous digest.
+    digest = hashlib.sha256()
+    keys = [None]
+    for message in messages:
+        digest.update(message["role"].encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(message["content"].encode("utf-8"))
+        digest.update(b"\x00")
+        keys.append(summary_cache.make_cache_key(
+            digest.hexdigest(), model_for("chat_memory"), MEMORY_PROMPT_VERSION, kind="conversation"
+        ))
+    return keys
+
+
+def _lookup(keys):
+    # Longest prefix of the conversation with a stored summary, never the current message:
+    # (number of messages covered, summary), or (0, None).
+    # keys[len(keys) - 1] covers the current message as well; a summary stored for it (the
+    # same turns resent after an edit or a retry) must not replace the question.
+    conn = _connection()
+    end = len(keys) - 2
+    while end > 0:
+        batch = keys[max(1, end - _LOOKUP_BATCH + 1):end + 1]
+        row = conn.execute(
+            f"SELECT key, covered, summary FROM memory_summaries WHERE key IN ({','.join('?' * len(batch))}) "
+            "ORDER BY covered DESC LIMIT 1", batch
+        ).fetchone()
+        if row is not None:
+            conn.execute("UPDATE memory_summaries SET last_used = ? WHERE key = ?", (time.time(), row["key"]))
+            return row["covered"], row["summary"]
+        end -= len(batch)
+    return 0, None
+
+
+def _store(previous_key, key, covered, summary):
+    # The new summary supersedes the one it extended, so each conversation keeps one row.
+    conn = _connection()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if previous_key is not None:
+            conn.execute("DELETE FROM memory_summaries WHERE key = ?", (previous_key,))
+        conn.execute("INSERT OR REPLACE INTO memory_summaries (key, covered, summary, last_used) VALUES (?, ?, ?, ?)",
+                     (key, covered, summary, now))
+        conn.execute("DELETE FROM memory_summaries WHERE last_used < ?", (now - config.CHAT_MEMORY_MAX_AGE_DAYS * 86400,))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _build_update_prompt(previous_summary, messages):
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    previous = previous_summary or "(none yet)"
+    return f"""You maintain a running summary of a conversation between a user and an AI assistant.
+Update the summary with the new turns below. Keep every fact, decision, name, number and open question
+that later turns may refer to; drop greetings and repetition. Write in the language of the conversation.
+Output only the updated summary.
+
+Current summary:
+{previous}
+
+New turns:
+{transcript}
+"""
+
+
+def _summarize(previous_summary, messages):
+    with metrics.timed("memory_summarize"):
+        completion = create_chat_completion(
+            "chat_memory",
+            messages=[{"role": "system", "content": _build_update_prompt(previous_summary, messages)}],
+            temperature=0.2,
+            max_tokens=config.CHAT_MEMORY_SUMMARY_MAX_TOKENS,
+        )
+    return (completion.choices[0].message.content or "").strip()
+
+
+def _tail_start(messages, costs, start, budget):
+    # Smallest index >= start such that messages[index:] fit in budget.
+    # The last message (the current question) is always kept.
+    total = sum(costs[start:])
+    index = start
+    while index < len(messages) - 1 and total > budget:
+        total -= costs[index]
+        index += 1
+    return index
+
+
+def build_history(messages):
+    # messages: the whole conversation as chat messages, oldest first, ending with the
+    # current user message. Returns the messages to send: an optional system message
+    # holding the summary of older turns, followed by the most recent turns verbatim.
+    if not messages:
+        return []
+    costs = [message_tokens(m) for m in messages]
+    if sum(costs) <= config.CHAT_HISTORY_TOKEN_BUDGET:
+        return list(messages)
+
+    keys = _prefix_keys(messages)
+    try:
+        covered, summary = _lookup(keys)
+    except sqlite3.Error as e:
+        logger.warning("Conversation memory lookup failed: %s", e)
+        covered, summary = 0, None
+
+    budget = max(0, config.CHAT_HISTORY_TOKEN_BUDGET - (count_tokens(summary, model_for("chat")) if summary else 0))
+    if sum(costs[covered:]) > budget:
+        cutoff = _tail_start(messages, costs, covered, config.CHAT_HISTORY_RECENT_TOKENS)
+        updated = None
+        # cutoff == covered when the current message alone exceeds the recent-turns budget:
+        # there is nothing new to fold in.
+        if cutoff > covered:
+            try:
+                updated = _summarize(summary, messages[covered:cutoff])
+            except Exception as e:
+                # Without a summary the conversation is simply truncated to the recent turns.
+                logger.warning("Failed to update conversation summary: %s", e)
+        if updated:
+            try:
+                _store(keys[covered] if covered else None, keys[cutoff], cutoff, updated)
+            except sqlite3.Error as e:
+                logger.warning("Conversation memory write failed: %s", e)
+            covered, summary = cutoff, updated
+        else:
+            covered = _tail_start(messages, costs, covered, budget)
+
+    history = list(messages[covered:])
+    if summary:
+        history.insert(0, {"role": "system", "content": "Summary of the earlier conversation:\n" + summary})
+    return history
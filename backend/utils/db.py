@@ -0,0 +1,26 @@
+import os
+import sqlite3
+import threading
+
+# Small helper shared by the on-disk stores in utils/. Every thread gets its own
+# connection per database file (sqlite3 connections must not be shared across threads),
+# and every database runs in WAL mode so readers never block the single writer.
+_local = threading.local()
+
+
+def get_connection(path, schema=None):
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if schema:
+            conn.executescript(schema)
+        connections[path] = conn
+    return conn
@@ -0,0 +1,215 @@
+import hashlib
+import heapq
+import logging
+import sqlite3
+import time
+from array import array
+
+import config
+from utils import metrics
+from utils.db import get_connection
+from utils.retrieval import tokenize
+
+# Near-duplicate detection for ingested sources: the same article under another URL
+# (AMP, mobile, tracking parameters) or a slightly edited re-upload. Exact copies already
+# hit the summary cache; these do not, because the text differs a little.
+#
+# Every summarized document gets a MinHash sketch of its word shingles (bottom-k variant:
+# one 64-bit hash per shingle, keeping the SKETCH_SIZE smallest, which is linear in the
+# document length instead of one pass per permutation). The resemblance of two documents
+# is estimated from their sketches; candidates are found through an inverted index on
+# the sketch values, so a lookup does not scan every stored document.
+#
+# A new source whose estimated resemblance to a known one reaches
+# DEDUP_SIMILARITY_THRESHOLD reuses that summary (or, with DEDUP_REUSE_SUMMARIES off, is
+# only flagged), and the chat context collapses near-duplicate sources of a notebook to one.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    notebook_id TEXT,
+    source_id TEXT,
+    name TEXT NOT NULL,
+    sketch BLOB NOT NULL,
+    summary TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_source ON documents(notebook_id, source_id);
+CREATE TABLE IF NOT EXISTS sketch_values (
+    value INTEGER NOT NULL,
+    document_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sketch_values_value ON sketch_values(value);
+CREATE INDEX IF NOT EXISTS idx_sketch_values_document ON sketch_values(document_id);
+"""
+
+logger = logging.getLogger(__name__)
+
+SKETCH_SIZE = 128
+SHINGLE_WORDS = 5
+# Shorter documents are not compared: a handful of shingles says little about resemblance.
+_MIN_SHINGLES = 16
+_MAX_CANDIDATES = 20
+
+
+def _connection():
+    return get_connection(config.DEDUP_INDEX_PATH, _SCHEMA)
+
+
+def _hash(shingle):
+    # Stable across processes (unlike hash()), signed to fit an SQLite INTEGER.
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+def sketch(text):
+    # Sorted bottom-k MinHash sketch of the text's word shingles, or None for short texts.
+    terms = tokenize(text or "")
+    if len(terms) < SHINGLE_WORDS + _MIN_SHINGLES - 1:
+        return None
+    hashes = {_hash(" ".join(terms[i:i + SHINGLE_WORDS])) for i in range(len(terms) - SHINGLE_WORDS + 1)}
+    return heapq.nsmallest(SKETCH_SIZE, hashes)
+
+
+def similarity(a, b):
+    # Estimated Jaccard resemblance of the two documents behind sketches a and b: the share
+    # of the union's sketch that appears in both.
+    a, b = set(a), set(b)
+    union = heapq.nsmallest(SKETCH_SIZE, a | b)
+    return sum(1 for value in union if value in a and value in b) / len(union)
+
+
+def _pack(values):
+    return array("q", values).tobytes()
+
+
+def _unpack(blob):
+    values = array("q")
+    values.frombytes(blob)
+    return list(values)
+
+
+def find_duplicate(signature, notebook_id=None):
+    # The most similar stored document at or above DEDUP_SIMILARITY_THRESHOLD, as
+    # {"name", "summary", "similarity", "notebook_id", "source_id"}, or None. On a tie a
+    # document of the same notebook wins.
+    if not config.DEDUP_ENABLED or not signature:
+        return None
+    try:
+        match = _find_duplicate(signature, notebook_id)
+    except sqlite3.Error as e:
+        logger.warning("Dedup index read failed: %s", e)
+        return None
+    metrics.increment("dedup_lookups_total", result="duplicate" if match else "unique")
+    return match
+
+
+def _find_duplicate(signature, notebook_id):
+    conn = _connection()
+    placeholders = ",".join("?" * len(signature))
+    # Near-duplicates share most sketch values; requiring a fraction of them keeps the
+    # exact comparison to a few candidates.
+    min_shared = max(1, int(len(signature) * config.DEDUP_SIMILARITY_THRESHOLD / 2))
+    rows = conn.execute(
+        f"SELECT d.id, d.notebook_id, d.source_id, d.name, d.sketch, d.summary FROM documents d JOIN "
+        f"(SELECT document_id, COUNT(*) AS shared FROM sketch_values WHERE value IN ({placeholders}) "
+        f"GROUP BY document_id HAVING shared >= ? ORDER BY shared DESC LIMIT ?) c ON c.document_id = d.id",
+        [*signature, min_shared, _MAX_CANDIDATES]
+    ).fetchall()
+    best = None
+    for row in rows:
+        score = similarity(signature, _unpack(row["sketch"]))
+        if score < config.DEDUP_SIMILARITY_THRESHOLD:
+            continue
+        rank = (score, bool(notebook_id) and row["notebook_id"] == notebook_id)
+        if best is None or rank > best[0]:
+            best = (rank, row)
+    if best is None:
+        return None
+    (score, _), row = best
+    return {"name": row["name"], "summary": row["summary"], "similarity": round(score, 3),
+            "notebook_id": row["notebook_id"], "source_id": row["source_id"]}
+
+
+def remember(signature, summary, name, notebook_id=None, source_id=None):
+    # Adds a summarized document to the index.
+    if not config.DEDUP_ENABLED or not signature or not summary:
+        return
+    try:
+        conn = _connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            document_id = conn.execute(
+                "INSERT INTO documents (notebook_id, source_id, name, sketch, summary, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (notebook_id, source_id, name, _pack(signature), summary, time.time())
+            ).lastrowid
+            conn.executemany("INSERT INTO sketch_values (value, document_id) VALUES (?, ?)",
+                             [(value, document_id) for value in signature])
+            _evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    except sqlite3.Error as e:
+        logger.warning("Dedup index write failed: %s", e)
+
+
+def _evict(conn):
+    # Oldest documents first, past DEDUP_MAX_DOCUMENTS.
+    excess = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] - config.DEDUP_MAX_DOCUMENTS
+    if excess > 0:
+        last_id = conn.execute("SELECT id FROM documents ORDER BY id LIMIT 1 OFFSET ?", (excess - 1,)).fetchone()[0]
+        conn.execute("DELETE FROM sketch_values WHERE document_id <= ?", (last_id,))
+        conn.execute("DELETE FROM documents WHERE id <= ?", (last_id,))
+
+
+def forget_source(notebook_id, source_id):
+    # Detaches a deleted source. Its summary stays available for reuse, like the summary cache.
+    try:
+        _connection().execute("UPDATE documents SET notebook_id = NULL, source_id = NULL WHERE notebook_id = ? AND source_id = ?",
+                              (notebook_id, source_id))
+    except sqlite3.Error as e:
+        logger.warning("Dedup index write failed: %s", e)
+
+
+def collapse_duplicates(notebook_id, source_ids):
+    # source_ids without those that are near-duplicates of an earlier one in the list, so
+    # the chat context does not carry the same text twice. Order is kept.
+    if not config.DEDUP_ENABLED or len(source_ids) < 2:
+        return source_ids
+    placeholders = ",".join("?" * len(source_ids))
+    try:
+        rows = _connection().execute(
+            f"SELECT source_id, sketch FROM documents WHERE notebook_id = ? AND source_id IN ({placeholders})",
+            [notebook_id, *source_ids]
+        ).fetchall()
+    except sqlite3.Error as e:
+        logger.warning("Dedup index read failed: %s", e)
+        return source_ids
+    sketches = {row["source_id"]: _unpack(row["sketch"]) for row in rows}
+    kept, kept_sketches = [], []
+    for source_id in source_ids:
+        signature = sketches.get(source_id)
+        if signature is not None:
+            if any(similarity(signature, other) >= config.DEDUP_SIMILARITY_THRESHOLD for other in kept_sketches):
+                continue
+            kept_sketches.append(signature)
+        kept.append(source_id)
+    return kept
+
+
+def check(text, notebook_id=None):
+    # (sketch, duplicate) for a source about to be summarized; duplicate is what
+    # find_duplicate returns. The sketch is passed on to remember() once it is summarized.
+    if not config.DEDUP_ENABLED:
+        return None, None
+    with metrics.timed("dedup"):
+        signature = sketch(text)
+        return signature, find_duplicate(signature, notebook_id)
+
+
+def reusable_summary(duplicate):
+    # The duplicate's summary when it may stand in for a new one, else None.
+    if duplicate is None or not config.DEDUP_REUSE_SUMMARIES:
+        return None
+    logger.info("Reusing the summary of near-duplicate source '%s' (similarity %.2f)", duplicate["name"], duplicate["similarity"])
+    return duplicate["summary"]
@@ -1,61 +1,201 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import config
+from utils import fetch_cache, metrics
+from utils.html_backends import get_parser
+from utils.lazy import lazy_import
+
+httpx = lazy_import("httpx", "web")
+requests = lazy_import("requests", "web")
+
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Content types we know how to extract text from. A missing Content-Type is treated as HTML.
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+TEXT_CONTENT_TYPES = ('text/plain', 'text/markdown')
+
+_READ_BLOCK_SIZE = 64 * 1024
+
+# Shared httpx.AsyncClient for extract_text_from_url_async (one per event loop in practice:
+# it is only used from the ASGI server's loop).
+_async_client = None
+_async_client_lock = threading.Lock()
+
+# Shared requests.Session for extract_text_from_url, so repeated fetches from the same
+# site reuse pooled keep-alive connections instead of a new TCP/TLS handshake each.
+_session = None
+_session_lock = threading.Lock()
 
-# This is the extract_text_from_url function previously in app.py
-def extract_text_from_url(url):
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status() # Raises an HTTPError for bad responses (4XX or 5XX)
 
-        soup = BeautifulSoup(response.content, 'html.parser')
+def _declared_charset(content_type_header):
+    for param in content_type_header.split(';')[1:]:
+        name, _, value = param.strip().partition('=')
+        if name.lower() == 'charset' and value:
+            return value.strip('"\' ')
+    return None
 
-        # Remove script and style elements
-        for script_or_style in soup(["script", "style"]):
-            script_or_style.decompose()
 
-        # Attempt to get title
-        title = soup.title.string.strip() if soup.title and soup.title.string else url
+def _get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=config.FETCH_POOL_CONNECTIONS, pool_maxsize=config.FETCH_POOL_MAXSIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update(REQUEST_HEADERS)
+            # Pages are fetched on behalf of different users: never carry cookies between them.
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            _session = session
+    return _session
 
-        # Basic content extraction (can be improved)
-        main_content_tags = soup.find_all(['article', 'main'])
-        if not main_content_tags:
-            main_content_tags = soup.find_all('div', class_=['content', 'post-content', 'entry-content', 'article-body'])
-            if not main_content_tags:
-                main_content_tags = [soup.body] if soup.body else []
 
-        text_parts = []
-        for tag in main_content_tags:
-            if tag:
-                paragraphs = tag.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li'])
-                if paragraphs:
-                    for p in paragraphs:
-                        text_parts.append(p.get_text(separator=' ', strip=True))
-                else:
-                    text_parts.append(tag.get_text(separator=' ', strip=True))
+def fetch_url(url, headers=None):
+    # Streamed download: the Content-Type is checked before reading the body, and at most
+    # FETCH_MAX_BYTES are read (long pages are parsed from the partial body, which still
+    # holds the article for any realistic page). headers are sent in addition to
+    # REQUEST_HEADERS (conditional-GET validators, see utils/fetch_cache.py).
+    # Returns (body_bytes, media_type, charset or None, response_headers); body_bytes is
+    # None when the server answered 304 Not Modified.
+    with metrics.timed("fetch"), _get_session().get(url, headers=headers, timeout=config.FETCH_TIMEOUT_SECONDS, stream=True) as response:
+        if response.status_code == 304:
+            return None, None, None, response.headers
+        response.raise_for_status() # Raises an HTTPError for bad responses (4XX or 5XX)
+
+        content_type_header = response.headers.get('Content-Type', '')
+        media_type = content_type_header.split(';')[0].strip().lower()
+        if media_type and media_type not in HTML_CONTENT_TYPES + TEXT_CONTENT_TYPES:
+            raise ValueError(f"Unsupported content type '{media_type}' for URL: {url}")
+
+        chunks = []
+        received = 0
+        for chunk in response.iter_content(chunk_size=_READ_BLOCK_SIZE):
+            chunks.append(chunk)
+            received += len(chunk)
+            if received >= config.FETCH_MAX_BYTES:
+                break
+        body = b"".join(chunks)[:config.FETCH_MAX_BYTES]
+    return body, media_type, _declared_charset(content_type_header), response.headers
 
-        extracted_text = "\n\n".join(filter(None, text_parts))
 
-        if len(extracted_text) < 200 and soup.body:
-            body_text = soup.body.get_text(separator='\n', strip=True)
-            # Only use if it's substantially better and not just minimal boilerplate
-            if len(body_text) > len(extracted_text) + 100 or (not extracted_text and body_text):
-                extracted_text = body_text
+def parse_document(body, media_type, charset, url, backend=None):
+    if media_type in TEXT_CONTENT_TYPES:
+        text = body.decode(charset or 'utf-8', errors='replace').strip()
+        return url, text
+    parse = get_parser(backend or config.HTML_PARSER_BACKEND)
+    with metrics.timed("parse"):
+        return parse(body, url, encoding=charset)
 
-        # If title is still the URL and there's some text, try to derive a title from first H1
-        if title == url and extracted_text:
-            first_h1 = soup.find('h1')
-            if first_h1 and first_h1.string:
-                title = first_h1.string.strip()
 
+def _parse_and_cache(url, body, media_type, charset, response_headers):
+    try:
+        title, text = parse_document(body, media_type, charset, url)
+    except Exception as e:
+        raise ValueError(f"Failed to parse content from URL: {url}. Error: {str(e)}")
+    fetch_cache.store(url, response_headers, body, media_type, charset, title, text, config.HTML_PARSER_BACKEND)
+    return title, text
+
+
+def _cached_document(entry, url):
+    # (title, text) of a cache entry. Text extracted with another HTML parser backend is
+    # re-parsed from the stored body (still no download).
+    if entry["media_type"] in TEXT_CONTENT_TYPES or entry["parser"] == config.HTML_PARSER_BACKEND:
+        return entry["title"], entry["text"]
+    try:
+        title, text = parse_document(entry["body"], entry["media_type"], entry["charset"], url)
+    except Exception as e:
+        raise ValueError(f"Failed to parse content from URL: {url}. Error: {str(e)}")
+    fetch_cache.update_text(entry, title, text, config.HTML_PARSER_BACKEND)
+    return title, text
 
-        return title, extracted_text
 
+# This is the extract_text_from_url function previously in app.py
+def extract_text_from_url(url):
+    cached = fetch_cache.lookup(url)
+    if cached is not None and cached["fresh"]:
+        return _cached_document(cached, url)
+    try:
+        body, media_type, charset, response_headers = fetch_url(url, fetch_cache.conditional_headers(cached))
     except requests.exceptions.RequestException as e:
         # Log the error or handle it as per application's logging strategy
         # For now, re-raising a ValueError is consistent with previous design
         raise ValueError(f"Failed to fetch or read URL: {url}. Error: {str(e)}")
-    except Exception as e:
-        raise ValueError(f"Failed to parse content from URL: {url}. Error: {str(e)}")
+
+    if body is None:
+        fetch_cache.mark_revalidated(cached, response_headers)
+        return _cached_document(cached, url)
+    return _parse_and_cache(url, body, media_type, charset, response_headers)
+
+
+async def fetch_url_async(client, url, headers=None):
+    # Async counterpart of fetch_url; client is a shared httpx.AsyncClient. Same headers,
+    # Content-Type check, FETCH_MAX_BYTES cap and return value.
+    with metrics.timed("fetch"):
+        return await _fetch_url_async(client, url, headers)
+
+
+async def _fetch_url_async(client, url, headers):
+    async with client.stream('GET', url, headers={**REQUEST_HEADERS, **(headers or {})}) as response:
+        if response.status_code == 304:
+            return None, None, None, response.headers
+        response.raise_for_status()
+
+        content_type_header = response.headers.get('Content-Type', '')
+        media_type = content_type_header.split(';')[0].strip().lower()
+        if media_type and media_type not in HTML_CONTENT_TYPES + TEXT_CONTENT_TYPES:
+            raise ValueError(f"Unsupported content type '{media_type}' for URL: {url}")
+
+        chunks = []
+        received = 0
+        async for chunk in response.aiter_bytes(_READ_BLOCK_SIZE):
+            chunks.append(chunk)
+            received += len(chunk)
+            if received >= config.FETCH_MAX_BYTES:
+                break
+    return b"".join(chunks)[:config.FETCH_MAX_BYTES], media_type, _declared_charset(content_type_header), response.headers
+
+
+def _get_async_client():
+    global _async_client
+    with _async_client_lock:
+        if _async_client is None:
+            _async_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=config.FETCH_ASYNC_MAX_CONNECTIONS,
+                                    max_keepalive_connections=config.FETCH_ASYNC_MAX_CONNECTIONS),
+                timeout=config.FETCH_TIMEOUT_SECONDS,
+                follow_redirects=True,
+            )
+    return _async_client
+
+
+async def close_async_client():
+    global _async_client
+    with _async_client_lock:
+        client, _async_client = _async_client, None
+    if client is not None:
+        await client.aclose()
+
+
+async def extract_text_from_url_async(url, client=None, executor=None):
+    # Async counterpart of extract_text_from_url for the ASGI routes and batch imports: the
+    # download does not hold a thread, and parsing (CPU-bound) and the cache's SQLite calls
+    # run on executor (the loop's default one if None). client defaults to the shared
+    # AsyncClient. Uses the same fetch cache.
+    loop = asyncio.get_running_loop()
+    cached = await loop.run_in_executor(executor, fetch_cache.lookup, url)
+    if cached is not None and cached["fresh"]:
+        return await loop.run_in_executor(executor, _cached_document, cached, url)
+    try:
+        body, media_type, charset, response_headers = await fetch_url_async(
+            client or _get_async_client(), url, fetch_cache.conditional_headers(cached))
+    except httpx.HTTPError as e:
+        raise ValueError(f"Failed to fetch or read URL: {url}. Error: {str(e)}")
+
+    if body is None:
+        await loop.run_in_executor(executor, fetch_cache.mark_revalidated, cached, response_headers)
+        return await loop.run_in_executor(executor, _cached_document, cached, url)
+    return await loop.run_in_executor(executor, _parse_and_cache, url, body, media_type, charset, response_headers)
@@ -0,0 +1,205 @@
+import logging
+import re
+import sqlite3
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urldefrag
+
+import config
+from utils import metrics
+from utils.db import get_connection
+
+# HTTP cache for fetched web pages (used by utils/extractor.py). Each entry keeps the
+# response body together with the text extracted from it and the response's validators
+# (ETag, Last-Modified). While an entry is fresh under the page's Cache-Control / Expires
+# headers (capped at FETCH_CACHE_MAX_AGE_SECONDS) it is used without touching the network;
+# after that the page is revalidated with a conditional GET, and a 304 Not Modified answer
+# reuses the stored text, skipping both the download and the parse.
+# Responses with Cache-Control: no-store, and responses that can neither be reused while
+# fresh nor revalidated, are not stored.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    expires_at REAL NOT NULL,
+    media_type TEXT NOT NULL,
+    charset TEXT,
+    body BLOB NOT NULL,
+    title TEXT NOT NULL,
+    text TEXT NOT NULL,
+    parser TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pages_last_accessed ON pages(last_accessed);
+"""
+
+logger = logging.getLogger(__name__)
+
+_CACHE_CONTROL_RE = re.compile(r'([\w-]+)\s*(?:=\s*(?:"([^"]*)"|([^,\s]*)))?')
+
+
+def _connection():
+    return get_connection(config.FETCH_CACHE_PATH, _SCHEMA)
+
+
+def _bump(event, amount=1):
+    metrics.increment("cache_events_total", amount, cache="fetch", event=event)
+
+
+def cache_key(url):
+    # The fragment never reaches the server.
+    return urldefrag(url)[0]
+
+
+def parse_cache_control(value):
+    directives = {}
+    for match in _CACHE_CONTROL_RE.finditer(value or ""):
+        directives[match.group(1).lower()] = match.group(2) if match.group(2) is not None else match.group(3)
+    return directives
+
+
+def _seconds(value):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _http_date(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def freshness_lifetime(headers):
+    # Seconds the response may be reused without revalidation, or None if it must not be
+    # stored at all. headers is any case-insensitive mapping (requests or httpx).
+    directives = parse_cache_control(headers.get("Cache-Control"))
+    if "no-store" in directives or headers.get("Vary", "").strip() == "*":
+        return None
+    if "no-cache" in directives:
+        lifetime = 0
+    elif "s-maxage" in directives or "max-age" in directives:
+        lifetime = _seconds(directives.get("s-maxage", directives.get("max-age")))
+    elif headers.get("Expires"):
+        expires = _http_date(headers.get("Expires"))
+        date = _http_date(headers.get("Date")) or time.time()
+        lifetime = max(0, int(expires - date)) if expires is not None else 0
+    else:
+        lifetime = 0
+    lifetime -= _seconds(headers.get("Age"))
+    return max(0, min(lifetime, config.FETCH_CACHE_MAX_AGE_SECONDS))
+
+
+def conditional_headers(entry):
+    # Request headers that revalidate a stored entry (empty without one).
+    headers = {}
+    if entry is not None:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def lookup(url):
+    # The stored entry for url as a dict (with "fresh" set when it can be used without
+    # revalidation), or None.
+    if not config.FETCH_CACHE_ENABLED:
+        return None
+    try:
+        row = _connection().execute("SELECT * FROM pages WHERE url = ?", (cache_key(url),)).fetchone()
+    except sqlite3.Error as e:
+        logger.warning("Fetch cache read failed: %s", e)
+        row = None
+    if row is None:
+        _bump("misses")
+        return None
+    entry = dict(row)
+    entry["fresh"] = entry["expires_at"] > time.time()
+    if entry["fresh"]:
+        _bump("hits")
+        _touch(entry["url"])
+    return entry
+
+
+def _touch(key):
+    try:
+        _connection().execute("UPDATE pages SET last_accessed = ? WHERE url = ?", (time.time(), key))
+    except sqlite3.Error as e:
+        logger.warning("Fetch cache write failed: %s", e)
+
+
+def store(url, headers, body, media_type, charset, title, text, parser):
+    # Saves a 200 response and its extracted text, if the response allows it.
+    if not config.FETCH_CACHE_ENABLED:
+        return
+    lifetime = freshness_lifetime(headers)
+    etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+    if lifetime is None or (lifetime == 0 and not etag and not last_modified):
+        return
+    now = time.time()
+    size = len(body) + len(text.encode("utf-8"))
+    try:
+        conn = _connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO pages (url, etag, last_modified, expires_at, media_type, charset, body, title, text,"
+            " parser, size, fetched_at, last_accessed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (cache_key(url), etag, last_modified, now + lifetime, media_type, charset, body, title, text,
+             parser, size, now, now)
+        )
+        _bump("stores")
+        _evict(conn)
+    except sqlite3.Error as e:
+        logger.warning("Fetch cache write failed: %s", e)
+
+
+def mark_revalidated(entry, headers):
+    # Applies a 304 Not Modified answer: the entry is fresh again under the new headers,
+    # which may also carry updated validators.
+    lifetime = freshness_lifetime(headers)
+    _bump("revalidations")
+    try:
+        if lifetime is None:
+            _connection().execute("DELETE FROM pages WHERE url = ?", (entry["url"],))
+            return
+        now = time.time()
+        _connection().execute(
+            "UPDATE pages SET etag = ?, last_modified = ?, expires_at = ?, last_accessed = ? WHERE url = ?",
+            (headers.get("ETag") or entry["etag"], headers.get("Last-Modified") or entry["last_modified"],
+             now + lifetime, now, entry["url"])
+        )
+    except sqlite3.Error as e:
+        logger.warning("Fetch cache write failed: %s", e)
+
+
+def update_text(entry, title, text, parser):
+    # Replaces the extracted text of an entry that was re-parsed with another HTML parser.
+    try:
+        _connection().execute(
+            "UPDATE pages SET title = ?, text = ?, parser = ?, size = ? WHERE url = ?",
+            (title, text, parser, len(entry["body"]) + len(text.encode("utf-8")), entry["url"])
+        )
+    except sqlite3.Error as e:
+        logger.warning("Fetch cache write failed: %s", e)
+
+
+def _evict(conn):
+    evicted = 0
+    entries, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+    # LRU, as in utils/summary_cache.py.
+    while entries > config.FETCH_CACHE_MAX_ENTRIES or total_bytes > config.FETCH_CACHE_MAX_BYTES:
+        row = conn.execute("SELECT url, size FROM pages ORDER BY last_accessed LIMIT 1").fetchone()
+        if row is None:
+            break
+        conn.execute("DELETE FROM pages WHERE url = ?", (row["url"],))
+        entries -= 1
+        total_bytes -= row["size"]
+        evicted += 1
+    if evicted:
+        _bump("evictions", evicted)
@@ -0,0 +1,165 @@
+import importlib.util
+
+from utils.lazy import lazy_import
+
+# Pluggable HTML -> (title, text) parsers used by utils/extractor.py.
+#   "lxml": C-based parser plus a single walk over the tree (fast path, optional dependency)
+#   "bs4":  the original BeautifulSoup/html.parser implementation (reference and fallback)
+# Both follow the same extraction rules: prefer <article>/<main>, then well-known content
+# <div> classes, then <body>; inside a container take p/h1-h6/li blocks; fall back to the
+# whole body text when that yields almost nothing.
+
+bs4 = lazy_import("bs4", "web")
+etree = lazy_import("lxml.etree", "web")
+lxml_html = lazy_import("lxml.html", "web")
+
+CONTENT_DIV_CLASSES = ('content', 'post-content', 'entry-content', 'article-body')
+BLOCK_TAGS = ('p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li')
+MIN_EXTRACTED_CHARS = 200
+
+
+def _choose_body_fallback(extracted_text, body_text):
+    # Only use the body text if it's substantially better and not just minimal boilerplate
+    if len(body_text) > len(extracted_text) + 100 or (not extracted_text and body_text):
+        return body_text
+    return extracted_text
+
+
+def parse_with_bs4(content, url, encoding=None):
+    soup = bs4.BeautifulSoup(content, 'html.parser', from_encoding=encoding)
+
+    # Remove script and style elements
+    for script_or_style in soup(["script", "style"]):
+        script_or_style.decompose()
+
+    # Attempt to get title
+    title = soup.title.string.strip() if soup.title and soup.title.string else url
+
+    # Basic content extraction (can be improved)
+    main_content_tags = soup.find_all(['article', 'main'])
+    if not main_content_tags:
+        main_content_tags = soup.find_all('div', class_=list(CONTENT_DIV_CLASSES))
+        if not main_content_tags:
+            main_content_tags = [soup.body] if soup.body else []
+
+    text_parts = []
+    for tag in main_content_tags:
+        if tag:
+            paragraphs = tag.find_all(list(BLOCK_TAGS))
+            if paragraphs:
+                for p in paragraphs:
+                    text_parts.append(p.get_text(separator=' ', strip=True))
+            else:
+                text_parts.append(tag.get_text(separator=' ', strip=True))
+
+    extracted_text = "\n\n".join(filter(None, text_parts))
+
+    if len(extracted_text) < MIN_EXTRACTED_CHARS and soup.body:
+        extracted_text = _choose_body_fallback(extracted_text, soup.body.get_text(separator='\n', strip=True))
+
+    # If title is still the URL and there's some text, try to derive a title from first H1
+    if title == url and extracted_text:
+        first_h1 = soup.find('h1')
+        if first_h1 and first_h1.string:
+            title = first_h1.string.strip()
+
+    return title, extracted_text
+
+
+def _joined_text(element, separator):
+    return separator.join(s.strip() for s in element.itertext() if s.strip())
+
+
+def _single_string(element):
+    # Equivalent of BeautifulSoup's Tag.string: the text if the element holds exactly one string.
+    if len(element) == 0:
+        return element.text
+    if len(element) == 1 and not element.text and not element[0].tail:
+        return _single_string(element[0])
+    return None
+
+
+def parse_with_lxml(content, url, encoding=None):
+    parser = lxml_html.HTMLParser(encoding=encoding, remove_comments=True, remove_pis=True)
+    root = lxml_html.document_fromstring(content, parser=parser)
+    etree.strip_elements(root, 'script', 'style', with_tail=False)
+
+    title = None
+    first_h1 = None
+    body = None
+    # Containers in document order, each with the block texts found inside it.
+    primary, secondary = [], []   # <article>/<main>, content-class <div>s
+    open_containers = []          # (element, blocks) of the containers we are currently inside
+    body_blocks = []
+
+    # Single pass over the tree: find the title, first <h1>, containers and text blocks.
+    # Each block's text is computed once and shared by every container that encloses it.
+    for event, element in etree.iterwalk(root, events=('start', 'end')):
+        tag = element.tag
+        if not isinstance(tag, str):
+            continue
+        if event == 'start':
+            # Blocks are handled on "start" so nested blocks keep document (pre-)order.
+            if tag in BLOCK_TAGS and open_containers:
+                text = _joined_text(element, ' ')
+                for _, blocks in open_containers:
+                    blocks.append(text)
+            if tag in ('article', 'main'):
+                entry = (element, [])
+                primary.append(entry)
+                open_containers.append(entry)
+            elif tag == 'div' and any(c in CONTENT_DIV_CLASSES for c in (element.get('class') or '').split()):
+                entry = (element, [])
+                secondary.append(entry)
+                open_containers.append(entry)
+            elif tag == 'body' and body is None:
+                body = element
+                open_containers.append((element, body_blocks))
+            elif tag == 'title' and title is None:
+                title = _single_string(element)
+            elif tag == 'h1' and first_h1 is None:
+                first_h1 = element
+        elif open_containers and open_containers[-1][0] is element:
+            open_containers.pop()
+
+    title = title.strip() if title and title.strip() else url
+
+    if primary or secondary:
+        containers = primary or secondary
+    else:
+        containers = [(body, body_blocks)] if body is not None else []
+
+    text_parts = []
+    for element, blocks in containers:
+        if blocks:
+            text_parts.extend(blocks)
+        else:
+            text_parts.append(_joined_text(element, ' '))
+    extracted_text = "\n\n".join(filter(None, text_parts))
+
+    if body is not None and len(extracted_text) < MIN_EXTRACTED_CHARS:
+        extracted_text = _choose_body_fallback(extracted_text, _joined_text(body, '\n'))
+
+    if title == url and extracted_text and first_h1 is not None:
+        h1_text = _single_string(first_h1)
+        if h1_text:
+            title = h1_text.strip()
+
+    return title, extracted_text
+
+
+PARSER_BACKENDS = {
+    'bs4': parse_with_bs4,
+}
+# Checked without importing it; lxml loads with the first page parsed.
+if importlib.util.find_spec("lxml") is not None:
+    PARSER_BACKENDS['lxml'] = parse_with_lxml
+
+
+def get_parser(name='auto'):
+    # "auto" picks the fastest installed backend.
+    if name in (None, '', 'auto'):
+        name = 'lxml' if 'lxml' in PARSER_BACKENDS else 'bs4'
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown or unavailable HTML parser backend: {name}")
+    return PARSER_BACKENDS[name]
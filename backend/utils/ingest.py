@@ -0,0 +1,180 @@
+import asyncio
+import io
+import os
+import logging
+import sqlite3
+
+import config
+from utils.extractor import extract_text_from_url, extract_text_from_url_async
+from utils.pdf_extractor import PdfLimitError, extract_pdf_text
+from utils import dedup, metrics, store
+from utils.retrieval import index_source, new_source_id
+from utils.summarizer import agenerate_detailed_summary_with_ai, generate_detailed_summary_with_ai
+from utils.transcript import NoSubtitlesError, TranscriptError, fetch_transcript
+
+# Source loading shared by the synchronous summarize routes and the background job queue
+# (utils/jobs.py). Each loader returns the extracted text; problems are raised as
+# IngestionError carrying the HTTP status the routes have always used for that failure.
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_FILE_EXTENSIONS = ('.txt', '.pdf', '.md')
+
+
+class IngestionError(ValueError):
+    def __init__(self, message, status_code=400, details=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.details = details
+
+
+def load_uploaded_file(filename, stream):
+    file_extension = os.path.splitext(filename.lower())[1]
+    if file_extension not in ALLOWED_FILE_EXTENSIONS:
+        raise IngestionError(f'Invalid file type, please upload a {", ".join(ALLOWED_FILE_EXTENSIONS)} file')
+
+    text_content = ""
+    if file_extension == '.pdf':
+        try:
+            text_content = extract_pdf_text(stream)
+        except PdfLimitError as e:
+            raise IngestionError(str(e), status_code=413)
+        except Exception as e:
+            raise IngestionError(f'Failed to parse PDF file: {str(e)}', status_code=500)
+        if not text_content.strip():
+            raise IngestionError('Could not extract text from PDF or PDF is empty')
+    elif file_extension in ['.txt', '.md']:
+        text_content = stream.read().decode('utf-8')
+        if not text_content.strip():
+            raise IngestionError('File is empty or contains only whitespace')
+
+    if not text_content.strip():
+        raise IngestionError('Extracted text content is empty.')
+    return text_content
+
+
+def load_website(url):
+    # Returns (title, text). extract_text_from_url raises ValueError on fetch/parse errors.
+    try:
+        website_title, extracted_text = extract_text_from_url(url)
+    except ValueError as ve:
+        raise IngestionError(str(ve))
+    if not extracted_text.strip():
+        raise IngestionError("Could not extract meaningful content from the URL.")
+    return website_title, extracted_text
+
+
+def load_youtube_transcript(youtube_url):
+    # Timestamped transcript (see utils/transcript.py).
+    logger.info("Fetching subtitles for %s", youtube_url)
+    try:
+        return fetch_transcript(youtube_url)
+    except NoSubtitlesError as e:
+        logger.info("No subtitle text could be extracted from %s: %s", youtube_url, e)
+        raise IngestionError('Could not find or parse subtitles', status_code=404)
+    except TranscriptError as e:
+        logger.warning("Subtitle download failed for %s: %s", youtube_url, e)
+        raise IngestionError('Failed to download subtitles', status_code=500, details=str(e))
+
+
+def record_source(result, notebook_id, url=None, signature=None, duplicate=None):
+    # Adds a summarized source to the notebook: it is saved in the notebook store
+    # (utils/store.py) when the notebook lives there, and added to the retrieval index
+    # (utils/retrieval.py) either way. The new id is returned as "source_id". A stored
+    # source's original_content is not echoed back; it can be fetched from the store.
+    # Both steps are best effort: on a storage error the summary is still returned.
+    # Every source, with or without a notebook, is also added to the near-duplicate index
+    # (utils/dedup.py); signature and duplicate come from dedup.check when it was already
+    # run. A near-duplicate of a source in the same notebook is flagged as "duplicate_of".
+    if duplicate is not None and notebook_id and duplicate["notebook_id"] == notebook_id:
+        result = dict(result, duplicate_of={"source_id": duplicate["source_id"], "name": duplicate["name"],
+                                            "similarity": duplicate["similarity"]})
+    if signature is None and config.DEDUP_ENABLED:
+        signature = dedup.sketch(result['original_content'])
+    result = _save_source(result, notebook_id, url)
+    dedup.remember(signature, result['summary'], result['name'], notebook_id, result.get('source_id'))
+    return result
+
+
+def _save_source(result, notebook_id, url):
+    if not notebook_id:
+        return result
+    source_id = new_source_id()
+    try:
+        index_source(notebook_id, source_id, result['name'], result['summary'], result['original_content'])
+        if store.get_notebook(notebook_id) is not None:
+            store.add_source(notebook_id, result['type'], result['name'], result['summary'],
+                             result['original_content'], url=url, source_id=source_id)
+            result = {key: value for key, value in result.items() if key != 'original_content'}
+    except sqlite3.Error as e:
+        logger.warning("Failed to save source '%s' for notebook %s: %s", result['name'], notebook_id, e)
+        return result
+    return dict(result, source_id=source_id)
+
+
+def summarize_source(text_content, name, source_type, notebook_id=None, url=None):
+    # Returns the same payload the summarize routes respond with (see record_source for
+    # what changes when notebook_id is given). A near-duplicate of an already summarized
+    # source reuses its summary instead of calling the model (see utils/dedup.py).
+    signature, duplicate = dedup.check(text_content, notebook_id)
+    summary = dedup.reusable_summary(duplicate)
+    if summary is None:
+        with metrics.timed("summarize", type=source_type):
+            summary = generate_detailed_summary_with_ai(text_content, document_name=name)
+        if summary.startswith("Error:"):
+            raise IngestionError(summary)
+    result = {'summary': summary, 'original_content': text_content, 'name': name, 'type': source_type}
+    return record_source(result, notebook_id, url, signature, duplicate)
+
+
+# --- Async variants for the ASGI routes (routes/async_api.py) ---
+
+async def aload_website(url):
+    try:
+        website_title, extracted_text = await extract_text_from_url_async(url)
+    except ValueError as ve:
+        raise IngestionError(str(ve))
+    if not extracted_text.strip():
+        raise IngestionError("Could not extract meaningful content from the URL.")
+    return website_title, extracted_text
+
+
+async def arecord_source(result, notebook_id, url=None, signature=None, duplicate=None):
+    # The index and store writes are blocking SQLite calls, so they run off the event loop.
+    return await asyncio.to_thread(record_source, result, notebook_id, url, signature, duplicate)
+
+
+async def asummarize_source(text_content, name, source_type, notebook_id=None, url=None):
+    signature, duplicate = await asyncio.to_thread(dedup.check, text_content, notebook_id)
+    summary = dedup.reusable_summary(duplicate)
+    if summary is None:
+        with metrics.timed("summarize", type=source_type):
+            summary = await agenerate_detailed_summary_with_ai(text_content, document_name=name)
+        if summary.startswith("Error:"):
+            raise IngestionError(summary)
+    result = {'summary': summary, 'original_content': text_content, 'name': name, 'type': source_type}
+    return await arecord_source(result, notebook_id, url, signature, duplicate)
+
+
+# --- Full ingestion pipelines used by background jobs ---
+# progress(stage) is called as each stage starts: "download", "parse", "summarize".
+
+def ingest_youtube(youtube_url, progress, notebook_id=None):
+    progress("download")
+    subtitle_text = load_youtube_transcript(youtube_url)
+    progress("summarize")
+    return summarize_source(subtitle_text, youtube_url, 'youtube', notebook_id, url=youtube_url)
+
+
+def ingest_website(url, progress, notebook_id=None):
+    progress("download")
+    website_title, extracted_text = load_website(url)
+    progress("summarize")
+    return summarize_source(extracted_text, website_title, 'website', notebook_id, url=url)
+
+
+def ingest_file(filename, data, progress, notebook_id=None):
+    progress("parse")
+    text_content = load_uploaded_file(filename, io.BytesIO(data))
+    progress("summarize")
+    return summarize_source(text_content, filename, 'file', notebook_id)
@@ -0,0 +1,178 @@
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Background job queue for long-running ingestion (YouTube transcripts, web pages, files).
+# A submit returns a job id immediately; the work runs on a bounded worker pool with a
+# per-source-type concurrency limit, and clients poll or subscribe for progress.
+# Identical in-flight submissions (same type + dedup key, e.g. the same URL) share one job.
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class Job:
+    def __init__(self, source_type, dedup_key, target):
+        self.id = uuid.uuid4().hex
+        self.source_type = source_type
+        self.dedup_key = dedup_key
+        self.target = target
+        self.status = JOB_QUEUED
+        self.stage = None
+        self.result = None
+        self.error = None
+        self.error_status_code = None
+        # Per-item results of multi-item jobs (batch imports), visible while the job runs.
+        self.items = []
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.finished_at = None
+        # version increments on every change; subscribers wait for it to move.
+        self.version = 0
+        self.changed = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in (JOB_SUCCEEDED, JOB_FAILED)
+
+    def update(self, **fields):
+        with self.changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.updated_at = time.time()
+            self.version += 1
+            self.changed.notify_all()
+
+    def set_stage(self, stage):
+        self.update(status=JOB_RUNNING, stage=stage)
+
+    def add_item(self, item):
+        with self.changed:
+            self.items.append(item)
+            self.updated_at = time.time()
+            self.version += 1
+            self.changed.notify_all()
+
+    def wait_for_change(self, last_version, timeout):
+        # Returns the current version once it differs from last_version (or on timeout).
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != last_version, timeout=timeout)
+            return self.version
+
+    def to_dict(self):
+        data = {
+            "job_id": self.id,
+            "type": self.source_type,
+            "status": self.status,
+            "stage": self.stage,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+        if self.items:
+            data["items"] = list(self.items)
+        if self.status == JOB_SUCCEEDED:
+            data["result"] = self.result
+        elif self.status == JOB_FAILED:
+            data["error"] = self.error
+        return data
+
+
+class JobManager:
+    def __init__(self, max_workers, type_limits, retention_seconds):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest-job")
+        self._type_limits = type_limits
+        self._retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._in_flight = {}   # (source_type, dedup_key) -> Job
+        self._running = {}     # source_type -> number of running jobs
+        self._pending = {}     # source_type -> deque of Jobs waiting for a type slot
+
+    def submit(self, source_type, dedup_key, target):
+        # target(job) does the work and returns the result dict, reporting progress
+        # through job.set_stage / job.add_item. Returns (job, deduplicated).
+        with self._lock:
+            self._prune()
+            key = (source_type, dedup_key)
+            existing = self._in_flight.get(key) if dedup_key else None
+            if existing is not None:
+                return existing, True
+            job = Job(source_type, dedup_key, target)
+            self._jobs[job.id] = job
+            if dedup_key:
+                self._in_flight[key] = job
+            self._pending.setdefault(source_type, deque()).append(job)
+            self._dispatch(source_type)
+            return job, False
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _dispatch(self, source_type):
+        # Called with self._lock held: start queued jobs of this type while slots are free.
+        limit = self._type_limits.get(source_type, self._type_limits.get("default", 1))
+        pending = self._pending.get(source_type)
+        while pending and self._running.get(source_type, 0) < limit:
+            job = pending.popleft()
+            self._running[source_type] = self._running.get(source_type, 0) + 1
+            self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            job.set_stage("starting")
+            with metrics.timed("job", type=job.source_type):
+                result = job.target(job)
+            job.update(status=JOB_SUCCEEDED, stage="done", result=result, finished_at=time.time())
+        except Exception as e:
+            if not isinstance(e, ValueError):
+                logger.exception("Job %s (%s) failed", job.id, job.source_type)
+            job.update(status=JOB_FAILED, error=str(e), error_status_code=getattr(e, "status_code", 500),
+                        finished_at=time.time())
+        finally:
+            with self._lock:
+                self._running[job.source_type] -= 1
+                if job.dedup_key and self._in_flight.get((job.source_type, job.dedup_key)) is job:
+                    del self._in_flight[(job.source_type, job.dedup_key)]
+                self._dispatch(job.source_type)
+
+    def _prune(self):
+        # Forget finished jobs once they are older than the retention window.
+        cutoff = time.time() - self._retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager(
+                    max_workers=config.JOBS_MAX_WORKERS,
+                    type_limits={
+                        "youtube": config.JOBS_YOUTUBE_CONCURRENCY,
+                        "website": config.JOBS_WEBSITE_CONCURRENCY,
+                        "file": config.JOBS_FILE_CONCURRENCY,
+                        "batch": config.JOBS_BATCH_CONCURRENCY,
+                        "default": config.JOBS_MAX_WORKERS,
+                    },
+                    retention_seconds=config.JOBS_RETENTION_SECONDS
+                )
+    return _manager
@@ -0,0 +1,89 @@
+import importlib
+import importlib.util
+import logging
+import threading
+import time
+
+# Deferred imports of heavy third-party packages, grouped by the route family that needs
+# them, so starting a worker (or a test process) only pays for Flask and the stores:
+#   "llm":     openai, httpx                 (summaries, chat, reports)
+#   "web":     requests, httpx, bs4, lxml    (website and batch imports)
+#   "youtube": yt_dlp
+#   "pdf":     PyPDF2
+# A module declares `openai = lazy_import("openai", "llm")` and uses `openai.X` as usual;
+# the package is imported on the first attribute access, e.g. the first LLM call.
+#
+# preload() imports the given families up front and runs their preload hooks (e.g. building
+# the pooled OpenAI client). create_app() calls it for config.PRELOAD_DEPENDENCIES, so a
+# pre-fork server (gunicorn --preload) loads everything once in the parent and the workers
+# share it, and uvicorn workers pay for it at boot instead of on the first request.
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_modules = {}   # module name -> _LazyModule
+_families = {}  # family -> set of module names
+_hooks = {}     # family -> list of preload functions
+
+
+class _LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        # Only called for attributes not set in __init__. import_module holds the import
+        # lock, so concurrent first uses import the package once.
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name, family):
+    with _lock:
+        _families.setdefault(family, set()).add(name)
+        if name not in _modules:
+            _modules[name] = _LazyModule(name)
+        return _modules[name]
+
+
+def preload_hook(family):
+    # Decorator: run the function when the family is preloaded.
+    def register(function):
+        with _lock:
+            _hooks.setdefault(family, []).append(function)
+        return function
+    return register
+
+
+def families():
+    with _lock:
+        return sorted(set(_families) | set(_hooks))
+
+
+def preload(selected=None):
+    # Imports the modules and runs the hooks of the selected families (all when None).
+    # Returns {family: seconds}.
+    timings = {}
+    for family in selected or families():
+        with _lock:
+            names, hooks = sorted(_families.get(family, ())), list(_hooks.get(family, ()))
+        if not names and not hooks:
+            logger.warning("Unknown preload family '%s' (known: %s)", family, ", ".join(families()))
+            continue
+        start = time.perf_counter()
+        for name in names:
+            # Optional packages (e.g. lxml) that are not installed are left to their modules' fallbacks.
+            if importlib.util.find_spec(name.partition(".")[0]) is None:
+                continue
+            _modules[name]._module = importlib.import_module(name)
+        for hook in hooks:
+            hook()
+        timings[family] = time.perf_counter() - start
+        logger.info("Preloaded %s (%s) in %.0f ms", family, ", ".join(names) or "hooks only", timings[family] * 1000)
+    return timings
@@ -0,0 +1,272 @@
+import asyncio
+import random
+import threading
+import time
+
+import config
+from utils import metrics
+from utils.chunker import count_tokens
+from utils.lazy import lazy_import, preload_hook
+from utils.llm_scheduler import get_scheduler
+from utils.model_router import model_for
+
+httpx = lazy_import("httpx", "llm")
+openai = lazy_import("openai", "llm")
+
+# One process-wide OpenAI client. Building a client per request means a new connection
+# pool and fresh TLS handshakes every time; sharing one keeps connections alive across
+# requests and threads (the client is thread-safe).
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+_RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+@preload_hook("llm")
+def init_openai_client():
+    # Built on first use, or at startup when the "llm" family is preloaded. Returns None when no API key is configured,
+    # so callers can keep reporting the "API key not configured" error themselves.
+    global _client
+    with _client_lock:
+        if _client is None and config.OPENAI_API_KEY:
+            _client = openai.OpenAI(
+                api_key=config.OPENAI_API_KEY,
+                base_url=config.OPENAI_BASE_URL or None,
+                timeout=httpx.Timeout(config.OPENAI_TIMEOUT_SECONDS, connect=config.OPENAI_CONNECT_TIMEOUT_SECONDS),
+                # Retries are handled by create_chat_completion so the policy lives in one place.
+                max_retries=0,
+                http_client=openai.DefaultHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=config.OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=config.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=config.OPENAI_KEEPALIVE_EXPIRY_SECONDS
+                    )
+                )
+            )
+    return _client
+
+
+def get_openai_client():
+    return _client if _client is not None else init_openai_client()
+
+
+def get_async_openai_client():
+    # AsyncOpenAI client for the async routes served by asgi.py. Its connection pool
+    # belongs to the event loop that first uses it, so it must only be used from the
+    # server's event loop (background threads keep using the sync client).
+    global _async_client
+    with _client_lock:
+        if _async_client is None and config.OPENAI_API_KEY:
+            _async_client = openai.AsyncOpenAI(
+                api_key=config.OPENAI_API_KEY,
+                base_url=config.OPENAI_BASE_URL or None,
+                timeout=httpx.Timeout(config.OPENAI_TIMEOUT_SECONDS, connect=config.OPENAI_CONNECT_TIMEOUT_SECONDS),
+                max_retries=0,
+                http_client=openai.DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=config.OPENAI_ASYNC_MAX_CONNECTIONS,
+                        max_keepalive_connections=config.OPENAI_ASYNC_MAX_CONNECTIONS,
+                        keepalive_expiry=config.OPENAI_KEEPALIVE_EXPIRY_SECONDS
+                    )
+                )
+            )
+    return _async_client
+
+
+async def close_async_openai_client():
+    global _async_client
+    with _client_lock:
+        client, _async_client = _async_client, None
+    if client is not None:
+        await client.close()
+
+
+def _is_retryable(error):
+    if isinstance(error, openai.APIConnectionError):  # includes APITimeoutError
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in _RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+def _retry_delay(error, attempt):
+    # Exponential backoff with full jitter, so a burst of 429s does not retry in lockstep.
+    delay = random.uniform(0, min(config.OPENAI_RETRY_MAX_DELAY_SECONDS,
+                                  config.OPENAI_RETRY_BASE_DELAY_SECONDS * (2 ** attempt)))
+    # Respect an explicit Retry-After from the server when it asks for longer.
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            delay = max(delay, min(float(retry_after), config.OPENAI_RETRY_MAX_DELAY_SECONDS))
+        except ValueError:
+            pass
+    return delay
+
+
+def _record_tokens(model, prompt_tokens, completion_tokens):
+    metrics.increment("llm_tokens_total", prompt_tokens, kind="prompt", model=model)
+    metrics.increment("llm_tokens_total", completion_tokens, kind="completion", model=model)
+
+
+def _estimate_prompt_tokens(messages):
+    return sum(count_tokens(m.get("content") or "") + 4 for m in messages or [])
+
+
+def _reservation(kwargs):
+    # Tokens a call is charged against LLM_RATE_LIMIT_TPM until its usage is known:
+    # the prompt estimate plus the completion limit (see utils/llm_scheduler.py).
+    if not get_scheduler().counts_tokens:
+        return 0
+    return _estimate_prompt_tokens(kwargs.get("messages")) + (kwargs.get("max_tokens") or config.LLM_DEFAULT_COMPLETION_TOKENS)
+
+
+def _account(model, reserved, prompt_tokens, completion_tokens):
+    _record_tokens(model, prompt_tokens, completion_tokens)
+    get_scheduler().settle(reserved, prompt_tokens + completion_tokens)
+
+
+def _on_failure(error, attempt, reserved):
+    # Shared by the sync and async retry loops: returns how long to wait before the next
+    # attempt, or 0 when the scheduler already holds it back.
+    scheduler = get_scheduler()
+    scheduler.settle(reserved, 0)  # a failed call uses no tokens
+    metrics.increment("llm_retries_total", error=type(error).__name__)
+    delay = _retry_delay(error, attempt)
+    if isinstance(error, openai.APIStatusError) and error.status_code == 429:
+        # The account limit applies to every call, so pause them all rather than only this one.
+        scheduler.pause(delay)
+        return 0
+    return delay
+
+
+def _create(client, task, kwargs, reserved):
+    # Every attempt waits for the scheduler; LLMOverloadedError is raised if it is shed.
+    scheduler = get_scheduler()
+    attempt = 0
+    while True:
+        scheduler.acquire(task, reserved)
+        try:
+            return client.chat.completions.create(**kwargs)
+        except openai.OpenAIError as e:
+            if attempt >= config.OPENAI_MAX_RETRIES or not _is_retryable(e):
+                scheduler.settle(reserved, 0)
+                raise
+            time.sleep(_on_failure(e, attempt, reserved))
+            attempt += 1
+
+
+def _open(task, kwargs):
+    # Sends the request; returns the completion (or stream) with the tokens reserved for it.
+    client = get_openai_client()
+    if client is None:
+        raise openai.OpenAIError("OpenAI API key not configured.")
+    kwargs.setdefault("model", model_for(task))
+    reserved = _reservation(kwargs)
+    return _create(client, task, kwargs, reserved), reserved
+
+
+def create_chat_completion(task=None, **kwargs):
+    # Thin wrapper around client.chat.completions.create with bounded retries. task names
+    # the call site; unless a model is given, its tier picks one (utils/model_router.py),
+    # and its priority class orders it in the scheduler (utils/llm_scheduler.py).
+    # Raises openai.OpenAIError if the key is missing or retries are exhausted, and
+    # LLMOverloadedError if the scheduler sheds the call.
+    if kwargs.get("stream"):
+        # Opening the stream only; stream_chat_completion times and counts the rest.
+        return _open(task, kwargs)[0]
+    with metrics.timed("llm_call", task=task or "other"):
+        completion, reserved = _open(task, kwargs)
+    usage = getattr(completion, "usage", None)
+    if usage is not None:
+        _account(kwargs["model"], reserved, usage.prompt_tokens or 0, usage.completion_tokens or 0)
+    return completion
+
+
+def stream_chat_completion(task=None, **kwargs):
+    # Generator yielding content deltas as they arrive. Retries only cover opening the
+    # stream; once tokens have been sent to the client a failure is surfaced as-is.
+    model = kwargs.setdefault("model", model_for(task))
+    start = time.perf_counter()
+    usage = None
+    parts = []
+    with metrics.timed("llm_stream", task=task or "other"):
+        stream, reserved = _open(task, dict(kwargs, stream=True))
+        for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not parts:
+                    metrics.observe("stage_seconds", time.perf_counter() - start, stage="llm_first_token")
+                parts.append(delta)
+                yield delta
+    if usage is not None:
+        _account(model, reserved, usage.prompt_tokens or 0, usage.completion_tokens or 0)
+    else:
+        _account(model, reserved, _estimate_prompt_tokens(kwargs.get("messages")), count_tokens("".join(parts)))
+
+
+# --- Async variants for the ASGI routes (routes/async_api.py) ---
+# Same retry policy, metrics and token accounting as above; waiting for the model does
+# not hold a thread.
+
+async def _acreate(client, task, kwargs, reserved):
+    scheduler = get_scheduler()
+    attempt = 0
+    while True:
+        await scheduler.acquire_async(task, reserved)
+        try:
+            return await client.chat.completions.create(**kwargs)
+        except openai.OpenAIError as e:
+            if attempt >= config.OPENAI_MAX_RETRIES or not _is_retryable(e):
+                scheduler.settle(reserved, 0)
+                raise
+            await asyncio.sleep(_on_failure(e, attempt, reserved))
+            attempt += 1
+
+
+async def _aopen(task, kwargs):
+    client = get_async_openai_client()
+    if client is None:
+        raise openai.OpenAIError("OpenAI API key not configured.")
+    kwargs.setdefault("model", model_for(task))
+    reserved = _reservation(kwargs)
+    return await _acreate(client, task, kwargs, reserved), reserved
+
+
+async def acreate_chat_completion(task=None, **kwargs):
+    if kwargs.get("stream"):
+        return (await _aopen(task, kwargs))[0]
+    with metrics.timed("llm_call", task=task or "other"):
+        completion, reserved = await _aopen(task, kwargs)
+    usage = getattr(completion, "usage", None)
+    if usage is not None:
+        _account(kwargs["model"], reserved, usage.prompt_tokens or 0, usage.completion_tokens or 0)
+    return completion
+
+
+async def astream_chat_completion(task=None, **kwargs):
+    # Async generator yielding content deltas (see stream_chat_completion).
+    model = kwargs.setdefault("model", model_for(task))
+    start = time.perf_counter()
+    usage = None
+    parts = []
+    with metrics.timed("llm_stream", task=task or "other"):
+        stream, reserved = await _aopen(task, dict(kwargs, stream=True))
+        async for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not parts:
+                    metrics.observe("stage_seconds", time.perf_counter() - start, stage="llm_first_token")
+                parts.append(delta)
+                yield delta
+    if usage is not None:
+        _account(model, reserved, usage.prompt_tokens or 0, usage.completion_tokens or 0)
+    else:
+        _account(model, reserved, _estimate_prompt_tokens(kwargs.get("messages")), count_tokens("".join(parts)))
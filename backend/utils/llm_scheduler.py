@@ -0,0 +1,333 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+
+import config
+from utils import metrics
+
+# Admission control and rate-limit scheduling for LLM calls, so that interactive chat is
+# not stuck behind a burst of bulk summaries when the OpenAI quota runs out.
+#
+# Every model call (utils/llm_client.py) first acquires a slot from the process-wide
+# scheduler. Slots are paid for from two token buckets, LLM_RATE_LIMIT_RPM requests and
+# LLM_RATE_LIMIT_TPM tokens per minute (prompt estimate + max_tokens, settled against the
+# reported usage afterwards); set them to this worker's share of the account limits. When
+# the buckets are empty, waiting calls are served by priority class (interactive chat
+# first, then reports, then bulk ingestion), oldest first within a class; a waiting call
+# moves up one class every _AGING_SECONDS so bulk work is not starved. A 429 from the API
+# pauses every call for its Retry-After, after which the queue drains in the same order.
+#
+# Load shedding: a call that would exceed its class's queue length or maximum wait raises
+# LLMOverloadedError, which the routes answer with 429 and Retry-After. The API routes
+# also check this before doing any work (admit()), together with a cap on concurrent
+# LLM-bound requests per client address (LLM_MAX_CONCURRENT_PER_CLIENT, off by default).
+#
+# With the default settings (no limits configured) calls go straight through; only the
+# 429 pause applies.
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+STANDARD = "standard"
+BULK = "bulk"
+
+_RANKS = {INTERACTIVE: 0, STANDARD: 1, BULK: 2}
+
+TASK_PRIORITIES = {
+    "chat": INTERACTIVE,
+    "chat_memory": INTERACTIVE,  # runs inside a chat turn (utils/conversation_memory.py)
+    "report_cards": STANDARD,
+    "synthesis": STANDARD,
+    "source_digest": STANDARD,   # part of a notebook report
+    "summary": BULK,
+    "chunk_notes": BULK,
+    "merge_notes": BULK,
+}
+
+_AGING_SECONDS = 30.0
+
+
+class LLMOverloadedError(RuntimeError):
+    # The call was shed; the client should retry after retry_after seconds.
+    status_code = 429
+
+    def __init__(self, retry_after, reason="capacity"):
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+        super().__init__(f"The language model is at capacity ({reason}); retry in {self.retry_after} s")
+
+
+def priority_for(task):
+    return TASK_PRIORITIES.get(task, STANDARD)
+
+
+def max_wait(priority):
+    return {INTERACTIVE: config.LLM_MAX_WAIT_INTERACTIVE_SECONDS,
+            STANDARD: config.LLM_MAX_WAIT_STANDARD_SECONDS,
+            BULK: config.LLM_MAX_WAIT_BULK_SECONDS}[priority]
+
+
+class _Bucket:
+    # Refills continuously at per_minute / 60 per second up to per_minute. The level may go
+    # negative: a call larger than the bucket still runs once it is full, and pays it back.
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        needed = min(amount, self.capacity) - self.level
+        return needed / self.rate if needed > 0 else 0.0
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "enqueued_at", "signal", "granted")
+
+    def __init__(self, priority, seq, tokens, signal):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+        self.signal = signal
+        self.granted = False
+
+
+class LLMScheduler:
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self._lock = threading.Lock()
+        self._requests = _Bucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = _Bucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._waiters = []
+        self._seq = 0
+        self._paused_until = 0.0
+
+    @property
+    def counts_tokens(self):
+        # Whether acquire() needs a token estimate at all.
+        return self._tokens is not None
+
+    # --- Called with self._lock held ---
+
+    def _refill(self, now):
+        for bucket in (self._requests, self._tokens):
+            if bucket is not None:
+                bucket.refill(now)
+
+    def _delay(self, tokens, now):
+        delays = [self._paused_until - now]
+        if self._requests is not None:
+            delays.append(self._requests.wait_time(1))
+        if self._tokens is not None:
+            delays.append(self._tokens.wait_time(tokens))
+        return max(0.0, *delays)
+
+    def _take(self, tokens):
+        if self._requests is not None:
+            self._requests.level -= 1
+        if self._tokens is not None:
+            self._tokens.level -= tokens
+
+    def _head(self, now):
+        return min(self._waiters, key=lambda w: (_RANKS[w.priority] - (now - w.enqueued_at) / _AGING_SECONDS, w.seq))
+
+    def _dispatch(self, now):
+        # Grants waiting calls in priority order while the buckets allow; returns the head
+        # that has to wait and for how long, or (None, None) when the queue is empty.
+        self._refill(now)
+        while self._waiters:
+            head = self._head(now)
+            delay = self._delay(head.tokens, now)
+            if delay > 0:
+                return head, delay
+            self._take(head.tokens)
+            self._waiters.remove(head)
+            head.granted = True
+            head.signal()
+            metrics.observe("llm_queue_wait_seconds", now - head.enqueued_at, priority=head.priority)
+        return None, None
+
+    def _projected_wait(self, priority, tokens, now):
+        # Rough time until a new call of this class would be served: everything queued at
+        # the same or a higher priority goes first.
+        self._refill(now)
+        ahead = [w for w in self._waiters if _RANKS[w.priority] <= _RANKS[priority]]
+        wait = self._paused_until - now
+        if self._requests is not None:
+            wait = max(wait, (len(ahead) + 1 - self._requests.level) / self._requests.rate)
+        if self._tokens is not None:
+            needed = sum(w.tokens for w in ahead) + min(tokens, self._tokens.capacity)
+            wait = max(wait, (needed - self._tokens.level) / self._tokens.rate)
+        return max(0.0, wait)
+
+    def _check_capacity(self, priority, tokens, now):
+        queued = sum(1 for w in self._waiters if w.priority == priority)
+        if queued >= config.LLM_SCHEDULER_MAX_QUEUE:
+            self._shed(priority, "queue", self._projected_wait(priority, tokens, now))
+        wait = self._projected_wait(priority, tokens, now)
+        if wait > max_wait(priority):
+            self._shed(priority, "wait", wait)
+
+    def _shed(self, priority, reason, retry_after):
+        metrics.increment("llm_shed_total", priority=priority, reason=reason)
+        raise LLMOverloadedError(retry_after, "queue full" if reason == "queue" else "rate limit")
+
+    # --- Public API ---
+
+    def _join(self, task, tokens, signal):
+        # The waiter for a new call (already granted when it can go right away).
+        priority = priority_for(task)
+        now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            self._seq += 1
+            waiter = _Waiter(priority, self._seq, tokens, signal)
+            if not self._waiters and self._delay(tokens, now) == 0:
+                self._take(tokens)
+                waiter.granted = True
+                return waiter
+            self._check_capacity(priority, tokens, now)
+            self._waiters.append(waiter)
+            metrics.increment("llm_queued_total", priority=priority)
+            return waiter
+
+    def _wake_head(self, now):
+        # Only the head of the queue times its wait on the buckets; the others sleep until
+        # their deadline. Make sure the current head is awake to do so.
+        head, _ = self._dispatch(now)
+        if head is not None:
+            head.signal()
+        return head
+
+    def _poll(self, waiter, deadline):
+        # None once the waiter is granted, else how long to sleep before polling again.
+        now = time.monotonic()
+        with self._lock:
+            head, delay = self._dispatch(now)
+            if head is not None and head is not waiter:
+                head.signal()
+            if waiter.granted:
+                return None
+            if now >= deadline:
+                self._waiters.remove(waiter)
+                self._wake_head(now)
+                self._shed(waiter.priority, "wait", self._projected_wait(waiter.priority, waiter.tokens, now))
+            if head is not waiter:
+                return deadline - now
+            return min(delay, deadline - now)
+
+    def _leave(self, waiter):
+        with self._lock:
+            if not waiter.granted and waiter in self._waiters:
+                self._waiters.remove(waiter)
+                self._wake_head(time.monotonic())
+
+    def acquire(self, task, tokens=0):
+        # Blocks until the call may be sent. Raises LLMOverloadedError when it is shed.
+        event = threading.Event()
+        waiter = self._join(task, tokens, event.set)
+        deadline = waiter.enqueued_at + max_wait(waiter.priority)
+        try:
+            while True:
+                event.clear()
+                timeout = self._poll(waiter, deadline)
+                if timeout is None:
+                    return tokens
+                event.wait(timeout)
+        finally:
+            self._leave(waiter)
+
+    async def acquire_async(self, task, tokens=0):
+        # acquire() for the event loop; waiting does not hold a thread.
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = self._join(task, tokens, lambda: loop.call_soon_threadsafe(event.set))
+        deadline = waiter.enqueued_at + max_wait(waiter.priority)
+        try:
+            while True:
+                event.clear()
+                timeout = self._poll(waiter, deadline)
+                if timeout is None:
+                    return tokens
+                try:
+                    await asyncio.wait_for(event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._leave(waiter)
+
+    def settle(self, reserved, used):
+        # Returns tokens reserved but not used (max_tokens is rarely reached).
+        if self._tokens is None or used >= reserved:
+            return
+        with self._lock:
+            self._tokens.level = min(self._tokens.capacity, self._tokens.level + reserved - used)
+            self._wake_head(time.monotonic())
+
+    def pause(self, seconds):
+        # The API answered 429: hold every call until it is expected to accept them again.
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        metrics.increment("llm_rate_limit_pauses_total")
+        logger.warning("LLM rate limit hit; pausing model calls for %.1f s", seconds)
+
+    def check_admission(self, priority):
+        # Raises LLMOverloadedError if a request of this class would be shed right away.
+        with self._lock:
+            self._check_capacity(priority, config.LLM_DEFAULT_COMPLETION_TOKENS, time.monotonic())
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+_client_requests = {}
+_client_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LLMScheduler(config.LLM_RATE_LIMIT_RPM, config.LLM_RATE_LIMIT_TPM)
+    return _scheduler
+
+
+def client_id(headers, remote_addr):
+    # Identifies the caller for the per-client cap: the peer address, or with
+    # LLM_TRUSTED_PROXY_HOPS proxies in front, the address the outermost of them saw. Only
+    # entries appended by trusted proxies are used; anything to their left came from the
+    # client. headers: Flask's (case-insensitive) or the ASGI routes' lowercased dict.
+    hops = config.LLM_TRUSTED_PROXY_HOPS
+    if hops > 0:
+        forwarded = [part.strip() for part in (headers.get("x-forwarded-for") or "").split(",") if part.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return remote_addr or "unknown"
+
+
+def admit(priority, client):
+    # Admission for an LLM-bound API request: raises LLMOverloadedError when the client
+    # already has LLM_MAX_CONCURRENT_PER_CLIENT requests in flight or the class would be
+    # shed; otherwise counts the request until release(client).
+    get_scheduler().check_admission(priority)
+    with _client_lock:
+        active = _client_requests.get(client, 0)
+        if 0 < config.LLM_MAX_CONCURRENT_PER_CLIENT <= active:
+            metrics.increment("llm_shed_total", priority=priority, reason="client")
+            raise LLMOverloadedError(1, "too many concurrent requests from this client")
+        _client_requests[client] = active + 1
+
+
+def release(client):
+    with _client_lock:
+        active = _client_requests.get(client, 0) - 1
+        if active > 0:
+            _client_requests[client] = active
+        else:
+            _client_requests.pop(client, None)
@@ -0,0 +1,168 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+
+# In-process instrumentation: counters and latency histograms, rendered in the Prometheus
+# text format by GET /metrics (routes/metrics.py), plus optional JSON-lines traces of every
+# timed stage (METRICS_TRACE_PATH). Everything lives in this process; with several worker
+# processes each one reports its own numbers.
+#
+#   with metrics.timed("fetch"):            # knowmelm_stage_seconds{stage="fetch"}
+#       ...                                 # knowmelm_stage_errors_total{stage="fetch",error=...}
+#   metrics.increment("llm_tokens_total", n, kind="prompt")
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "knowmelm_"
+
+# Histogram bucket upper bounds in seconds: LLM calls take seconds, parsing milliseconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+_counters = {}     # (name, labels) -> value
+_histograms = {}   # (name, labels) -> [bucket counts..., +Inf count, sum]
+_help = {}
+
+_trace_lock = threading.Lock()
+_trace_file = None
+
+
+def _labels_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def describe(name, text):
+    _help[name] = text
+
+
+def increment(name, amount=1, **labels):
+    key = (name, _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    key = (name, _labels_key(labels))
+    index = bisect.bisect_left(LATENCY_BUCKETS, value)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+        histogram[index] += 1
+        histogram[-1] += value
+
+
+def _write_trace(record):
+    global _trace_file
+    with _trace_lock:
+        if _trace_file is None:
+            _trace_file = open(config.METRICS_TRACE_PATH, "a", encoding="utf-8", buffering=1)
+        _trace_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+@contextmanager
+def timed(stage, **labels):
+    # Times the block as one stage. Exceptions are counted per type and re-raised
+    # (a generator closed early by its consumer is not an error).
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except GeneratorExit:
+        raise
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        observe("stage_seconds", duration, stage=stage, **labels)
+        if error is not None:
+            increment("stage_errors_total", stage=stage, error=error, **labels)
+        if config.METRICS_TRACE_PATH:
+            try:
+                _write_trace(dict(labels, ts=time.time(), stage=stage,
+                                  duration_ms=round(duration * 1000, 3), error=error))
+            except OSError as e:
+                logger.warning("Failed to write trace record: %s", e)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def render_prometheus():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(value) for key, value in _histograms.items()}
+
+    lines = []
+    seen = set()
+    for (name, labels), value in sorted(counters.items()):
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {PREFIX}{name} {_help[name]}")
+            lines.append(f"# TYPE {PREFIX}{name} counter")
+        lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+
+    for (name, labels), buckets in sorted(histograms.items()):
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {PREFIX}{name} {_help[name]}")
+            lines.append(f"# TYPE {PREFIX}{name} histogram")
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, buckets):
+            cumulative += count
+            lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, [('le', str(bound))])} {cumulative}")
+        cumulative += buckets[len(LATENCY_BUCKETS)]
+        lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {cumulative}")
+        lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {buckets[-1]:.6f}")
+        lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+describe("stage_seconds", "Duration of pipeline stages (fetch, parse, pdf_extract, llm_call, report_render, ...).")
+describe("stage_errors_total", "Exceptions raised inside a timed stage, by exception type.")
+describe("http_request_seconds", "Time until the response headers were ready, per route.")
+describe("http_requests_total", "HTTP requests by route, method and status code.")
+describe("llm_tokens_total", "Prompt and completion tokens (estimated locally for streams without reported usage).")
+describe("cache_events_total", "Cache hits, misses, stores and evictions.")
+
+
+def instrument_app(app):
+    # Per-route request latency and status counts. For streamed (SSE) responses this is the
+    # time to the first byte; the streamed stages are timed separately.
+    # (Flask is imported here so PDF worker processes importing this module stay light.)
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = getattr(g, "metrics_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            observe("http_request_seconds", time.perf_counter() - start, route=route, method=request.method)
+            increment("http_requests_total", route=route, method=request.method, status=response.status_code)
+        return response
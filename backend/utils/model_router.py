@@ -0,0 +1,57 @@
+import functools
+import logging
+
+import config
+
+# Model tiers for LLM calls. Every call names its task (create_chat_completion(task=...));
+# the task's tier picks the model: "fast" (OPENAI_MODEL_FAST) for mechanical sub-tasks such
+# as chunk notes, digests and chat-history compression, "strong" (OPENAI_MODEL_STRONG) for
+# what users read directly. Both tiers default to OPENAI_MODEL, so nothing changes until a
+# fast model is configured. LLM_TASK_TIERS overrides single tasks, e.g.
+# "report_cards=fast,chat_memory=strong".
+
+logger = logging.getLogger(__name__)
+
+FAST = "fast"
+STRONG = "strong"
+
+TASK_TIERS = {
+    "chunk_notes": FAST,     # map step of long-document summaries (utils/summarizer.py)
+    "merge_notes": FAST,     # reduce step of long-document summaries
+    "summary": STRONG,       # the study guide written for each source
+    "chat": STRONG,
+    "chat_memory": FAST,     # running summary of older chat turns (utils/conversation_memory.py)
+    "report_cards": STRONG,  # report content (utils/report.py)
+    "source_digest": FAST,   # per-source digests for notebook reports (utils/synthesis.py)
+    "synthesis": STRONG,     # notebook report content
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _overrides(setting):
+    overrides = {}
+    for entry in setting.split(","):
+        task, _, tier = entry.partition("=")
+        task, tier = task.strip(), tier.strip().lower()
+        if not task:
+            continue
+        if tier not in (FAST, STRONG):
+            logger.warning("Ignoring LLM_TASK_TIERS entry '%s': tier must be '%s' or '%s'", entry.strip(), FAST, STRONG)
+            continue
+        overrides[task] = tier
+    return overrides
+
+
+def tier_for(task):
+    # Unknown tasks (and calls without one) use the strong tier.
+    return _overrides(config.LLM_TASK_TIERS).get(task) or TASK_TIERS.get(task, STRONG)
+
+
+def model_for(task):
+    return config.OPENAI_MODEL_FAST if tier_for(task) == FAST else config.OPENAI_MODEL_STRONG
+
+
+def cache_model(*tasks):
+    # Model part of a cache key for output produced by the given tasks together, so that
+    # changing any of their models misses (and a single-model setup keeps its keys).
+    return "+".join(sorted({model_for(task) or "" for task in tasks}))
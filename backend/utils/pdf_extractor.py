@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+from utils import metrics
+from utils.lazy import lazy_import
+
+PyPDF2 = lazy_import("PyPDF2", "pdf")
+
+# PDF text extraction for uploads. The upload is spooled to a temp file in fixed-size
+# blocks (never held in memory as a whole), checked against size and page limits, and
+# its pages are extracted in parallel on a process pool (PyPDF2 is pure Python, so
+# threads would serialize on the GIL). Page texts come back in order as an iterator,
+# so callers can join them in one pass or feed them straight into the chunker.
+
+_SPOOL_BLOCK_SIZE = 1024 * 1024
+
+
+class PdfLimitError(ValueError):
+    # Raised when an upload exceeds PDF_MAX_BYTES or PDF_MAX_PAGES.
+    pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # forkserver avoids forking the (multi-threaded) web server process itself.
+                start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else None
+                _pool = ProcessPoolExecutor(
+                    max_workers=config.PDF_MAX_WORKERS,
+                    mp_context=multiprocessing.get_context(start_method)
+                )
+    return _pool
+
+
+def spool_upload(stream, max_bytes):
+    # Copies the upload to a named temp file (worker processes open it by path).
+    # The caller owns the returned path and must remove it.
+    spooled = tempfile.NamedTemporaryFile(prefix="upload-", suffix=".pdf", dir=config.UPLOAD_SPOOL_DIR, delete=False)
+    try:
+        written = 0
+        while True:
+            block = stream.read(_SPOOL_BLOCK_SIZE)
+            if not block:
+                break
+            written += len(block)
+            if written > max_bytes:
+                raise PdfLimitError(f"PDF exceeds the upload limit of {max_bytes} bytes.")
+            spooled.write(block)
+        spooled.close()
+        return spooled.name
+    except Exception:
+        spooled.close()
+        os.unlink(spooled.name)
+        raise
+
+
+def _extract_page_range(path, start, stop):
+    # Runs in a worker process: each worker opens the file itself, so only page
+    # numbers and the extracted text cross the process boundary.
+    reader = PyPDF2.PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def iter_pdf_pages(path):
+    # Yields the text of every page in order.
+    reader = PyPDF2.PdfReader(path)
+    page_count = len(reader.pages)
+    if page_count > config.PDF_MAX_PAGES:
+        raise PdfLimitError(f"PDF has {page_count} pages; the limit is {config.PDF_MAX_PAGES}.")
+
+    if page_count < config.PDF_PARALLEL_MIN_PAGES or config.PDF_MAX_WORKERS <= 1:
+        for page in reader.pages:
+            yield page.extract_text() or ""
+        return
+
+    step = config.PDF_PAGES_PER_TASK
+    starts = range(0, page_count, step)
+    results = _get_pool().map(
+        _extract_page_range,
+        [path] * len(starts),
+        starts,
+        [min(start + step, page_count) for start in starts]
+    )
+    for page_texts in results:
+        yield from page_texts
+
+
+def extract_pdf_text(stream):
+    with metrics.timed("upload_spool"):
+        path = spool_upload(stream, config.PDF_MAX_BYTES)
+    try:
+        with metrics.timed("pdf_extract"):
+            # One join over the page iterator: no repeated string concatenation.
+            return "\n".join(iter_pdf_pages(path))
+    finally:
+        os.unlink(path)
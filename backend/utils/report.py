@@ -0,0 +1,244 @@
+import json
+import os
+import re
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+import config
+from utils import metrics, summary_cache
+from utils.model_router import model_for
+
+# HTML reports for /generate-html-report. The model writes the report content once, as
+# JSON "cards"; the Bento-grid HTML is rendered locally from templates/report.html.
+# Both the cards and the rendered HTML are kept in the summary cache:
+#   cards: keyed by (title, summary, model, REPORT_CARDS_PROMPT_VERSION)
+#   html:  keyed by the same plus REPORT_TEMPLATE_VERSION and the theme
+# so reopening a report, or switching its theme, costs no tokens (unless
+# SUMMARY_CACHE_ENABLED is off, which turns this off as well). Bump
+# REPORT_CARDS_PROMPT_VERSION when the prompt changes, REPORT_TEMPLATE_VERSION when the
+# template does.
+
+REPORT_CARDS_PROMPT_VERSION = "cards-v1"
+REPORT_TEMPLATE_VERSION = "bento-v1"
+
+# Accent gradient and page colours per theme (CSS custom properties in the template).
+THEMES = {
+    "purple": {"accent_from": "#C084FC", "accent_to": "#7E22CE", "background": "#f5f5f7", "card": "#ffffff", "text": "#1d1d1f", "muted": "#6e6e73"},
+    "blue": {"accent_from": "#60A5FA", "accent_to": "#1D4ED8", "background": "#f5f7fa", "card": "#ffffff", "text": "#111827", "muted": "#6b7280"},
+    "green": {"accent_from": "#34D399", "accent_to": "#047857", "background": "#f4f8f6", "card": "#ffffff", "text": "#10231c", "muted": "#5f6f68"},
+    "amber": {"accent_from": "#FBBF24", "accent_to": "#C2410C", "background": "#faf7f2", "card": "#ffffff", "text": "#1f1a14", "muted": "#75695c"},
+    "dark": {"accent_from": "#A78BFA", "accent_to": "#EC4899", "background": "#111114", "card": "#1c1c21", "text": "#f4f4f5", "muted": "#a1a1aa"},
+}
+
+CARD_SIZES = ("large", "medium", "small")
+
+_MAX_CARDS = 12
+_MAX_LIST_ITEMS = 8
+_MAX_HIGHLIGHTS = 4
+
+_FENCE_RE = re.compile(r'^\s*```[\w+-]*[^\S\n]*\n?(.*?)\n?```\s*$', re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r',\s*([}\]])')
+
+_environment = Environment(
+    loader=FileSystemLoader(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")),
+    autoescape=select_autoescape(["html"]),
+)
+
+
+class ReportError(ValueError):
+    pass
+
+
+# The JSON the model is asked for; parse_cards accepts it. Shared with utils/synthesis.py.
+CARDS_JSON_FORMAT = """Answer with a single JSON object and nothing else, using this structure:
+{
+  "headline": "short, punchy report title",
+  "subtitle": "one sentence describing what the report covers",
+  "highlights": [{"value": "key number or short phrase", "label": "what it means"}],
+  "cards": [
+    {
+      "title": "card heading",
+      "icon": "one emoji",
+      "size": "large | medium | small",
+      "body": "2-3 sentences",
+      "items": ["short bullet", "..."],
+      "tags": ["category", "..."],
+      "metrics": [{"label": "compared item", "value": 0-100}]
+    }
+  ],
+  "conclusion": "takeaway or call to action"
+}"""
+
+
+def build_cards_messages(title, summary_text):
+    prompt = f"""Turn the study notes below into the content of a one-page visual report titled '{title}'.
+{CARDS_JSON_FORMAT}
+Guidelines:
+- 2 to 4 highlights with the most important numbers or facts.
+- 6 to 10 cards: overview and key features first, then details and specifications, then practical guidance; use "large" for the one or two most important cards.
+- Keep text short: emphasise numbers and key terms, avoid long paragraphs. "items", "tags" and "metrics" are optional; use "metrics" only for data that can be compared on a 0-100 scale.
+- Write in the same language as the notes.
+
+Notes:
+{summary_text}
+"""
+    return [
+        {"role": "system", "content": "You write concise, well-structured report content as JSON."},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def completion_options():
+    # Extra arguments for the cards call. JSON mode can be turned off for OpenAI-compatible
+    # servers that reject response_format; the output is parsed leniently either way.
+    options = {"temperature": 0.3, "max_tokens": config.REPORT_MAX_TOKENS}
+    if config.REPORT_JSON_MODE:
+        options["response_format"] = {"type": "json_object"}
+    return options
+
+
+def strip_code_fences(text):
+    # Models often wrap output in ```json ... ``` despite instructions; an unterminated
+    # opening fence (output cut off) is dropped as well.
+    text = (text or "").strip()
+    match = _FENCE_RE.match(text)
+    if match:
+        return match.group(1).strip()
+    if text.startswith("```"):
+        return text.split("\n", 1)[1].strip() if "\n" in text else ""
+    return text
+
+
+def loads_lenient(text):
+    # json.loads for model output; raises ReportError (a ValueError) when nothing parses.
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    # Chatter around the object, or trailing commas.
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        raise ReportError("The model did not return report content as JSON.")
+    candidate = text[start:end + 1]
+    for attempt in (candidate, _TRAILING_COMMA_RE.sub(r'\1', candidate)):
+        try:
+            return json.loads(attempt)
+        except ValueError:
+            continue
+    raise ReportError("The model returned malformed report JSON.")
+
+
+def _text(value, limit=600):
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        value = str(value)
+    return value.strip()[:limit]
+
+
+def _text_list(values, limit=_MAX_LIST_ITEMS, length=200):
+    if not isinstance(values, list):
+        return []
+    return [text for text in (_text(value, length) for value in values[:limit]) if text]
+
+
+def _metrics(values):
+    result = []
+    for value in values if isinstance(values, list) else []:
+        if not isinstance(value, dict):
+            continue
+        try:
+            number = float(str(value.get("value", "")).rstrip("%"))
+        except ValueError:
+            continue
+        label = _text(value.get("label"), 80)
+        if label:
+            result.append({"label": label, "value": max(0.0, min(100.0, number))})
+    return result[:_MAX_LIST_ITEMS]
+
+
+def parse_cards(raw_text, title):
+    # Parses and normalizes the model output; raises ReportError if there is nothing usable.
+    data = loads_lenient(strip_code_fences(raw_text))
+    if not isinstance(data, dict):
+        raise ReportError("The model returned report JSON of the wrong shape.")
+
+    cards = []
+    for card in data.get("cards") if isinstance(data.get("cards"), list) else []:
+        if not isinstance(card, dict) or not _text(card.get("title")):
+            continue
+        size = _text(card.get("size"), 10).lower()
+        cards.append({
+            "title": _text(card.get("title"), 120),
+            "icon": _text(card.get("icon"), 8),
+            "size": size if size in CARD_SIZES else "medium",
+            "body": _text(card.get("body"), 1200),
+            "items": _text_list(card.get("items")),
+            "tags": _text_list(card.get("tags"), length=40),
+            "metrics": _metrics(card.get("metrics")),
+        })
+    if not cards:
+        raise ReportError("The model returned a report without any cards.")
+
+    highlights = []
+    for highlight in data.get("highlights") if isinstance(data.get("highlights"), list) else []:
+        if isinstance(highlight, dict) and _text(highlight.get("value")):
+            highlights.append({"value": _text(highlight.get("value"), 40), "label": _text(highlight.get("label"), 120)})
+
+    return {
+        "headline": _text(data.get("headline"), 160) or title,
+        "subtitle": _text(data.get("subtitle"), 300),
+        "highlights": highlights[:_MAX_HIGHLIGHTS],
+        "cards": cards[:_MAX_CARDS],
+        "conclusion": _text(data.get("conclusion"), 1200),
+    }
+
+
+def render_report(cards, title, theme):
+    with metrics.timed("report_render"):
+        return _environment.get_template("report.html").render(
+            title=title, report=cards, theme=THEMES[theme], theme_name=theme,
+            template_version=REPORT_TEMPLATE_VERSION,
+        )
+
+
+def _cache_text(title, summary_text):
+    return f"{title}\n{summary_text}"
+
+
+def _cards_key(title, summary_text, prompt_version, task):
+    return summary_cache.make_cache_key(_cache_text(title, summary_text), model_for(task),
+                                        prompt_version, kind="report-cards")
+
+
+def _html_key(title, summary_text, theme, prompt_version, task):
+    version = f"{prompt_version}/{REPORT_TEMPLATE_VERSION}/{theme}"
+    return summary_cache.make_cache_key(_cache_text(title, summary_text), model_for(task), version, kind="report-html")
+
+
+# prompt_version and task below identify the prompt that produced the cards from
+# summary_text and the LLM task it ran as: REPORT_CARDS_PROMPT_VERSION and "report_cards"
+# for build_cards_messages, or another prompt's own.
+
+def get_cached_report(title, summary_text, theme, prompt_version=REPORT_CARDS_PROMPT_VERSION, task="report_cards"):
+    # The rendered report, or None if the cards still have to be generated. Cached cards
+    # are rendered (and the result cached) for a theme or template version not seen yet.
+    html_key = _html_key(title, summary_text, theme, prompt_version, task)
+    html = summary_cache.get_cached_summary(html_key)
+    if html is not None:
+        return html
+    cards_json = summary_cache.get_cached_summary(_cards_key(title, summary_text, prompt_version, task))
+    if cards_json is None:
+        return None
+    html = render_report(json.loads(cards_json), title, theme)
+    summary_cache.store_summary(html_key, html)
+    return html
+
+
+def finish_report(title, summary_text, theme, raw_text, prompt_version=REPORT_CARDS_PROMPT_VERSION, task="report_cards"):
+    # Turns the model's answer into the rendered report and caches both. Raises ReportError.
+    cards = parse_cards(raw_text, title)
+    html = render_report(cards, title, theme)
+    summary_cache.store_summary(_cards_key(title, summary_text, prompt_version, task), json.dumps(cards, ensure_ascii=False))
+    summary_cache.store_summary(_html_key(title, summary_text, theme, prompt_version, task), html)
+    return html
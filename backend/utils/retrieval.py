@@ -0,0 +1,213 @@
+import math
+import re
+import uuid
+from collections import Counter, defaultdict
+
+import config
+from utils import metrics
+from utils.chunker import iter_token_chunks
+from utils.db import get_connection
+
+# Per-notebook retrieval index over source content, used by /chat to send only the
+# passages relevant to the current question instead of every full summary.
+# Sources are split into passages at ingest time and stored in a SQLite inverted index
+# (term -> passage postings); queries are ranked with BM25.
+#
+# Tokenization handles mixed Chinese/English text: latin words and numbers are
+# lowercased whole words, runs of CJK characters become overlapping character bigrams.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS passages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    notebook_id TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    source_name TEXT,
+    kind TEXT NOT NULL,
+    ordinal INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_passages_source ON passages(notebook_id, source_id);
+CREATE TABLE IF NOT EXISTS postings (
+    notebook_id TEXT NOT NULL,
+    term TEXT NOT NULL,
+    passage_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_postings_term ON postings(notebook_id, term);
+CREATE INDEX IF NOT EXISTS idx_postings_passage ON postings(passage_id);
+"""
+
+_LATIN_RE = re.compile(r'[a-z0-9]+')
+_CJK_RUN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its of on or that the this to was were what "
+    "when where which who why will with you your how can do does".split()
+)
+
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+
+
+def _connection():
+    return get_connection(config.RETRIEVAL_INDEX_PATH, _SCHEMA)
+
+
+def tokenize(text):
+    text = text.lower()
+    terms = [word for word in _LATIN_RE.findall(text) if word not in _STOPWORDS]
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def new_source_id():
+    return uuid.uuid4().hex
+
+
+def _delete_source_rows(conn, notebook_id, source_id):
+    conn.execute(
+        "DELETE FROM postings WHERE passage_id IN "
+        "(SELECT id FROM passages WHERE notebook_id = ? AND source_id = ?)",
+        (notebook_id, source_id)
+    )
+    conn.execute("DELETE FROM passages WHERE notebook_id = ? AND source_id = ?", (notebook_id, source_id))
+
+
+def index_source(notebook_id, source_id, name, summary, content):
+    # (Re)indexes one source: its summary and its original content, split into passages.
+    with metrics.timed("retrieval_index"):
+        _index_source(notebook_id, source_id, name, summary, content)
+
+
+def _index_source(notebook_id, source_id, name, summary, content):
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _delete_source_rows(conn, notebook_id, source_id)
+        for kind, text in (("summary", summary), ("content", content)):
+            if not text:
+                continue
+            for ordinal, passage in enumerate(iter_token_chunks([text], config.RETRIEVAL_PASSAGE_TOKENS)):
+                terms = Counter(tokenize(passage))
+                passage_id = conn.execute(
+                    "INSERT INTO passages (notebook_id, source_id, source_name, kind, ordinal, text, length) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (notebook_id, source_id, name, kind, ordinal, passage, sum(terms.values()))
+                ).lastrowid
+                conn.executemany(
+                    "INSERT INTO postings (notebook_id, term, passage_id, tf) VALUES (?, ?, ?, ?)",
+                    [(notebook_id, term, passage_id, tf) for term, tf in terms.items()]
+                )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def remove_source(notebook_id, source_id):
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _delete_source_rows(conn, notebook_id, source_id)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def indexed_source_ids(notebook_id, source_ids):
+    # Which of the given sources are present in the index.
+    if not source_ids:
+        return set()
+    placeholders = ",".join("?" * len(source_ids))
+    rows = _connection().execute(
+        f"SELECT DISTINCT source_id FROM passages WHERE notebook_id = ? AND source_id IN ({placeholders})",
+        [notebook_id, *source_ids]
+    ).fetchall()
+    return {row["source_id"] for row in rows}
+
+
+def source_overview(notebook_id, source_ids, limit=None):
+    # Leading summary passages of the given sources, for questions that share no terms
+    # with the index ("summarize this"). Same shape as search() results, score 0.
+    limit = limit or config.RETRIEVAL_TOP_K
+    if not source_ids:
+        return []
+    placeholders = ",".join("?" * len(source_ids))
+    rows = _connection().execute(
+        f"SELECT source_id, source_name, kind, text FROM passages "
+        f"WHERE notebook_id = ? AND kind = 'summary' AND source_id IN ({placeholders}) "
+        f"ORDER BY ordinal, id LIMIT ?",
+        [notebook_id, *source_ids, limit]
+    ).fetchall()
+    return [dict(row, score=0.0) for row in rows]
+
+
+def search(notebook_id, query, source_ids=None, top_k=None):
+    # Returns the top_k passages of the notebook for the query, best first, optionally
+    # restricted to source_ids: [{"source_id", "source_name", "kind", "text", "score"}].
+    with metrics.timed("retrieval_search"):
+        return _search(notebook_id, query, source_ids, top_k or config.RETRIEVAL_TOP_K)
+
+
+def _search(notebook_id, query, source_ids, top_k):
+    query_terms = set(tokenize(query))
+    if not query_terms:
+        return []
+    conn = _connection()
+    passage_count, average_length = conn.execute(
+        "SELECT COUNT(*), AVG(length) FROM passages WHERE notebook_id = ?", (notebook_id,)
+    ).fetchone()
+    if not passage_count:
+        return []
+
+    placeholders = ",".join("?" * len(query_terms))
+    postings = conn.execute(
+        f"SELECT term, passage_id, tf FROM postings WHERE notebook_id = ? AND term IN ({placeholders})",
+        [notebook_id, *query_terms]
+    ).fetchall()
+
+    by_term = defaultdict(list)
+    for row in postings:
+        by_term[row["term"]].append((row["passage_id"], row["tf"]))
+    candidate_ids = {passage_id for matches in by_term.values() for passage_id, _ in matches}
+    if not candidate_ids:
+        return []
+
+    passages = {}
+    candidate_list = list(candidate_ids)
+    for start in range(0, len(candidate_list), 500):  # stay under SQLite's variable limit
+        batch = candidate_list[start:start + 500]
+        for row in conn.execute(
+            f"SELECT id, source_id, source_name, kind, text, length FROM passages WHERE id IN ({','.join('?' * len(batch))})",
+            batch
+        ):
+            passages[row["id"]] = row
+
+    allowed = set(source_ids) if source_ids else None
+    scores = defaultdict(float)
+    for term, matches in by_term.items():
+        idf = math.log(1 + (passage_count - len(matches) + 0.5) / (len(matches) + 0.5))
+        for passage_id, tf in matches:
+            passage = passages.get(passage_id)
+            if passage is None or (allowed is not None and passage["source_id"] not in allowed):
+                continue
+            norm = _K1 * (1 - _B + _B * passage["length"] / (average_length or 1))
+            scores[passage_id] += idf * tf * (_K1 + 1) / (tf + norm)
+
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [
+        {
+            "source_id": passages[passage_id]["source_id"],
+            "source_name": passages[passage_id]["source_name"],
+            "kind": passages[passage_id]["kind"],
+            "text": passages[passage_id]["text"],
+            "score": round(score, 4),
+        }
+        for passage_id, score in ranked
+    ]
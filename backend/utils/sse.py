@@ -0,0 +1,40 @@
+import json
+
+from flask import Response, request, stream_with_context
+
+# Server-sent events helpers shared by the streaming variants of the API routes.
+# Every stream has the same shape:
+#   event: start  -> metadata known before generation starts (sent immediately)
+#   event: delta  -> {"text": "..."} for each chunk of model output
+#   event: done   -> final metadata frame, same fields as the non-streaming JSON response
+#   event: error  -> {"error": "..."} if generation fails part-way
+
+
+def format_sse(data, event=None):
+    payload = json.dumps(data, ensure_ascii=False)
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {payload}\n\n"
+
+
+def wants_stream(data=None):
+    # Streaming is opt-in: ?stream=1, "stream": true in the JSON/form body, or an
+    # Accept: text/event-stream header.
+    if request.args.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    if request.form.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    if isinstance(data, dict) and data.get("stream") is True:
+        return True
+    return "text/event-stream" in request.headers.get("Accept", "")
+
+
+def sse_response(events):
+    # events is a generator of already formatted frames (see format_sse).
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # disable proxy buffering (nginx) so tokens flush immediately
+        }
+    )
@@ -0,0 +1,91 @@
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import time
+
+import config
+from utils.compression import FILE_SUFFIXES, compress, compressible
+
+# Index of the frontend build (frontend/build) for routes/static.py, built once at startup
+# so requests never touch the file system to find out what exists.
+#
+# Each file becomes an asset with a content-hash ETag, its media type, whether its name is
+# content-hashed (the CRA bundles under static/, e.g. main.3f2a1b4c.js: safe to cache
+# forever) and its encoded representations:
+#   - .br / .gz files next to it, written by the frontend's postbuild step
+#     (frontend/scripts/compress-build.js), served from disk;
+#   - otherwise a gzip copy made here and kept in memory, for compressible files up to
+#     STATIC_PRECOMPRESS_MAX_BYTES.
+# index.html is kept in memory as is. Rebuilding the frontend needs a restart.
+
+logger = logging.getLogger(__name__)
+
+INDEX_HTML = "index.html"
+
+_HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{8,}\.")
+# Below this, compression saves less than the headers it adds.
+_MIN_COMPRESS_BYTES = 1024
+# Source maps are large and only fetched by developer tools; not worth compressing at startup.
+_NO_PRECOMPRESS_SUFFIXES = (".map",)
+
+
+def _etag(body):
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
+
+
+def _variant_files(directory, name, names):
+    return {encoding: os.path.join(directory, name + suffix)
+            for encoding, suffix in FILE_SUFFIXES.items() if name + suffix in names}
+
+
+def _asset(path, name, variants):
+    with open(path, "rb") as f:
+        body = f.read()
+    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    asset = {
+        "path": path,
+        "media_type": media_type,
+        "etag": _etag(body),
+        "immutable": bool(_HASHED_NAME_RE.search(name)),
+        "files": variants,
+        "bodies": {},
+    }
+    if name == INDEX_HTML:
+        asset["bodies"][None] = body
+    if ("gzip" not in variants and compressible(media_type) and not name.endswith(_NO_PRECOMPRESS_SUFFIXES)
+            and _MIN_COMPRESS_BYTES <= len(body) <= config.STATIC_PRECOMPRESS_MAX_BYTES):
+        compressed = compress(body, "gzip", static=True)
+        if len(compressed) < len(body) * 0.9:
+            asset["bodies"]["gzip"] = compressed
+    return asset
+
+
+def build_index(root):
+    # {relative path with "/" separators: asset}. Empty (with a warning) without a build.
+    if not os.path.isdir(root):
+        logger.warning("Frontend build not found at %s; run 'npm run build' in frontend/", root)
+        return {}
+    start = time.perf_counter()
+    index = {}
+    for directory, _, names in os.walk(root):
+        names = set(names)
+        for name in names:
+            stem, suffix = os.path.splitext(name)
+            if suffix in FILE_SUFFIXES.values() and stem in names:
+                continue  # an encoded variant, attached to its original below
+            relative = os.path.relpath(os.path.join(directory, name), root).replace(os.sep, "/")
+            index[relative] = _asset(os.path.join(directory, name), name, _variant_files(directory, name, names))
+    logger.info("Indexed %d frontend files in %.0f ms", len(index), (time.perf_counter() - start) * 1000)
+    return index
+
+
+def encodings(asset):
+    # Content codings the asset is available in, besides identity.
+    return [encoding for encoding in FILE_SUFFIXES if encoding in asset["files"] or encoding in asset["bodies"]]
+
+
+def etag_for(asset, encoding):
+    # Each representation gets its own strong ETag.
+    return asset["etag"] if encoding is None else f"{asset['etag']}-{FILE_SUFFIXES[encoding][1:]}"
@@ -0,0 +1,253 @@
+import json
+import uuid
+from datetime import datetime, timezone
+
+import config
+from utils.db import get_connection
+
+# Server-side persistence for notebooks, their sources (summary and original content) and
+# generated HTML reports, exposed through routes/notebooks.py.
+# Source ids are shared with the retrieval index (utils/retrieval.py), so /chat and
+# /generate-html-report can be called with ids instead of resending source text.
+# Listings never include original_content or report HTML; fetch a single item for those.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notebooks (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    chat_history TEXT NOT NULL DEFAULT '[]',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sources (
+    id TEXT PRIMARY KEY,
+    notebook_id TEXT NOT NULL,
+    type TEXT,
+    name TEXT,
+    url TEXT,
+    summary TEXT,
+    original_content TEXT,
+    selected_for_chat INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sources_notebook ON sources(notebook_id, created_at);
+CREATE TABLE IF NOT EXISTS reports (
+    source_id TEXT PRIMARY KEY,
+    notebook_id TEXT NOT NULL,
+    title TEXT,
+    html_content TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reports_notebook ON reports(notebook_id);
+"""
+
+_SOURCE_LIST_COLUMNS = "id, notebook_id, type, name, url, summary, selected_for_chat, created_at"
+
+
+def _connection():
+    return get_connection(config.STORE_PATH, _SCHEMA)
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _new_id():
+    return uuid.uuid4().hex
+
+
+def clamp_page(limit, offset):
+    # Normalizes ?limit=&offset= query values to a valid page.
+    try:
+        limit = int(limit) if limit not in (None, "") else config.STORE_DEFAULT_PAGE_SIZE
+        offset = int(offset) if offset not in (None, "") else 0
+    except (TypeError, ValueError):
+        raise ValueError("limit and offset must be integers")
+    return max(1, min(limit, config.STORE_MAX_PAGE_SIZE)), max(0, offset)
+
+
+def _notebook_dict(row, include_history=False):
+    notebook = {
+        "id": row["id"],
+        "title": row["title"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+        "source_count": row["source_count"],
+    }
+    if include_history:
+        notebook["chat_history"] = json.loads(row["chat_history"])
+    return notebook
+
+
+def _source_dict(row):
+    source = dict(row)
+    source["selected_for_chat"] = bool(source["selected_for_chat"])
+    return source
+
+
+def _touch(conn, notebook_id):
+    conn.execute("UPDATE notebooks SET updated_at = ? WHERE id = ?", (_now(), notebook_id))
+
+
+# --- Notebooks ---
+
+def create_notebook(title, notebook_id=None):
+    now = _now()
+    notebook_id = notebook_id or _new_id()
+    _connection().execute(
+        "INSERT INTO notebooks (id, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
+        (notebook_id, title, now, now)
+    )
+    return get_notebook(notebook_id)
+
+
+def list_notebooks(limit, offset):
+    conn = _connection()
+    total = conn.execute("SELECT COUNT(*) FROM notebooks").fetchone()[0]
+    rows = conn.execute(
+        "SELECT n.*, (SELECT COUNT(*) FROM sources s WHERE s.notebook_id = n.id) AS source_count "
+        "FROM notebooks n ORDER BY n.created_at DESC, n.id LIMIT ? OFFSET ?",
+        (limit, offset)
+    ).fetchall()
+    return [_notebook_dict(row) for row in rows], total
+
+
+def get_notebook(notebook_id):
+    row = _connection().execute(
+        "SELECT n.*, (SELECT COUNT(*) FROM sources s WHERE s.notebook_id = n.id) AS source_count "
+        "FROM notebooks n WHERE n.id = ?",
+        (notebook_id,)
+    ).fetchone()
+    return _notebook_dict(row, include_history=True) if row else None
+
+
+def update_notebook(notebook_id, title=None, chat_history=None):
+    assignments, params = ["updated_at = ?"], [_now()]
+    if title is not None:
+        assignments.append("title = ?")
+        params.append(title)
+    if chat_history is not None:
+        assignments.append("chat_history = ?")
+        params.append(json.dumps(chat_history, ensure_ascii=False))
+    cursor = _connection().execute(
+        f"UPDATE notebooks SET {', '.join(assignments)} WHERE id = ?", (*params, notebook_id)
+    )
+    return get_notebook(notebook_id) if cursor.rowcount else None
+
+
+def delete_notebook(notebook_id):
+    # Returns the ids of the deleted sources (for removal from the retrieval index), or
+    # None if the notebook does not exist.
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        source_ids = [row["id"] for row in conn.execute("SELECT id FROM sources WHERE notebook_id = ?", (notebook_id,))]
+        conn.execute("DELETE FROM reports WHERE notebook_id = ?", (notebook_id,))
+        conn.execute("DELETE FROM sources WHERE notebook_id = ?", (notebook_id,))
+        deleted = conn.execute("DELETE FROM notebooks WHERE id = ?", (notebook_id,)).rowcount
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return source_ids if deleted else None
+
+
+# --- Sources ---
+
+def add_source(notebook_id, source_type, name, summary, original_content, url=None, source_id=None):
+    conn = _connection()
+    source_id = source_id or _new_id()
+    conn.execute(
+        "INSERT OR REPLACE INTO sources (id, notebook_id, type, name, url, summary, original_content, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (source_id, notebook_id, source_type, name, url, summary, original_content, _now())
+    )
+    _touch(conn, notebook_id)
+    return get_source(notebook_id, source_id)
+
+
+def list_sources(notebook_id, limit, offset):
+    conn = _connection()
+    total = conn.execute("SELECT COUNT(*) FROM sources WHERE notebook_id = ?", (notebook_id,)).fetchone()[0]
+    rows = conn.execute(
+        f"SELECT {_SOURCE_LIST_COLUMNS} FROM sources WHERE notebook_id = ? "
+        f"ORDER BY created_at, id LIMIT ? OFFSET ?",
+        (notebook_id, limit, offset)
+    ).fetchall()
+    return [_source_dict(row) for row in rows], total
+
+
+def get_source(notebook_id, source_id, include_content=False):
+    columns = _SOURCE_LIST_COLUMNS + (", original_content" if include_content else "")
+    row = _connection().execute(
+        f"SELECT {columns} FROM sources WHERE notebook_id = ? AND id = ?", (notebook_id, source_id)
+    ).fetchone()
+    return _source_dict(row) if row else None
+
+
+def get_sources(notebook_id, source_ids):
+    # Sources with the given ids (summary included, no original content), in the given order.
+    if not source_ids:
+        return []
+    placeholders = ",".join("?" * len(source_ids))
+    rows = _connection().execute(
+        f"SELECT {_SOURCE_LIST_COLUMNS} FROM sources WHERE notebook_id = ? AND id IN ({placeholders})",
+        [notebook_id, *source_ids]
+    ).fetchall()
+    by_id = {row["id"]: _source_dict(row) for row in rows}
+    return [by_id[source_id] for source_id in source_ids if source_id in by_id]
+
+
+def update_source(notebook_id, source_id, name=None, selected_for_chat=None):
+    assignments, params = [], []
+    if name is not None:
+        assignments.append("name = ?")
+        params.append(name)
+    if selected_for_chat is not None:
+        assignments.append("selected_for_chat = ?")
+        params.append(1 if selected_for_chat else 0)
+    if assignments:
+        _connection().execute(
+            f"UPDATE sources SET {', '.join(assignments)} WHERE notebook_id = ? AND id = ?",
+            (*params, notebook_id, source_id)
+        )
+    return get_source(notebook_id, source_id)
+
+
+def delete_source(notebook_id, source_id):
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM reports WHERE notebook_id = ? AND source_id = ?", (notebook_id, source_id))
+        deleted = conn.execute("DELETE FROM sources WHERE notebook_id = ? AND id = ?", (notebook_id, source_id)).rowcount
+        if deleted:
+            _touch(conn, notebook_id)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return bool(deleted)
+
+
+# --- Reports (one per source) ---
+
+def save_report(notebook_id, source_id, title, html_content):
+    _connection().execute(
+        "INSERT OR REPLACE INTO reports (source_id, notebook_id, title, html_content, created_at) VALUES (?, ?, ?, ?, ?)",
+        (source_id, notebook_id, title, html_content, _now())
+    )
+
+
+def get_report(notebook_id, source_id):
+    row = _connection().execute(
+        "SELECT source_id, notebook_id, title, html_content, created_at FROM reports WHERE notebook_id = ? AND source_id = ?",
+        (notebook_id, source_id)
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def delete_report(notebook_id, source_id):
+    cursor = _connection().execute(
+        "DELETE FROM reports WHERE notebook_id = ? AND source_id = ?", (notebook_id, source_id)
+    )
+    return bool(cursor.rowcount)
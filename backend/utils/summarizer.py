@@ -1,73 +1,25 @@
-import openai # This will be the OpenAI client instance after v1.0
-import os # For OPENAI_BASE_URL if still used directly here
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-# If you have a centralized config for the OpenAI client, import it
-# from ..config import some_openai_client_instance (example)
+import config
+from utils.chunker import count_tokens, iter_token_chunks, truncate_to_tokens
+from utils import summary_cache
+from utils.llm_client import (acreate_chat_completion, astream_chat_completion, create_chat_completion,
+                               get_async_openai_client, get_openai_client, stream_chat_completion)
+from utils.llm_scheduler import LLMOverloadedError
+from utils.model_router import cache_model
 
-# This is the generate_detailed_summary_with_ai function previously in app.py
-# It may have been updated by a previous subtask to use an OpenAI client instance.
-# For example, it might look like this if it was updated to use the OpenAI v1.0+ client:
+logger = logging.getLogger(__name__)
 
-# Assuming 'client' is an OpenAI client instance initialized elsewhere (e.g., in config.py or app.py)
-# and passed to this function, or this function initializes it.
-# For now, let's assume it might still be using the global openai object or needs to init one.
+# Bump whenever the prompts below change so cached summaries from older prompts are not reused.
+SUMMARY_PROMPT_VERSION = "guide-v2"
 
-# Option 1: If config.py already sets up a client instance named 'client'
-# from .. import config # Assuming config.py is in backend/
-# client = config.client
+# All LLM calls go through the shared client in utils/llm_client.py (created once at startup).
 
-# Option 2: If config.py just sets openai.api_key and base_url, and we init client here.
-# This is more self-contained for the utils module.
-from openai import OpenAI
-
-# It's good practice to get the API key once, perhaps when the module is loaded or passed.
-# For now, let's assume config.py has set the global openai.api_key or we fetch it here.
-# If OPENAI_API_KEY is set by config.py:
-# api_key = openai.api_key
-# else:
-# api_key = os.getenv("OPENAI_API_KEY") # Fallback if not globally set
-
-# This was the original structure. The subtask that created config.py mentioned
-# "Updated relevant functions (generate_detailed_summary_with_ai, chat, generate_html_report)
-# to use openai.api_key (set by config.py) for OpenAI client instantiation and API key checks."
-# This implies the functions were changed to instantiate a client.
-
-def generate_detailed_summary_with_ai(text_content, document_name=""):
-    # This function's content should be moved from app.py
-    # Ensure it uses the OpenAI client correctly.
-    # Based on previous subtask report, it likely instantiates an OpenAI client.
-
-    # Example of how it might look after previous updates (actual code from app.py needed)
-    client = OpenAI(
-        api_key=os.getenv("OPENAI_API_KEY"),
-        base_url=os.getenv("OPENAI_BASE_URL") # if applicable
-    )
-
-    if not client.api_key:
-        # This check might be redundant if client instantiation fails first,
-        # but good for explicit error.
-        # This was the old way: if not openai.api_key:
-        # Now check client.api_key
-        return "Error: OpenAI API key not configured. Please set OPENAI_API_KEY in your .env file or environment variables."
-
-    max_tokens_for_summary = 800  # Max tokens for the summary part
-    # Max tokens for a typical model like gpt-3.5-turbo is 4096.
-    # This includes prompt, text_content, and response.
-    # Approximation: Prompt (~100-150 tokens) + Summary (800 tokens) = ~950 tokens.
-    # Remaining for text_content: 4096 - 950 = ~3146 tokens.
-    # A token is roughly 4 chars or 0.75 words. So, ~2300 words or ~12000 chars.
-
-    # Simple truncation if text_content is too long (better chunking is complex)
-    # This max_chars is an estimate. Actual token limits are what matter.
-    # A safer approach is to use a library like tiktoken to count tokens.
-    estimated_max_chars = 3000 * 4 # Based on ~3000 tokens, 4 chars/token
-    if len(text_content) > estimated_max_chars:
-        text_content = text_content[:estimated_max_chars]
-        # print(f"Warning: Content for '{document_name}' was truncated to {estimated_max_chars} characters for summarization.")
-
-    prompt_name_part = f" for the document titled '{document_name}'" if document_name else ""
-
-    system_prompt = f"""# 角色
+def _build_guide_prompt(text_content, prompt_name_part):
+    return f"""# 角色
 你是一位顶级的知识讲解专家和学习导师。你擅长将复杂、零散或冗长的信息，用最清晰、最易懂、最结构化的方式呈现给一个完全不懂该领域的初学者，最终目标是让这位初学者能够快速、全面地理解和掌握核心知识。
 
 # 核心任务
@@ -118,20 +70,306 @@ def generate_detailed_summary_with_ai(text_content, document_name=""):
 
 请开始你的分析和总结。"""
 
+
+# Prompt used on each chunk of a long document (the "map" step).
+def _build_chunk_prompt(chunk_text, document_name, index, total):
+    name_part = f"《{document_name}》" if document_name else "一份长文档"
+    return f"""你正在协助总结{name_part}。由于原文过长，它被切分成了 {total} 个部分，下面是第 {index}/{total} 部分。
+
+请为这一部分写一份详尽的要点笔记，供之后合并成完整的学习指南使用：
+* 按原文顺序列出本部分的核心论点和结论。
+* 保留关键术语及其解释、具体的例子、数据和人物/事件名称。
+* 如果原文带有时间戳（例如 [05:30]），请在对应要点后保留时间戳。
+* 只输出笔记本身，不要写开场白或总结语。
+
+```
+{chunk_text}
+```"""
+
+
+# Prompt used to merge several partial notes into one (the hierarchical "reduce" step).
+def _build_merge_prompt(partial_notes, document_name):
+    name_part = f"《{document_name}》" if document_name else "一份长文档"
+    joined = "\n\n---\n\n".join(partial_notes)
+    return f"""下面是{name_part}中连续几个部分的要点笔记，已按原文顺序排列，各部分之间用 --- 分隔。
+
+请把它们合并成一份连贯的要点笔记：
+* 去掉重复内容，但不要丢失任何独立的论点、术语解释、例子或数据。
+* 保持原文的先后顺序，保留所有时间戳（例如 [05:30]）。
+* 只输出合并后的笔记，不要写开场白或总结语。
+
+{joined}"""
+
+
+# Shared, bounded worker pool for chunk / merge calls. It is process-wide so that
+# concurrent requests together never exceed SUMMARY_MAX_CONCURRENCY LLM calls.
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, config.SUMMARY_MAX_CONCURRENCY),
+                    thread_name_prefix="summarizer"
+                )
+    return _executor
+
+
+def _complete(prompt, temperature, task, max_tokens=None):
+    kwargs = {}
+    if max_tokens:
+        kwargs["max_tokens"] = max_tokens
+    completion = create_chat_completion(
+        task,
+        messages=[
+            {"role": "system", "content": prompt},
+        ],
+        temperature=temperature,
+        **kwargs
+    )
+    return (completion.choices[0].message.content or "").strip()
+
+
+def _chunk_prompts(text_content, document_name):
+    chunks = list(iter_token_chunks([text_content], config.SUMMARY_CHUNK_TOKENS))
+    return [_build_chunk_prompt(chunk, document_name, index + 1, len(chunks)) for index, chunk in enumerate(chunks)]
+
+
+def _merge_groups(notes):
+    # Neighbouring notes grouped so that each group fits into one merge prompt, or None when
+    # the notes are final: they fit into the guide prompt, or every note already fills a
+    # prompt on its own and merging cannot shrink them further.
+    if len(notes) <= 1 or sum(count_tokens(n) for n in notes) <= config.SUMMARY_CHUNK_TOKENS:
+        return None
+    groups = []
+    current, current_tokens = [], 0
+    for note in notes:
+        note_tokens = count_tokens(note)
+        if current and current_tokens + note_tokens > config.SUMMARY_CHUNK_TOKENS:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(note)
+        current_tokens += note_tokens
+    if current:
+        groups.append(current)
+    return None if len(groups) == len(notes) else groups
+
+
+def _map_reduce_notes(text_content, document_name):
+    # Map: summarize every chunk concurrently on the shared pool.
+    # executor.map keeps results in document order and re-raises the first failure.
+    executor = _get_executor()
+    notes = list(executor.map(
+        lambda prompt: _complete(prompt, temperature=0.3, task="chunk_notes", max_tokens=config.SUMMARY_CHUNK_SUMMARY_MAX_TOKENS),
+        _chunk_prompts(text_content, document_name)
+    ))
+
+    # Reduce: merge neighbouring notes level by level until everything fits into the final
+    # guide prompt. Each level runs concurrently.
+    groups = _merge_groups(notes)
+    while groups:
+        notes = list(executor.map(
+            lambda group: group[0] if len(group) == 1 else _complete(
+                _build_merge_prompt(group, document_name),
+                temperature=0.3,
+                task="merge_notes",
+                max_tokens=config.SUMMARY_CHUNK_SUMMARY_MAX_TOKENS * 2
+            ),
+            groups
+        ))
+        groups = _merge_groups(notes)
+    return notes
+
+
+def _truncate_document(text_content):
+    # Per-document budget: anything past SUMMARY_DOCUMENT_TOKEN_BUDGET is never sent to the LLM.
+    return truncate_to_tokens(text_content, config.SUMMARY_DOCUMENT_TOKEN_BUDGET)
+
+
+def _guide_prompt_from_notes(notes, document_name):
+    return _build_guide_prompt(
+        "（以下是长文档各部分的要点笔记，已按原文顺序排列）\n\n" + "\n\n---\n\n".join(notes),
+        _prompt_name_part(document_name)
+    )
+
+
+def _prompt_name_part(document_name):
+    return f" for the document titled '{document_name}'" if document_name else ""
+
+
+def _prepare_guide_prompt(text_content, document_name):
+    text_content = _truncate_document(text_content)
+    if count_tokens(text_content) > config.SUMMARY_CHUNK_TOKENS:
+        # Long input: map-reduce the content into ordered notes first, then write the
+        # beginner guide from those notes with a single final call.
+        return _guide_prompt_from_notes(_map_reduce_notes(text_content, document_name), document_name)
+    return _build_guide_prompt(text_content, _prompt_name_part(document_name))
+
+
+def _summary_cache_key(text_content):
+    # The summary depends on every model that may have worked on it.
+    return summary_cache.make_cache_key(text_content, cache_model("summary", "chunk_notes", "merge_notes"), SUMMARY_PROMPT_VERSION)
+
+
+def _short_summary_error(summary, document_name):
+    if not summary or len(summary) < 20: # Check for very short/empty summary
+        return f"LLM returned a very short or empty summary for '{document_name}'. This might indicate an issue with the content or summarization process."
+    return None
+
+
+def generate_detailed_summary_with_ai(text_content, document_name=""):
+    # Identical content (same model, same prompts) is answered from the on-disk cache.
+    cache_key = _summary_cache_key(text_content)
+    cached_summary = summary_cache.get_cached_summary(cache_key)
+    if cached_summary is not None:
+        return cached_summary
+
+    # The shared client is created once at startup (see utils/llm_client.py);
+    # it is None only when no API key is configured.
+    if get_openai_client() is None:
+        return "Error: OpenAI API key not configured. Please set OPENAI_API_KEY in your .env file or environment variables."
+
+    try:
+        summary = _complete(_prepare_guide_prompt(text_content, document_name), temperature=0.5, task="summary") # Lower temperature for more factual summaries
+        error_message = _short_summary_error(summary, document_name)
+        if error_message:
+            return error_message
+        summary_cache.store_summary(cache_key, summary)
+        return summary
+    except LLMOverloadedError:
+        # Shed by the scheduler: the caller answers 429 with Retry-After.
+        raise
+    except Exception as e:
+        logger.exception("Error generating detailed summary for '%s'", document_name)
+        return f"Error generating detailed summary for '{document_name}': {str(e)}"
+
+
+def stream_detailed_summary_with_ai(text_content, document_name=""):
+    # Streaming counterpart of generate_detailed_summary_with_ai for the SSE routes.
+    # Yields the summary text as it is generated; failures are raised (ValueError or
+    # openai.OpenAIError) instead of returned, so the caller can send an error frame.
+    cache_key = _summary_cache_key(text_content)
+    cached_summary = summary_cache.get_cached_summary(cache_key)
+    if cached_summary is not None:
+        yield cached_summary
+        return
+
+    if get_openai_client() is None:
+        raise ValueError("Error: OpenAI API key not configured. Please set OPENAI_API_KEY in your .env file or environment variables.")
+
+    parts = []
+    for delta in stream_chat_completion(
+        "summary",
+        messages=[{"role": "system", "content": _prepare_guide_prompt(text_content, document_name)}],
+        temperature=0.5
+    ):
+        parts.append(delta)
+        yield delta
+
+    summary = "".join(parts).strip()
+    error_message = _short_summary_error(summary, document_name)
+    if error_message:
+        raise ValueError(error_message)
+    summary_cache.store_summary(cache_key, summary)
+
+
+# --- Async variants for the ASGI routes (routes/async_api.py) ---
+# Same prompts, cache keys and map-reduce as above; each document runs at most
+# SUMMARY_MAX_CONCURRENCY chunk calls at once, and waiting on the model holds no thread.
+
+async def _acomplete(prompt, temperature, task, max_tokens=None):
+    kwargs = {}
+    if max_tokens:
+        kwargs["max_tokens"] = max_tokens
+    completion = await acreate_chat_completion(
+        task,
+        messages=[{"role": "system", "content": prompt}],
+        temperature=temperature,
+        **kwargs
+    )
+    return (completion.choices[0].message.content or "").strip()
+
+
+async def _amap_reduce_notes(text_content, document_name):
+    semaphore = asyncio.Semaphore(max(1, config.SUMMARY_MAX_CONCURRENCY))
+
+    async def bounded(prompt, task, max_tokens):
+        async with semaphore:
+            return await _acomplete(prompt, temperature=0.3, task=task, max_tokens=max_tokens)
+
+    notes = await asyncio.gather(*(
+        bounded(prompt, "chunk_notes", config.SUMMARY_CHUNK_SUMMARY_MAX_TOKENS)
+        for prompt in _chunk_prompts(text_content, document_name)
+    ))
+    async def merge(group):
+        if len(group) == 1:
+            return group[0]
+        return await bounded(_build_merge_prompt(group, document_name), "merge_notes", config.SUMMARY_CHUNK_SUMMARY_MAX_TOKENS * 2)
+
+    groups = _merge_groups(notes)
+    while groups:
+        notes = await asyncio.gather(*(merge(group) for group in groups))
+        groups = _merge_groups(notes)
+    return list(notes)
+
+
+async def _aprepare_guide_prompt(text_content, document_name):
+    text_content = _truncate_document(text_content)
+    if count_tokens(text_content) > config.SUMMARY_CHUNK_TOKENS:
+        return _guide_prompt_from_notes(await _amap_reduce_notes(text_content, document_name), document_name)
+    return _build_guide_prompt(text_content, _prompt_name_part(document_name))
+
+
+async def agenerate_detailed_summary_with_ai(text_content, document_name=""):
+    # Async counterpart of generate_detailed_summary_with_ai (same "Error:" convention).
+    cache_key = _summary_cache_key(text_content)
+    cached_summary = summary_cache.get_cached_summary(cache_key)
+    if cached_summary is not None:
+        return cached_summary
+
+    if get_async_openai_client() is None:
+        return "Error: OpenAI API key not configured. Please set OPENAI_API_KEY in your .env file or environment variables."
+
     try:
-        completion = client.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL"),
-            messages=[
-                {"role": "system", "content": system_prompt},
-            ],
-            temperature=0.5, # Lower temperature for more factual summaries
-            # max_tokens=max_tokens_for_summary
-        )
-        summary = completion.choices[0].message.content.strip()
-        if not summary or len(summary) < 20: # Check for very short/empty summary
-            return f"LLM returned a very short or empty summary for '{document_name}'. This might indicate an issue with the content or summarization process."
+        summary = await _acomplete(await _aprepare_guide_prompt(text_content, document_name), temperature=0.5, task="summary")
+        error_message = _short_summary_error(summary, document_name)
+        if error_message:
+            return error_message
+        summary_cache.store_summary(cache_key, summary)
         return summary
+    except LLMOverloadedError:
+        raise
     except Exception as e:
-        # Log the error properly in a real application
-        print(f"Error generating detailed summary for '{document_name}': {e}")
+        logger.exception("Error generating detailed summary for '%s'", document_name)
         return f"Error generating detailed summary for '{document_name}': {str(e)}"
+
+
+async def astream_detailed_summary_with_ai(text_content, document_name=""):
+    # Async counterpart of stream_detailed_summary_with_ai; failures are raised.
+    cache_key = _summary_cache_key(text_content)
+    cached_summary = summary_cache.get_cached_summary(cache_key)
+    if cached_summary is not None:
+        yield cached_summary
+        return
+
+    if get_async_openai_client() is None:
+        raise ValueError("Error: OpenAI API key not configured. Please set OPENAI_API_KEY in your .env file or environment variables.")
+
+    parts = []
+    async for delta in astream_chat_completion(
+        "summary",
+        messages=[{"role": "system", "content": await _aprepare_guide_prompt(text_content, document_name)}],
+        temperature=0.5
+    ):
+        parts.append(delta)
+        yield delta
+
+    summary = "".join(parts).strip()
+    error_message = _short_summary_error(summary, document_name)
+    if error_message:
+        raise ValueError(error_message)
+    summary_cache.store_summary(cache_key, summary)
@@ -0,0 +1,138 @@
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import config
+from utils import metrics
+from utils.db import get_connection
+
+# Content-addressed cache for generated summaries. Entries are keyed on a hash of the
+# normalized source text plus the model and prompt version that produced them, so the
+# same document uploaded twice (or the same URL summarized again) costs no tokens,
+# while changing OPENAI_MODEL or the prompts naturally misses.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    key TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_summaries_last_accessed ON summaries(last_accessed);
+"""
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def _connection():
+    return get_connection(config.SUMMARY_CACHE_PATH, _SCHEMA)
+
+
+def _bump(counter, amount=1):
+    with _stats_lock:
+        _stats[counter] += amount
+    metrics.increment("cache_events_total", amount, cache="summary", event=counter)
+
+
+def normalize_text(text):
+    # Unicode + whitespace normalization so trivially different copies share one key.
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def make_cache_key(text, model, prompt_version, kind="summary"):
+    digest = hashlib.sha256()
+    for part in (kind, model or "", prompt_version):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_cached_summary(key):
+    if not config.SUMMARY_CACHE_ENABLED:
+        return None
+    # The cache is an optimization only: storage problems degrade to a miss.
+    try:
+        return _get(key)
+    except sqlite3.Error as e:
+        logger.warning("Summary cache read failed: %s", e)
+        _bump("misses")
+        return None
+
+
+def _get(key):
+    conn = _connection()
+    now = time.time()
+    row = conn.execute("SELECT summary, created_at FROM summaries WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        _bump("misses")
+        return None
+    if config.SUMMARY_CACHE_TTL_SECONDS and now - row["created_at"] > config.SUMMARY_CACHE_TTL_SECONDS:
+        conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+        _bump("misses")
+        _bump("evictions")
+        return None
+    conn.execute("UPDATE summaries SET last_accessed = ? WHERE key = ?", (now, key))
+    _bump("hits")
+    return row["summary"]
+
+
+def store_summary(key, summary):
+    if not config.SUMMARY_CACHE_ENABLED:
+        return
+    try:
+        _store(key, summary)
+    except sqlite3.Error as e:
+        logger.warning("Summary cache write failed: %s", e)
+
+
+def _store(key, summary):
+    conn = _connection()
+    now = time.time()
+    conn.execute(
+        "INSERT OR REPLACE INTO summaries (key, summary, size, created_at, last_accessed) VALUES (?, ?, ?, ?, ?)",
+        (key, summary, len(summary.encode("utf-8")), now, now)
+    )
+    _bump("stores")
+    _evict(conn, now)
+
+
+def _evict(conn, now):
+    evicted = 0
+    if config.SUMMARY_CACHE_TTL_SECONDS:
+        evicted += conn.execute(
+            "DELETE FROM summaries WHERE created_at < ?", (now - config.SUMMARY_CACHE_TTL_SECONDS,)
+        ).rowcount
+    entries, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries").fetchone()
+    # LRU: drop least recently read entries until both the entry and the size caps hold.
+    while entries > config.SUMMARY_CACHE_MAX_ENTRIES or total_bytes > config.SUMMARY_CACHE_MAX_BYTES:
+        row = conn.execute("SELECT key, size FROM summaries ORDER BY last_accessed LIMIT 1").fetchone()
+        if row is None:
+            break
+        conn.execute("DELETE FROM summaries WHERE key = ?", (row["key"],))
+        entries -= 1
+        total_bytes -= row["size"]
+        evicted += 1
+    if evicted:
+        _bump("evictions", evicted)
+
+
+def cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    if config.SUMMARY_CACHE_ENABLED:
+        entries, total_bytes = _connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries"
+        ).fetchone()
+        stats.update(entries=entries, bytes=total_bytes)
+    return stats
@@ -0,0 +1,101 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from utils import dedup, report, store, summary_cache
+from utils.coalesce import complete_items
+from utils.model_router import model_for
+
+# Notebook-level reports (POST /generate-notebook-report). Every source is first condensed
+# into a short digest of its summary; digests are cached per source (keyed on its name and
+# summary), so only sources added or changed since the last report cost a call, and those
+# calls run in parallel on the fast model tier, small summaries packed several to a
+# request (utils/coalesce.py). One synthesis call over all digests then writes the report cards,
+# rendered like single-source reports (utils/report.py). The synthesis prompt therefore
+# grows with the number of sources by a digest each, not by a full summary each.
+
+DIGEST_PROMPT_VERSION = "digest-v1"
+SYNTHESIS_PROMPT_VERSION = "synthesis-v1"
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(1, config.SYNTHESIS_MAX_CONCURRENCY),
+                                               thread_name_prefix="synthesis")
+    return _executor
+
+
+def notebook_sources(notebook_id, source_ids=None):
+    # The sources to report on: the given ids, or the notebook's sources selected for chat,
+    # oldest first, without near-duplicates (utils/dedup.py), at most SYNTHESIS_MAX_SOURCES.
+    if source_ids:
+        sources = store.get_sources(notebook_id, source_ids)
+    else:
+        sources, _ = store.list_sources(notebook_id, config.SYNTHESIS_MAX_SOURCES, 0)
+        sources = [source for source in sources if source["selected_for_chat"]]
+    sources = [source for source in sources if source["summary"]]
+    kept = set(dedup.collapse_duplicates(notebook_id, [source["id"] for source in sources]))
+    return [source for source in sources if source["id"] in kept][:config.SYNTHESIS_MAX_SOURCES]
+
+
+def _digest_key(source):
+    return summary_cache.make_cache_key(f"{source['name']}\n{source['summary']}", model_for("source_digest"),
+                                        DIGEST_PROMPT_VERSION, kind="digest")
+
+
+def _digest_instruction():
+    return f"""Condense the notes about a source into a digest of at most {config.SYNTHESIS_DIGEST_WORDS} words.
+Keep the main topic, the key claims, facts and numbers, and the conclusions; drop examples and explanations.
+Write in the same language as the notes, as plain text without headings."""
+
+
+def _digest_input(source):
+    return f"Source: {source['name']}\nNotes:\n{source['summary']}"
+
+
+def source_digests(sources):
+    # Digests in source order and how many had to be generated. Raises on a failed call.
+    digests = [summary_cache.get_cached_summary(_digest_key(source)) for source in sources]
+    missing = [index for index, digest in enumerate(digests) if digest is None]
+    if missing:
+        logger.info("Generating %d of %d source digests", len(missing), len(sources))
+        generated = complete_items("source_digest", _digest_instruction(), [_digest_input(sources[i]) for i in missing],
+                                   max_tokens=config.SYNTHESIS_DIGEST_MAX_TOKENS, executor=_get_executor())
+        for index, digest in zip(missing, generated):
+            summary_cache.store_summary(_digest_key(sources[index]), digest)
+            digests[index] = digest
+    return digests, len(missing)
+
+
+def synthesis_text(sources, digests):
+    # The synthesis prompt's input; also the report cache key (see utils/report.py).
+    return "\n\n".join(f"[{number}] {source['name']}\n{digest}"
+                       for number, (source, digest) in enumerate(zip(sources, digests), start=1))
+
+
+def build_synthesis_messages(title, text, source_count):
+    prompt = f"""Below are digests of {source_count} sources collected in the notebook '{title}'. Write the content of a one-page visual report that synthesizes them.
+{report.CARDS_JSON_FORMAT}
+Guidelines:
+- Synthesize across sources instead of summarizing them one by one: common themes, points where sources agree or disagree, complementary facts, open questions.
+- 2 to 4 highlights with the most important numbers or facts.
+- 6 to 10 cards; use "large" for the one or two most important themes, and name the sources a card draws on in its "tags" (e.g. "[2] Source name").
+- Keep text short: emphasise numbers and key terms, avoid long paragraphs. "items", "tags" and "metrics" are optional; use "metrics" only for data that can be compared on a 0-100 scale.
+- Write in the same language as the digests.
+
+Digests:
+{text}
+"""
+    return [
+        {"role": "system", "content": "You write concise, well-structured report content as JSON."},
+        {"role": "user", "content": prompt},
+    ]
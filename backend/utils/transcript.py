@@ -0,0 +1,180 @@
+import codecs
+import html
+import re
+import threading
+
+import config
+from utils import metrics
+from utils.lazy import lazy_import
+
+yt_dlp = lazy_import("yt_dlp", "youtube")
+
+# YouTube transcripts fetched in-process through the yt-dlp Python API.
+# Each worker thread keeps one YoutubeDL instance (and with it one HTTP session), so a
+# video costs the metadata request plus a single subtitle download, streamed straight
+# into the parser: no subprocess, no temporary files.
+#
+# The VTT/SRT parser keeps each cue's start time and drops the rolling lines of YouTube
+# auto-captions (every cue repeats the previous line before adding a new one), which
+# otherwise roughly doubles the transcript. The transcript is returned as paragraphs
+# prefixed with [mm:ss] timestamps, so the summary prompt's 关键时间戳 section can cite them.
+
+# Cue timing line, VTT ("00:01.000 --> ...", "00:00:01.000 --> ...") or SRT ("00:00:01,000 --> ...").
+_TIMING_RE = re.compile(r'^(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{3})\s*-->')
+_TAG_RE = re.compile(r'<[^>]*>')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Preferred subtitle formats, best first (both are parsed by iter_cues).
+_SUBTITLE_FORMATS = ('vtt', 'srt')
+_READ_BLOCK_SIZE = 64 * 1024
+
+_local = threading.local()
+
+
+class TranscriptError(ValueError):
+    pass
+
+
+class NoSubtitlesError(TranscriptError):
+    pass
+
+
+def _get_ydl():
+    ydl = getattr(_local, "ydl", None)
+    if ydl is None:
+        ydl = _local.ydl = yt_dlp.YoutubeDL({
+            'skip_download': True,
+            'quiet': True,
+            'no_warnings': True,
+            'noplaylist': True,
+            'socket_timeout': config.FETCH_TIMEOUT_SECONDS,
+            # Cookies (YOUTUBE_COOKIES_FILE / YOUTUBE_BROWSER_FOR_COOKIES) are deliberately not
+            # passed for now: forcing no cookies resolved the subtitle download issue.
+        })
+    return ydl
+
+
+def _matching_tracks(tracks, language):
+    # Exact language first, then regional variants ("zh" -> "zh-Hans", "en" -> "en-US").
+    if language in tracks:
+        yield tracks[language]
+    for key, track in tracks.items():
+        if key.startswith(language + '-'):
+            yield track
+
+
+def select_subtitle_url(info, languages=None):
+    # Manually created subtitles win over auto-generated captions; within each, the first
+    # language in YOUTUBE_SUBTITLE_LANGUAGES that has a VTT or SRT track.
+    languages = languages or config.YOUTUBE_SUBTITLE_LANGUAGES
+    for tracks in (info.get('subtitles') or {}, info.get('automatic_captions') or {}):
+        for language in languages:
+            for track in _matching_tracks(tracks, language):
+                for subtitle_format in _SUBTITLE_FORMATS:
+                    for entry in track:
+                        if entry.get('ext') == subtitle_format and entry.get('url'):
+                            return entry['url']
+    return None
+
+
+def _iter_lines(response):
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    pending = ''
+    while True:
+        block = response.read(_READ_BLOCK_SIZE)
+        if not block:
+            break
+        pending += decoder.decode(block)
+        *lines, pending = pending.split('\n')
+        yield from lines
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def _clean(line):
+    return _WHITESPACE_RE.sub(' ', html.unescape(_TAG_RE.sub('', line))).strip()
+
+
+def iter_cues(lines):
+    # Yields (start_seconds, text) for each new caption line, in order. Works on VTT and
+    # SRT alike; header, NOTE/STYLE blocks and SRT cue numbers are skipped. A line equal to
+    # one of the last two emitted lines is a rolling repeat and is dropped.
+    recent = []
+    start = None
+    skipping_block = False
+    for raw_line in lines:
+        # Only a truly empty line ends a cue; auto-captions contain lines of a single space.
+        if not raw_line.rstrip('\r\n'):
+            start = None
+            skipping_block = False
+            continue
+        if skipping_block:
+            continue
+        line = raw_line.strip()
+        match = _TIMING_RE.match(line)
+        if match:
+            hours, minutes, seconds, millis = match.groups()
+            start = int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
+            continue
+        if start is None:
+            # Outside a cue: WEBVTT header lines, NOTE/STYLE/REGION blocks, SRT indices.
+            if line.startswith(('NOTE', 'STYLE', 'REGION')):
+                skipping_block = True
+            continue
+        text = _clean(line)
+        if not text or text in recent:
+            continue
+        recent = [recent[-1], text] if recent else [text]
+        yield start, text
+
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def format_transcript(cues, interval=None):
+    # Groups cues into paragraphs of about `interval` seconds, each starting with its
+    # timestamp: "[05:30] text text text".
+    interval = interval or config.TRANSCRIPT_PARAGRAPH_SECONDS
+    paragraphs = []
+    paragraph_start, words = None, []
+    for start, text in cues:
+        if paragraph_start is None or start - paragraph_start >= interval:
+            if words:
+                paragraphs.append(f"[{format_timestamp(paragraph_start)}] " + " ".join(words))
+            paragraph_start, words = start, []
+        words.append(text)
+    if words:
+        paragraphs.append(f"[{format_timestamp(paragraph_start)}] " + " ".join(words))
+    return "\n".join(paragraphs)
+
+
+def fetch_transcript(youtube_url):
+    # Returns the timestamped transcript text. Raises TranscriptError when the video
+    # metadata or subtitles cannot be downloaded, NoSubtitlesError when there are none.
+    ydl = _get_ydl()
+    try:
+        with metrics.timed("youtube_metadata"):
+            # process=False: only the extractor runs (no format selection), which is all we need.
+            info = ydl.extract_info(youtube_url, download=False, process=False)
+            if info and info.get('_type') in ('url', 'url_transparent'):
+                info = ydl.extract_info(info['url'], download=False, process=False)
+    except yt_dlp.utils.YoutubeDLError as e:
+        raise TranscriptError(str(e))
+    subtitle_url = select_subtitle_url(info or {})
+    if subtitle_url is None:
+        raise NoSubtitlesError(f"No subtitles available for {youtube_url}")
+    try:
+        with metrics.timed("youtube_subtitles"), ydl.urlopen(subtitle_url) as response:
+            transcript = format_transcript(iter_cues(_iter_lines(response)))
+    except yt_dlp.utils.YoutubeDLError as e:
+        raise TranscriptError(str(e))
+    if not transcript:
+        raise NoSubtitlesError(f"Subtitles for {youtube_url} are empty")
+    return transcript
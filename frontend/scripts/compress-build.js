@@ -0,0 +1,35 @@
+// Writes .br and .gz copies of the compressible build files (run after `npm run build`).
+// The backend serves them to clients that accept those encodings (backend/routes/static.py),
+// so nothing is compressed per request and brotli needs no Python package.
+const fs = require('fs');
+const path = require('path');
+const zlib = require('zlib');
+
+const BUILD_DIR = path.join(__dirname, '..', 'build');
+const COMPRESSIBLE = /\.(js|css|html|json|svg|txt|ico|map)$/;
+const MIN_BYTES = 1024;
+
+function walk(dir) {
+  return fs.readdirSync(dir, { withFileTypes: true }).flatMap((entry) => {
+    const full = path.join(dir, entry.name);
+    return entry.isDirectory() ? walk(full) : [full];
+  });
+}
+
+let written = 0;
+for (const file of walk(BUILD_DIR)) {
+  if (!COMPRESSIBLE.test(file)) continue;
+  const body = fs.readFileSync(file);
+  if (body.length < MIN_BYTES) continue;
+  const br = zlib.brotliCompressSync(body, {
+    params: {
+      [zlib.constants.BROTLI_PARAM_QUALITY]: zlib.constants.BROTLI_MAX_QUALITY,
+      [zlib.constants.BROTLI_PARAM_SIZE_HINT]: body.length,
+    },
+  });
+  const gz = zlib.gzipSync(body, { level: zlib.constants.Z_BEST_COMPRESSION });
+  fs.writeFileSync(`${file}.br`, br);
+  fs.writeFileSync(`${file}.gz`, gz);
+  written += 1;
+}
+console.log(`Precompressed ${written} build files (.br, .gz)`);
@@ -10,7 +10,8 @@ import Modal from './components/Modal'; // Import Modal
 import WebsiteSummarizer from './components/WebsiteSummarizer'; // Import WebsiteSummarizer
 import TextFileSummarizer from './components/TextFileSummarizer'; // Import TextFileSummarizer
 import ReportGenerationModal from './components/ReportGenerationModal'; // Import ReportGenerationModal
-import { getNotebooks, saveNotebooks as saveNotebooksToStorage, getHtmlReport, saveHtmlReport } from './utils/localStorageHelper'; // Renamed for clarity, added report helpers
+import * as notebookApi from './utils/notebookApi'; // Notebooks, sources and reports are stored by the backend
+import { postEventStream } from './utils/sseClient';
 
 function App() {
   const [notebooks, setNotebooks] = useState([]);
@@ -22,7 +23,6 @@ function App() {
   const [reportGenerationStatus, setReportGenerationStatus] = useState([]); // Moved from RightSidebar
 
 
-  // Load notebooks from localStorage on mount
   // Determine currentView based on selectedNotebookId
   useEffect(() => {
     if (selectedNotebookId) {
@@ -32,60 +32,67 @@ function App() {
     }
   }, [selectedNotebookId]);
 
-  // Load notebooks from localStorage on mount
+  // Load the notebook list from the backend on mount (importing any notebooks that
+  // were still kept in localStorage the first time).
   useEffect(() => {
-    const loadedNotebooksFromStorage = getNotebooks();
-    const migratedNotebooks = loadedNotebooksFromStorage.map(notebook => ({
-        ...notebook,
-        sources: (notebook.sources || []).map(source => ({
-            ...source,
-            // Default to true if property is missing (for migration)
-            isSelectedForChat: source.isSelectedForChat === undefined ? true : source.isSelectedForChat
-        }))
-    }));
-    setNotebooks(migratedNotebooks);
-    // Optionally, select the first notebook by default or the last selected one
-    if (migratedNotebooks.length > 0) {
-      // setSelectedNotebookId(migratedNotebooks[0].id);
-    }
+    const loadNotebooks = async () => {
+      try {
+        await notebookApi.importLocalNotebooks();
+      } catch (error) {
+        console.error("Error importing notebooks from localStorage:", error);
+      }
+      try {
+        setNotebooks(await notebookApi.fetchNotebooks());
+      } catch (error) {
+        console.error("Error loading notebooks:", error);
+        setNotification({ message: `Failed to load notebooks: ${error.message}`, type: 'error' });
+      }
+    };
+    loadNotebooks();
   }, []);
 
+  // Load the selected notebook's sources and chat history.
+  useEffect(() => {
+    if (!selectedNotebookId) return;
+    notebookApi.fetchNotebook(selectedNotebookId)
+      .then(notebook => setNotebooks(prev => prev.map(nb => nb.id === notebook.id ? notebook : nb)))
+      .catch(error => console.error("Error loading notebook:", error));
+  }, [selectedNotebookId]);
+
   const handleSelectNotebook = (notebookId) => {
     setSelectedNotebookId(notebookId);
   };
 
   // Renamed from handleAddNotebook for clarity in Dashboard context
-  const handleCreateNewNotebook = (title = `Untitled notebook ${notebooks.length + 1}`) => {
-    // const title = prompt("Enter new notebook title:", `Untitled notebook ${notebooks.length + 1}`);
+  const handleCreateNewNotebook = async (title = `Untitled notebook ${notebooks.length + 1}`) => {
     // For now, let's use a default title as per PRD, can be changed later via rename from dashboard
-    const newNotebook = {
-      id: Date.now(), // Simple unique ID
-      title: title,
-      createdAt: new Date().toISOString(),
-      sources: [],
-      chatHistory: [] // Initialize chat history
-    };
-    const updatedNotebooks = [...notebooks, newNotebook];
-    setNotebooks(updatedNotebooks);
-    saveNotebooksToStorage(updatedNotebooks);
-    setSelectedNotebookId(newNotebook.id); // Select the new notebook to navigate to workspace
-    return newNotebook.id; // Return new notebook ID
+    try {
+      const newNotebook = await notebookApi.createNotebook(title);
+      setNotebooks(prev => [...prev, newNotebook]);
+      setSelectedNotebookId(newNotebook.id); // Select the new notebook to navigate to workspace
+      return newNotebook.id; // Return new notebook ID
+    } catch (error) {
+      showNotification(`Failed to create notebook: ${error.message}`, 'error');
+      return null;
+    }
   };
 
+  // The summarize routes already saved the source server-side (sourceData.indexSourceId
+  // is its id), so this only updates local state.
   const handleAddSourceToNotebook = useCallback((notebookId, sourceData) => {
-    const updatedNotebooks = notebooks.map(nb => {
+    setNotebooks(prev => prev.map(nb => {
       if (nb.id === notebookId) {
         // Initialize new source with isSelectedForChat: true
-        const newSource = { ...sourceData, id: Date.now(), isSelectedForChat: true };
-        return { ...nb, sources: [...(nb.sources || []), newSource] };
+        const newSource = { ...sourceData, id: sourceData.indexSourceId || Date.now(), isSelectedForChat: true };
+        return { ...nb, sources: [...(nb.sources || []), newSource], sourceCount: (nb.sourceCount || 0) + 1 };
       }
       return nb;
-    });
-    setNotebooks(updatedNotebooks);
-    saveNotebooksToStorage(updatedNotebooks);
-  }, [notebooks]);
+    }));
+  }, []);
 
   const handleToggleSourceChatSelection = useCallback((notebookId, sourceId, isSelected) => {
+    notebookApi.updateSource(notebookId, sourceId, { isSelectedForChat: isSelected })
+      .catch(error => console.error("Error saving source selection:", error));
     const updatedNotebooks = notebooks.map(nb => {
       if (nb.id === notebookId) {
         return {
@@ -101,7 +108,6 @@ function App() {
       return nb;
     });
     setNotebooks(updatedNotebooks);
-    saveNotebooksToStorage(updatedNotebooks);
   }, [notebooks]);
 
   const handleEditNotebookTitle = useCallback((notebookId) => {
@@ -109,19 +115,21 @@ function App() {
     if (!notebookToEdit) return;
     const newTitle = prompt("Enter new notebook title:", notebookToEdit.title);
     if (newTitle && newTitle !== notebookToEdit.title) {
+      notebookApi.updateNotebook(notebookId, { title: newTitle })
+        .catch(error => console.error("Error renaming notebook:", error));
       const updatedNotebooks = notebooks.map(nb =>
         nb.id === notebookId ? { ...nb, title: newTitle, updatedAt: new Date().toISOString() } : nb
       );
       setNotebooks(updatedNotebooks);
-      saveNotebooksToStorage(updatedNotebooks);
     }
   }, [notebooks]);
 
   const handleDeleteNotebook = useCallback((notebookId) => {
     if (window.confirm("Are you sure you want to delete this notebook and all its sources? This action cannot be undone.")) {
+      notebookApi.deleteNotebook(notebookId)
+        .catch(error => console.error("Error deleting notebook:", error));
       const updatedNotebooks = notebooks.filter(nb => nb.id !== notebookId);
       setNotebooks(updatedNotebooks);
-      saveNotebooksToStorage(updatedNotebooks);
       if (selectedNotebookId === notebookId) {
         setSelectedNotebookId(updatedNotebooks.length > 0 ? updatedNotebooks[0].id : null);
       }
@@ -207,7 +215,7 @@ function App() {
     for (const source of sourcesToReport) {
       setReportGenerationStatus(prev => prev.map(s => s.id === source.id ? { ...s, status: 'generating' } : s));
 
-      const cachedHtml = getHtmlReport(selectedNotebook.id, source.id);
+      const cachedHtml = await notebookApi.fetchHtmlReport(selectedNotebook.id, source.id).catch(() => null);
       if (cachedHtml) {
         const newTabCached = window.open('', '_blank');
         if (newTabCached) {
@@ -227,34 +235,34 @@ function App() {
         continue;
       }
       newTab.document.open();
-      newTab.document.write(`<!DOCTYPE html><html><head><title>Generating Report for ${source.name}</title><body><h1>Generating Report...</h1><p>Please wait for ${source.name}.</p></body></html>`);
+      newTab.document.write(`<!DOCTYPE html><html><head><title>Generating Report for ${source.name}</title><body><h1>Generating Report...</h1><p>Please wait for ${source.name}.</p><p id="report-progress"></p></body></html>`);
       newTab.document.close();
 
       try {
-        const response = await fetch('http://localhost:5001/generate-html-report', {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ summary_text: source.summary, title: source.name }),
+        // Streamed so the tab can show progress while the report is being generated;
+        // the finished (validated) document arrives in the final 'done' frame.
+        let receivedChars = 0;
+        // Sources stored server-side are sent by id; the backend reads the summary and saves the report.
+        const reportRequest = source.indexSourceId
+          ? { notebook_id: selectedNotebook.id, source_id: source.indexSourceId }
+          : { summary_text: source.summary, title: source.name };
+        const data = await postEventStream('http://localhost:5001/generate-html-report', reportRequest, (event, eventData) => {
+          if (event !== 'delta' || !newTab || newTab.closed) return;
+          receivedChars += eventData.text.length;
+          const progressElement = newTab.document.getElementById('report-progress');
+          if (progressElement) progressElement.textContent = `${receivedChars} characters generated...`;
         });
-        if (response.ok) {
-          const data = await response.json();
-          if (newTab && !newTab.closed) {
-            newTab.document.open();
-            newTab.document.write(data.html_content);
-            newTab.document.close();
-            saveHtmlReport(selectedNotebook.id, source.id, data.html_content);
-            newTab.focus();
-            setReportGenerationStatus(prev => prev.map(s => s.id === source.id ? { ...s, status: 'success' } : s));
-          } else {
-             setReportGenerationStatus(prev => prev.map(s => s.id === source.id ? { ...s, status: 'error', message: 'Tab closed by user' } : s));
-          }
+        if (newTab && !newTab.closed) {
+          newTab.document.open();
+          newTab.document.write(data.html_content);
+          newTab.document.close();
+          newTab.focus();
+          setReportGenerationStatus(prev => prev.map(s => s.id === source.id ? { ...s, status: 'success' } : s));
         } else {
-          const errorData = await response.json().catch(() => response.text());
-          displayErrorInNewTab(newTab, 'API Report Generation Error', `API Error for ${source.name}: Status ${response.status}`, errorData);
-          setReportGenerationStatus(prev => prev.map(s => s.id === source.id ? { ...s, status: 'error', message: `API Error: ${response.status}` } : s));
+           setReportGenerationStatus(prev => prev.map(s => s.id === source.id ? { ...s, status: 'error', message: 'Tab closed by user' } : s));
         }
       } catch (error) {
-         displayErrorInNewTab(newTab, 'Network Report Generation Error', `Network Error for ${source.name}: ${error.message}`);
+         displayErrorInNewTab(newTab, 'Report Generation Error', `Error for ${source.name}: ${error.message}`);
          setReportGenerationStatus(prev => prev.map(s => s.id === source.id ? { ...s, status: 'error', message: error.message } : s));
       }
     }
@@ -263,6 +271,8 @@ function App() {
 
 
   const handleUpdateNotebook = useCallback((notebookId, updatedProps) => {
+    notebookApi.updateNotebook(notebookId, { title: updatedProps.title, chatHistory: updatedProps.chatHistory })
+      .catch(error => console.error("Error saving notebook:", error));
     const updatedNotebooks = notebooks.map(nb => {
       if (nb.id === notebookId) {
         return { ...nb, ...updatedProps, updatedAt: new Date().toISOString() }; // Merge and update timestamp
@@ -270,7 +280,6 @@ function App() {
       return nb;
     });
     setNotebooks(updatedNotebooks);
-    saveNotebooksToStorage(updatedNotebooks);
   }, [notebooks]);
 
   return (
@@ -330,12 +339,14 @@ function App() {
         <Modal isOpen={!!activeModal} onClose={handleCloseModal}>
           {activeModal === 'website' && (
             <WebsiteSummarizer
+              notebookId={selectedNotebookId}
               onSummaryComplete={handleSummaryCompleteAndCloseModal}
               onCancel={handleCloseModal}
             />
           )}
           {activeModal === 'file' && (
             <TextFileSummarizer
+              notebookId={selectedNotebookId}
               onSummaryComplete={handleSummaryCompleteAndCloseModal}
               onCancel={handleCloseModal}
             />
@@ -193,7 +193,7 @@ function Dashboard({ notebooks, onNavigateToNotebook, onCreateNotebook, onEditNo
                                                     notebook.title
                                                 )}
                                             </td>
-                                            <td>{notebook.sources?.length || 0} 个来源</td>
+                                            <td>{notebook.sourceCount ?? (notebook.sources?.length || 0)} 个来源</td>
                                             <td>{formatDate(notebook.createdAt)}</td>
                                             <td>Owner</td> {/* Placeholder as per PRD */}
                                             <td>
@@ -218,7 +218,7 @@ function Dashboard({ notebooks, onNavigateToNotebook, onCreateNotebook, onEditNo
                                 {processedNotebooks.map((notebook) => (
                                    <div key={notebook.id} className="grid-item" onClick={() => onNavigateToNotebook(notebook.id)}>
                                         <h3>{notebook.title}</h3>
-                                        <p>{notebook.sources?.length || 0} 个来源</p>
+                                        <p>{notebook.sourceCount ?? (notebook.sources?.length || 0)} 个来源</p>
                                         <p>Created: {formatDate(notebook.createdAt)}</p>
                                         {/* Simplified actions for grid view for now */}
                                         <div className="grid-item-actions">
@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import ReactMarkdown from 'react-markdown';
 import remarkGfm from 'remark-gfm';
+import { postEventStream } from '../utils/sseClient';
 // Removed getHtmlReport, saveHtmlReport
 
 const MainContent = ({
@@ -106,12 +107,17 @@ const MainContent = ({
     setChatError(null);
 
     let summaries = [];
+    let indexedSourceIds = [];
     // Context description is now set by useEffect, but we still need to determine summaries for API
     // Removed if (selectedSource && activeTab === 'chat') condition
     if (selectedNotebook && selectedNotebook.sources) {
       const activeSources = selectedNotebook.sources.filter(s => s.isSelectedForChat === undefined ? true : s.isSelectedForChat);
 
-      summaries = activeSources.map(s => {
+      // Indexed sources are retrieved server-side (only the relevant passages are used);
+      // full summaries are only sent for sources added before indexing existed.
+      indexedSourceIds = activeSources.filter(s => s.indexSourceId).map(s => s.indexSourceId);
+
+      summaries = activeSources.filter(s => !s.indexSourceId).map(s => {
         // Check if s.summary is likely an error message from our backend's summarization process.
         // These checks should align with error strings returned by `generate_detailed_summary_with_ai`.
         const summaryIsError = s.summary && (
@@ -132,45 +138,43 @@ const MainContent = ({
     }
     // If no specific source context, summaries array remains empty, backend handles general chat
 
+    // The reply is streamed: an empty AI message is added on the first token and
+    // filled in as tokens arrive, so the answer starts showing well before it is complete.
+    const aiMessageId = Date.now() + 1;
+    let streamedText = '';
     try {
-      const response = await fetch('http://localhost:5001/chat', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          message: currentMessageText,
-          summaries: summaries,
-          chat_history: updatedChatMessagesForAPI
-        }),
+      const data = await postEventStream('http://localhost:5001/chat', {
+        message: currentMessageText,
+        summaries: summaries,
+        notebook_id: selectedNotebook ? selectedNotebook.id : null,
+        source_ids: indexedSourceIds,
+        chat_history: updatedChatMessagesForAPI
+      }, (event, eventData) => {
+        if (event !== 'delta') return;
+        const isFirstDelta = streamedText === '';
+        streamedText += eventData.text;
+        const partialText = streamedText;
+        setChatMessages(prevMessages => isFirstDelta
+          ? [...prevMessages, { id: aiMessageId, sender: 'ai', text: partialText }]
+          : prevMessages.map(msg => msg.id === aiMessageId ? { ...msg, text: partialText } : msg));
       });
 
-      if (!response.ok) {
-        const errorData = await response.json().catch(() => ({ error: `Server error: ${response.status} ${response.statusText}` }));
-        throw new Error(errorData.error || `Server error: ${response.statusText}`);
-      }
-
-      const data = await response.json();
-      const aiMessage = { id: Date.now() + 1, sender: 'ai', text: data.reply };
-
-      setChatMessages(prevMessages => [...prevMessages, aiMessage]);
+      const aiMessage = { id: aiMessageId, sender: 'ai', text: data.reply };
+      setChatMessages(prevMessages => prevMessages.some(msg => msg.id === aiMessageId)
+        ? prevMessages.map(msg => msg.id === aiMessageId ? aiMessage : msg)
+        : [...prevMessages, aiMessage]);
 
-      // Persist updated chat history including AI response
+      // Persist updated chat history including AI response.
+      // Built explicitly from the messages sent to the API, since chatMessagesRef may
+      // already contain the partially streamed AI message.
       if (onUpdateNotebook && selectedNotebook) {
-        // chatMessagesRef.current should have the user message already because setChatMessages for user message was called.
-        // However, the state update for chatMessages might not be flushed yet for chatMessagesRef to pick it up
-        // if we directly use it here.
-        // So, it's safer to construct the new history based on the previous state + new messages.
-        const newHistoryForStorage = [...chatMessagesRef.current, aiMessage]; // Assumes ref updated after user msg + ai msg
-                                                                                // This might be tricky. Let's directly use the state update pattern
-                                                                                // by ensuring chatMessagesRef is updated after each setChatMessages call.
-                                                                                // Or, simpler: build the array explicitly.
-        const finalHistory = [...(chatMessagesRef.current || []), aiMessage]; // chatMessagesRef.current already includes newUserMessage due to useEffect
-        onUpdateNotebook(selectedNotebook.id, { chatHistory: finalHistory });
+        onUpdateNotebook(selectedNotebook.id, { chatHistory: [...updatedChatMessagesForAPI, aiMessage] });
       }
 
     } catch (error) {
       console.error('Error fetching AI chat response:', error);
+      // Drop a partially streamed reply so the chat log does not keep a truncated answer
+      setChatMessages(prevMessages => prevMessages.filter(msg => msg.id !== aiMessageId));
       const terrorMessage = error.message || 'Failed to get response from AI.';
       setChatError(terrorMessage); // This will trigger the useEffect for chatError notification
       // No need to add AI error message to chatMessages here if notification handles it,
@@ -231,7 +235,8 @@ const MainContent = ({
             ))}
             <div ref={messagesEndRef} />
           </div>
-          {isAiResponding && <div className="ai-thinking-message"><div className="spinner-inline"></div>AI is thinking...</div>}
+          {/* Hidden once the streamed reply has started to appear */}
+          {isAiResponding && chatMessages[chatMessages.length - 1]?.sender !== 'ai' && <div className="ai-thinking-message"><div className="spinner-inline"></div>AI is thinking...</div>}
           <div className="chat-input-area">
             <textarea
               value={chatInput}
@@ -1,6 +1,6 @@
 import React, { useState } from 'react';
 
-function TextFileSummarizer({ onSummaryComplete, onCancel }) { // Accept onSummaryComplete and onCancel props
+function TextFileSummarizer({ notebookId, onSummaryComplete, onCancel }) { // Accept onSummaryComplete and onCancel props
     const [selectedFile, setSelectedFile] = useState(null);
     // Removed summary state
     const [isLoading, setIsLoading] = useState(false);
@@ -40,6 +40,9 @@ function TextFileSummarizer({ onSummaryComplete, onCancel }) { // Accept onSumma
 
         const formData = new FormData();
         formData.append('file', selectedFile);
+        if (notebookId) {
+            formData.append('notebook_id', notebookId);
+        }
 
         try {
             const response = await fetch('http://localhost:5001/summarize-text-file', {
@@ -59,6 +62,7 @@ function TextFileSummarizer({ onSummaryComplete, onCancel }) { // Accept onSumma
                     type: 'file',
                     name: selectedFile.name,
                     summary: responseData.summary,
+                    indexSourceId: responseData.source_id, // Id in the backend retrieval index, used by chat
                     timestamp: new Date().toISOString(),
                 });
             }
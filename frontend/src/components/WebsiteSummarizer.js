@@ -1,6 +1,6 @@
 import React, { useState } from 'react';
 
-function WebsiteSummarizer({ onSummaryComplete, onCancel }) {
+function WebsiteSummarizer({ notebookId, onSummaryComplete, onCancel }) {
     const [websiteUrl, setWebsiteUrl] = useState('');
     const [isLoading, setIsLoading] = useState(false);
     const [error, setError] = useState(null);
@@ -25,11 +25,11 @@ function WebsiteSummarizer({ onSummaryComplete, onCancel }) {
 
         if (isYoutubeUrl(websiteUrl)) {
             endpoint = 'http://localhost:5001/summarize-youtube';
-            body = JSON.stringify({ youtube_url: websiteUrl });
+            body = JSON.stringify({ youtube_url: websiteUrl, notebook_id: notebookId });
             summaryType = 'youtube';
         } else {
             endpoint = 'http://localhost:5001/summarize-website';
-            body = JSON.stringify({ url: websiteUrl });
+            body = JSON.stringify({ url: websiteUrl, notebook_id: notebookId });
             summaryType = 'website';
         }
 
@@ -55,6 +55,7 @@ function WebsiteSummarizer({ onSummaryComplete, onCancel }) {
                     name: responseData.name || websiteUrl,
                     summary: responseData.summary,
                     original_content: responseData.original_content,
+                    indexSourceId: responseData.source_id, // Id in the backend retrieval index, used by chat
                     timestamp: new Date().toISOString(),
                     url: websiteUrl // Optionally store the original URL
                 });
@@ -0,0 +1,127 @@
+// Client for the backend notebook store (backend/routes/notebooks.py).
+// Notebooks, sources and HTML reports are persisted server-side; these helpers convert
+// the API's snake_case records into the shape the components already use.
+import { getNotebooks as getLocalNotebooks } from './localStorageHelper';
+
+const API_BASE = 'http://localhost:5001';
+const PAGE_SIZE = 200;
+const MIGRATED_FLAG_KEY = 'notebooksMigratedToServer';
+
+const request = async (path, options = {}) => {
+    const response = await fetch(`${API_BASE}${path}`, {
+        ...options,
+        headers: options.body ? { 'Content-Type': 'application/json', ...options.headers } : options.headers,
+    });
+    if (response.status === 204) return null;
+    const data = await response.json().catch(() => ({}));
+    if (!response.ok) {
+        const error = new Error(data.error || `HTTP error! status: ${response.status}`);
+        error.status = response.status;
+        throw error;
+    }
+    return data;
+};
+
+// Reads every page of a paginated list route.
+const fetchAllPages = async (path) => {
+    const items = [];
+    for (let offset = 0; ; offset += PAGE_SIZE) {
+        const page = await request(`${path}?limit=${PAGE_SIZE}&offset=${offset}`);
+        items.push(...page.items);
+        if (items.length >= page.total || page.items.length === 0) return items;
+    }
+};
+
+export const toSource = (source) => ({
+    id: source.id,
+    indexSourceId: source.id, // Store and retrieval index share ids, so chat can send it directly
+    type: source.type,
+    name: source.name,
+    url: source.url,
+    summary: source.summary,
+    timestamp: source.created_at,
+    isSelectedForChat: source.selected_for_chat,
+});
+
+const toNotebook = (notebook, sources) => ({
+    id: notebook.id,
+    title: notebook.title,
+    createdAt: notebook.created_at,
+    updatedAt: notebook.updated_at,
+    sourceCount: notebook.source_count,
+    chatHistory: notebook.chat_history || [],
+    sources: sources ? sources.map(toSource) : [],
+});
+
+// Notebook list for the dashboard (no sources; see sourceCount).
+export const fetchNotebooks = async () => {
+    const notebooks = await fetchAllPages('/notebooks');
+    return notebooks.map(notebook => toNotebook(notebook));
+};
+
+// One notebook with its chat history and all of its sources (summaries, no original content).
+export const fetchNotebook = async (notebookId) => {
+    const [notebook, sources] = await Promise.all([
+        request(`/notebooks/${notebookId}`),
+        fetchAllPages(`/notebooks/${notebookId}/sources`),
+    ]);
+    return toNotebook(notebook, sources);
+};
+
+export const createNotebook = async (title) => toNotebook(await request('/notebooks', {
+    method: 'POST',
+    body: JSON.stringify({ title }),
+}));
+
+export const updateNotebook = (notebookId, { title, chatHistory }) => request(`/notebooks/${notebookId}`, {
+    method: 'PATCH',
+    body: JSON.stringify({ title, chat_history: chatHistory }),
+});
+
+export const deleteNotebook = (notebookId) => request(`/notebooks/${notebookId}`, { method: 'DELETE' });
+
+export const updateSource = (notebookId, sourceId, { isSelectedForChat }) => request(`/notebooks/${notebookId}/sources/${sourceId}`, {
+    method: 'PATCH',
+    body: JSON.stringify({ selected_for_chat: isSelectedForChat }),
+});
+
+// Saved HTML report for a source, or null if none has been generated yet.
+export const fetchHtmlReport = async (notebookId, sourceId) => {
+    try {
+        const report = await request(`/notebooks/${notebookId}/sources/${sourceId}/report`);
+        return report.html_content;
+    } catch (error) {
+        if (error.status === 404) return null;
+        throw error;
+    }
+};
+
+// One-time import of notebooks that were kept in localStorage before the server-side store
+// existed. The localStorage copy is left in place; the flag stops it being imported twice.
+// Saved HTML reports are not carried over; they are regenerated on demand.
+export const importLocalNotebooks = async () => {
+    if (localStorage.getItem(MIGRATED_FLAG_KEY)) return;
+    for (const localNotebook of getLocalNotebooks()) {
+        const notebook = await createNotebook(localNotebook.title);
+        for (const source of localNotebook.sources || []) {
+            if (!source.summary) continue;
+            const saved = await request(`/notebooks/${notebook.id}/sources`, {
+                method: 'POST',
+                body: JSON.stringify({
+                    type: source.type,
+                    name: source.name,
+                    url: source.url,
+                    summary: source.summary,
+                    original_content: source.original_content,
+                }),
+            });
+            if (source.isSelectedForChat === false) {
+                await updateSource(notebook.id, saved.id, { isSelectedForChat: false });
+            }
+        }
+        if (localNotebook.chatHistory && localNotebook.chatHistory.length > 0) {
+            await updateNotebook(notebook.id, { chatHistory: localNotebook.chatHistory });
+        }
+    }
+    localStorage.setItem(MIGRATED_FLAG_KEY, new Date().toISOString());
+};
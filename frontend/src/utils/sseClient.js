@@ -0,0 +1,64 @@
+// Helper for the backend's streaming (server-sent events) endpoints.
+// EventSource only supports GET, so we POST with fetch and parse the event stream ourselves.
+// Frames: 'start' (metadata), 'delta' ({ text }), 'done' (final payload), 'error' ({ error }).
+
+const parseFrame = (frame) => {
+    let event = 'message';
+    const dataLines = [];
+    frame.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trimStart());
+        }
+    });
+    if (dataLines.length === 0) return null;
+    return { event, data: JSON.parse(dataLines.join('\n')) };
+};
+
+// Calls onEvent(eventName, data) for every frame and resolves with the 'done' payload.
+export const postEventStream = async (url, body, onEvent) => {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
+        },
+        body: JSON.stringify({ ...body, stream: true }),
+    });
+
+    if (!response.ok) {
+        const errorData = await response.json().catch(() => ({ error: `Server error: ${response.status} ${response.statusText}` }));
+        throw new Error(errorData.error || `Server error: ${response.statusText}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let finalData = null;
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let separatorIndex;
+        while ((separatorIndex = buffer.indexOf('\n\n')) !== -1) {
+            const parsed = parseFrame(buffer.slice(0, separatorIndex));
+            buffer = buffer.slice(separatorIndex + 2);
+            if (!parsed) continue;
+            if (parsed.event === 'error') {
+                throw new Error(parsed.data.error || 'Stream error');
+            }
+            if (parsed.event === 'done') {
+                finalData = parsed.data;
+            }
+            if (onEvent) onEvent(parsed.event, parsed.data);
+        }
+    }
+
+    if (!finalData) {
+        throw new Error('Stream ended before the response was complete.');
+    }
+    return finalData;
+};